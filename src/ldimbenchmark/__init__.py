@@ -6,5 +6,17 @@ from importlib import metadata
 
 __version__ = metadata.version(__package__ or __name__)
 
-from .benchmark import *
 from .classes import *
+from ._lazy import lazy_attributes
+
+# Loaded on first access to keep the import of the package (and its workers) fast
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "LDIMBenchmark": "ldimbenchmark.benchmark.benchmark",
+        "MethodRunner": "ldimbenchmark.benchmark.runners.BaseMethodRunner",
+        "DockerMethodRunner": "ldimbenchmark.benchmark.runners.DockerMethodRunner",
+        "FileBasedMethodRunner": "ldimbenchmark.benchmark.runners.FileMethodRunner",
+        "LocalMethodRunner": "ldimbenchmark.benchmark.runners.LocalMethodRunner",
+    },
+)
@@ -0,0 +1,31 @@
+"""
+Lazy loading of module attributes (PEP 562).
+
+Importing the package should not pull in heavy dependencies (matplotlib, docker, wntr, ...),
+as every worker process and method container pays for it on startup.
+"""
+
+from importlib import import_module
+from typing import Dict
+
+
+def lazy_attributes(module_name: str, attributes: Dict[str, str]):
+    """
+    Creates `__getattr__` and `__dir__` for a module, which import the given attributes on first access.
+
+    :param module_name: Name of the module the attributes are defined for (`__name__`)
+    :param attributes: Mapping of attribute name to the module it is defined in
+    """
+
+    def __getattr__(name: str):
+        if name not in attributes:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        value = getattr(import_module(attributes[name]), name)
+        # Cache the attribute, so __getattr__ is only called once
+        setattr(import_module(module_name), name, value)
+        return value
+
+    def __dir__():
+        return sorted(list(vars(import_module(module_name)).keys()) + list(attributes))
+
+    return __getattr__, __dir__
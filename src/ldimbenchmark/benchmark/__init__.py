@@ -1,2 +1,12 @@
-from .benchmark import LDIMBenchmark
-from .runners import *
+from ldimbenchmark._lazy import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "LDIMBenchmark": "ldimbenchmark.benchmark.benchmark",
+        "MethodRunner": "ldimbenchmark.benchmark.runners.BaseMethodRunner",
+        "DockerMethodRunner": "ldimbenchmark.benchmark.runners.DockerMethodRunner",
+        "FileBasedMethodRunner": "ldimbenchmark.benchmark.runners.FileMethodRunner",
+        "LocalMethodRunner": "ldimbenchmark.benchmark.runners.LocalMethodRunner",
+    },
+)
@@ -1,23 +1,36 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+import hashlib
 import itertools
+import json
 
 from numpy import timedelta64
-from ldimbenchmark.benchmark.results import load_result
-from ldimbenchmark.benchmark.runners import DockerMethodRunner, LocalMethodRunner
-from ldimbenchmark.benchmark.runners.BaseMethodRunner import MethodRunner
+from ldimbenchmark.benchmark.results import (
+    aggregate_profiles,
+    load_result,
+    load_runs,
+)
+from ldimbenchmark.benchmark.journal import read_completed
+from ldimbenchmark.benchmark.results_database import ResultsDatabase
+from ldimbenchmark.benchmark.runners.LocalMethodRunner import LocalMethodRunner
+from ldimbenchmark.benchmark.runners.BaseMethodRunner import (
+    MethodRunner,
+    get_runner_id,
+)
+from ldimbenchmark.classes import LDIMMethodBase
 from ldimbenchmark.datasets import Dataset
+from ldimbenchmark.datasets.classes import (
+    SENSOR_TYPES,
+    extractSubDataset,
+    get_dataset_time_slice,
+)
 import pandas as pd
 import numpy as np
-from typing import Dict, Literal, TypedDict, Union, List, Callable
+from typing import Dict, Iterator, Literal, TypedDict, Union, List, Callable
 import os
 import logging
 from ldimbenchmark.constants import CPU_COUNT, LDIM_BENCHMARK_CACHE_DIR
 from glob import glob
-from tabulate import tabulate
-from ldimbenchmark.benchmark_complexity import run_benchmark_complexity
-import matplotlib.pyplot as plt
-import enlighten
-from ldimbenchmark.evaluation.sensitivity import evaluate_derivations
+from ldimbenchmark.evaluation_metrics.matches import MATCHES_COLUMNS, count_matches
 from ldimbenchmark.evaluation_metrics import (
     precision,
     recall,
@@ -27,13 +40,7 @@ from ldimbenchmark.evaluation_metrics import (
     f1Score,
 )
 from concurrent.futures.process import ProcessPoolExecutor
-from sqlalchemy import create_engine
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib import patches
 import ast
-import seaborn as sns
-from matplotlib.ticker import FormatStrFormatter
 
 from ldimbenchmark.utilities import get_method_name_from_docker_image
 
@@ -54,6 +61,20 @@ def execute_experiment(experiment: MethodRunner):
     return experiment.run()
 
 
+class Experiment:
+    """
+    An experiment of the benchmark, its runner is only created when the experiment is executed.
+    """
+
+    def __init__(self, id: str, runner_class: type, **runner_arguments):
+        self.id = id
+        self.runner_class = runner_class
+        self.runner_arguments = runner_arguments
+
+    def create_runner(self) -> MethodRunner:
+        return self.runner_class(**self.runner_arguments)
+
+
 def get_mask(dataset: pd.DataFrame, start, end, extra_timespan):
     return (dataset.index >= start - extra_timespan) & (
         dataset.index <= end + extra_timespan
@@ -72,20 +93,32 @@ def get_leak_pair_type(expected_leak, detected_leak):
     return ""
 
 
-def plot_leak(
+def _get_window(readings: pd.DataFrame, start, end) -> pd.DataFrame:
+    """
+    Slices the readings (sorted by time) to the window, without masking the whole series.
+    """
+    if start is None or end is None:
+        return readings
+    return readings.iloc[
+        readings.index.searchsorted(start, side="left") : readings.index.searchsorted(
+            end, side="right"
+        )
+    ]
+
+
+def get_leak_plot_data(
     dataset: Dataset,
     leak_pair,
-    out_dir,
     additional_data_dir=None,
     boundary_timespan_overwrite: pd.Timedelta = None,
     compare_leaks: bool = True,
-):
-    fig = plt.figure(figsize=(20, 10))
-    gs = fig.add_gridspec(3, hspace=0)
-    ax_dataset_flows, ax_dataset_pressures, ax_method = gs.subplots(
-        sharex=True, sharey=False
-    )
+) -> dict:
+    """
+    Extracts the data needed for plotting a leak pair: the sensor readings and debug data in the window around the leak.
 
+    :param dataset: Dataset (or the loaded part of it) with pressures and flows
+    :param additional_data_dir: Results folder of the run (containing the debug data)
+    """
     name = ""
     expected_leak, detected_leak = leak_pair
 
@@ -104,35 +137,116 @@ def plot_leak(
         reference_time = expected_leak_start
         leak_time = expected_leak_end - expected_leak_start
 
+    if expected_leak is None and detected_leak is not None:
+        name = detected_leak["leak_time_start"].strftime("%Y_%m_%d_%H_%M_%S") + "_fp"
+        reference_time = detected_leak["leak_time_start"]
+
+    if detected_leak is None and expected_leak is not None:
+        name = expected_leak["leak_time_start"].strftime("%Y_%m_%d_%H_%M_%S") + (
+            "_fn" if compare_leaks else ""
+        )
+
+    sensors = list(dataset.pressures.values()) + list(dataset.flows.values())
+    if boundary is None and len(sensors) > 0:
+        # Just use first sensor_readings for all...
+        sensor_readings = sensors[0]
+        boundary = (sensor_readings.index[-1] - sensor_readings.index[0]) / (
+            sensor_readings.shape[0] / 6
+        )
+        minimum_boundary = timedelta64(1, "D")
+        if boundary < minimum_boundary:
+            boundary = minimum_boundary
+    if boundary_timespan_overwrite is not None:
+        boundary = boundary_timespan_overwrite
+
+    window_start, window_end = None, None
+    if reference_time is not None and boundary is not None:
+        window_start = reference_time - boundary
+        window_end = reference_time + leak_time + boundary
+
+    debug_data = {}
+    if additional_data_dir is not None:
+        debug_folder = os.path.join(additional_data_dir, "debug/")
+        if os.path.exists(debug_folder):
+            from ldimbenchmark.utilities import read_debug_data
+
+            files = glob(debug_folder + "*.h5") + glob(debug_folder + "*.csv")
+            for file in sorted(files):
+                try:
+                    # Only the window around the leak is read
+                    debug_data[os.path.basename(file)] = read_debug_data(
+                        file, window_start, window_end
+                    )
+                except Exception as e:
+                    logging.exception(e)
+
+    return {
+        "name": name,
+        "expected_leak": expected_leak,
+        "detected_leak": detected_leak,
+        "pressures": {
+            sensor_id: _get_window(sensor_readings, window_start, window_end)
+            for sensor_id, sensor_readings in dataset.pressures.items()
+        },
+        "flows": {
+            sensor_id: _get_window(sensor_readings, window_start, window_end)
+            for sensor_id, sensor_readings in dataset.flows.items()
+        },
+        "debug": debug_data,
+    }
+
+
+def get_leak_plot_hash(plot_data: dict) -> str:
+    """
+    Hash of the inputs of a leak plot, to skip rendering unchanged plots.
+    """
+    hasher = hashlib.md5()
+    for key in ["name", "expected_leak", "detected_leak"]:
+        hasher.update(repr(plot_data[key]).encode("utf-8"))
+    for key in ["pressures", "flows", "debug"]:
+        for frame_name, frame in plot_data[key].items():
+            hasher.update(f"{key}/{frame_name}/{list(frame.columns)}".encode("utf-8"))
+            hasher.update(
+                pd.util.hash_pandas_object(frame, index=True).values.tobytes()
+            )
+    return hasher.hexdigest()
+
+
+def render_leak_plot(plot_data: dict, out_dir: str):
+    """
+    Renders the plot of a leak pair (see :func:`get_leak_plot_data`) to `<out_dir>/<name>.png`.
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
+    fig = plt.figure(figsize=(20, 10))
+    gs = fig.add_gridspec(3, hspace=0)
+    ax_dataset_flows, ax_dataset_pressures, ax_method = gs.subplots(
+        sharex=True, sharey=False
+    )
+
+    expected_leak = plot_data["expected_leak"]
+    detected_leak = plot_data["detected_leak"]
+    if expected_leak is not None:
+        expected_leak_start = expected_leak["leak_time_start"]
+        expected_leak_end = expected_leak["leak_time_end"]
+        if pd.isna(expected_leak_end):
+            expected_leak_end = expected_leak["leak_time_start"]
+
         if expected_leak_start == expected_leak_end:
             ax_dataset_flows.axvline(expected_leak_start, color="red", zorder=4)
             ax_dataset_pressures.axvline(expected_leak_start, color="red", zorder=4)
             ax_method.axvline(expected_leak_start, color="red", zorder=4)
         else:
-            ax_dataset_flows.axvspan(
-                expected_leak_start,
-                expected_leak_end,
-                color="red",
-                alpha=0.1,
-                lw=0,
-                zorder=1,
-            )
-            ax_dataset_pressures.axvspan(
-                expected_leak_start,
-                expected_leak_end,
-                color="red",
-                alpha=0.1,
-                lw=0,
-                zorder=1,
-            )
-            ax_method.axvspan(
-                expected_leak_start,
-                expected_leak_end,
-                color="red",
-                alpha=0.1,
-                lw=0,
-                zorder=1,
-            )
+            for ax in [ax_dataset_flows, ax_dataset_pressures, ax_method]:
+                ax.axvspan(
+                    expected_leak_start,
+                    expected_leak_end,
+                    color="red",
+                    alpha=0.1,
+                    lw=0,
+                    zorder=1,
+                )
         ax_method.text(expected_leak_start, 10, "Expected Leak", rotation=90)
 
     # Plot detected leak:
@@ -148,38 +262,9 @@ def plot_leak(
             detected_leak["leak_time_start"], 0, "Detected Leak", rotation=90
         )
 
-    #
-    if expected_leak is None and detected_leak is not None:
-        name = detected_leak["leak_time_start"].strftime("%Y_%m_%d_%H_%M_%S") + "_fp"
-        reference_time = detected_leak["leak_time_start"]
-
-    # Plot expected leak:
-    if detected_leak is None and expected_leak is not None:
-        name = expected_leak["leak_time_start"].strftime("%Y_%m_%d_%H_%M_%S") + (
-            "_fn" if compare_leaks else ""
-        )
-
+    # Do not use df.plot(): https://github.com/pandas-dev/pandas/issues/51795
     ax_dataset_pressures.set_ylabel("Pressure")
-    for sensor_id, sensor_readings in getattr(dataset, "pressures").items():
-        if boundary == None:
-            # Just use first sensor_readings for all...
-            boundary = (sensor_readings.index[-1] - sensor_readings.index[0]) / (
-                sensor_readings.shape[0] / 6
-            )
-            minimum_boundary = timedelta64(1, "D")
-            if boundary < minimum_boundary:
-                boundary = minimum_boundary
-        if boundary_timespan_overwrite is not None:
-            boundary = boundary_timespan_overwrite
-        mask = get_mask(
-            sensor_readings,
-            reference_time,
-            reference_time + leak_time,
-            boundary,
-        )
-
-        sensor_readings = sensor_readings[mask]
-        # Do not use df.plot(): https://github.com/pandas-dev/pandas/issues/51795
+    for sensor_id, sensor_readings in plot_data["pressures"].items():
         ax_dataset_pressures.plot(
             sensor_readings.index,
             sensor_readings[sensor_id],
@@ -189,26 +274,7 @@ def plot_leak(
             label=sensor_id,
         )
     ax_dataset_flows.set_ylabel("Flow")
-    for sensor_id, sensor_readings in getattr(dataset, "flows").items():
-        if boundary == None:
-            # Just use first sensor_readings for all...
-            boundary = (sensor_readings.index[-1] - sensor_readings.index[0]) / (
-                sensor_readings.shape[0] / 6
-            )
-            minimum_boundary = timedelta64(1, "D")
-            if boundary < minimum_boundary:
-                boundary = minimum_boundary
-        if boundary_timespan_overwrite is not None:
-            boundary = boundary_timespan_overwrite
-        mask = get_mask(
-            sensor_readings,
-            reference_time,
-            reference_time + leak_time,
-            boundary,
-        )
-
-        sensor_readings = sensor_readings[mask]
-        # Do not use df.plot(): https://github.com/pandas-dev/pandas/issues/51795
+    for sensor_id, sensor_readings in plot_data["flows"].items():
         ax_dataset_flows.plot(
             sensor_readings.index,
             sensor_readings[sensor_id],
@@ -219,46 +285,19 @@ def plot_leak(
         )
 
     # Plot debug data:
-    if additional_data_dir is not None:
-        debug_folder = os.path.join(additional_data_dir, "debug/")
-        # TODO: Adjust Mask for each debug data
-        ax_method.set_ylabel("Debug")
-        ax_method.set_xlabel("Time")
-        if os.path.exists(debug_folder):
-            files = glob(debug_folder + "*.csv")
-            for file in files:
-                try:
-                    debug_data = pd.read_csv(file, parse_dates=True, index_col=0)
-                    if boundary == None:
-                        alternative_boundarys = (
-                            sensor_readings.index[-1] - sensor_readings.index[0]
-                        ) / (sensor_readings.shape[0] / 6)
-                    if boundary_timespan_overwrite is not None:
-                        boundary = boundary_timespan_overwrite
-                    mask = get_mask(
-                        debug_data,
-                        reference_time,
-                        reference_time + leak_time,
-                        boundary,
-                    )
-                    debug_data = debug_data[mask]
-                    for column in debug_data.columns:
-                        ax_method.plot(
-                            debug_data.index,
-                            debug_data[column],
-                            alpha=1,
-                            linestyle="dashed",
-                            zorder=3,
-                            label=column,
-                        )
-                    # Do not use df.plot(): https://github.com/pandas-dev/pandas/issues/51795
-                    # debug_data.plot(ax=ax_method, alpha=1, linestyle="dashed", zorder=3)
-                except Exception as e:
-                    logging.exception(e)
-                    pass
+    ax_method.set_ylabel("Debug")
+    ax_method.set_xlabel("Time")
+    for debug_data in plot_data["debug"].values():
+        for column in debug_data.columns:
+            ax_method.plot(
+                debug_data.index,
+                debug_data[column],
+                alpha=1,
+                linestyle="dashed",
+                zorder=3,
+                label=column,
+            )
 
-    # box = ax.get_position()
-    # ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
     ax_method.set_title("Debug Data from Method", y=1.0, pad=-14)
     ax_dataset_pressures.set_title("Pressure Data From Dataset", y=1.0, pad=-14)
     ax_dataset_flows.set_title("Flows Data From Dataset", y=1.0, pad=-14)
@@ -267,13 +306,43 @@ def plot_leak(
     ax_method.xaxis.set_major_formatter(date_form)
     # TODO: Plot Leak Outflow, if available
 
-    # Put a legend to the right of the current axis
-    # ax.legend(loc="center left", bbox_to_anchor=(1, 0.5))
-    fig.suptitle(name)
-    fig.savefig(os.path.join(out_dir, name + ".png"))
+    fig.suptitle(plot_data["name"])
+    fig.savefig(os.path.join(out_dir, plot_data["name"] + ".png"))
     plt.close(fig)
 
 
+def _init_plot_worker():
+    """
+    Plots are only rendered to files, no need for an interactive backend in the workers.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def plot_leak(
+    dataset: Dataset,
+    leak_pair,
+    out_dir,
+    additional_data_dir=None,
+    boundary_timespan_overwrite: pd.Timedelta = None,
+    compare_leaks: bool = True,
+):
+    """
+    Plots the sensor readings and debug data around a leak pair (expected leak, detected leak).
+    """
+    render_leak_plot(
+        get_leak_plot_data(
+            dataset,
+            leak_pair,
+            additional_data_dir=additional_data_dir,
+            boundary_timespan_overwrite=boundary_timespan_overwrite,
+            compare_leaks=compare_leaks,
+        ),
+        out_dir,
+    )
+
+
 def create_plots(
     results: pd.DataFrame,
     method: str,
@@ -282,6 +351,10 @@ def create_plots(
     performance_metric: str,
     out_folder,
 ):
+    import matplotlib.pyplot as plt
+    from matplotlib import patches
+    import seaborn as sns
+
     plot_out_folder = os.path.join(out_folder)
     os.makedirs(plot_out_folder, exist_ok=True)
 
@@ -408,7 +481,11 @@ class LDIMBenchmark:
             if isinstance(data, str):
                 datasets[index] = Dataset(data)
         self.datasets: List[Dataset] = datasets
-        self.experiments: List[MethodRunner] = []
+        self._datasets_by_id: Dict[str, Dataset] = {
+            dataset.id: dataset for dataset in self.datasets
+        }
+        # Ids of the experiments of the last run_benchmark call
+        self.experiment_ids: List[str] = []
         self.results = {}
         self.cache_dir = cache_dir
         os.makedirs(self.cache_dir, exist_ok=True)
@@ -524,18 +601,140 @@ class LDIMBenchmark:
         #         }
         return hyperparameters_map
 
+    @staticmethod
+    def _iterate_hyperparameters_matrix(
+        hyperparameters: Dict[str, List[Union[str, int, List]]]
+    ) -> Iterator[Dict]:
+        """
+        Lazily expands the hyperparameters given as lists into all their combinations.
+        """
+        keys = list(hyperparameters.keys())
+        for values in itertools.product(*hyperparameters.values()):
+            yield dict(zip(keys, values))
+
     @staticmethod
     def _get_hyperparameters_matrix_from_hyperparameters_with_list(
         hyperparameters: Dict[str, List[Union[str, int, List]]]
     ):
-        if len(hyperparameters.keys()) == 0:
-            return [{}]
-        index = pd.MultiIndex.from_product(
-            hyperparameters.values(), names=hyperparameters.keys()
+        return list(LDIMBenchmark._iterate_hyperparameters_matrix(hyperparameters))
+
+    def _count_experiments(self, hyperparameters_map: Dict) -> int:
+        """
+        Number of experiments of the benchmark (before removing duplicates), without expanding the hyperparameters.
+        """
+        method_ids = [
+            get_method_name_from_docker_image(dmethod)
+            for dmethod in self.methods_docker
+        ] + [lmethod.name for lmethod in self.methods_local]
+        count = 0
+        for dataset in self.datasets:
+            for method_id in method_ids:
+                if self.multi_parameters:
+                    count += int(
+                        np.prod(
+                            [
+                                len(values)
+                                for values in hyperparameters_map[method_id][
+                                    dataset.id
+                                ].values()
+                            ]
+                        )
+                    )
+                else:
+                    count += 1
+        return count
+
+    def _create_experiment(
+        self,
+        method: Union[str, LDIMMethodBase],
+        dataset: Dataset,
+        evaluation_mode: Union["training", "evaluation"],
+        hyperparameters: Dict,
+        memory_limit=None,
+        profile=False,
+    ) -> Experiment:
+        """
+        Experiment of a method (docker image or local method) on a dataset, without creating its runner.
+        """
+        if isinstance(method, str):
+            from ldimbenchmark.benchmark.runners.DockerMethodRunner import (
+                DockerMethodRunner,
+            )
+
+            return Experiment(
+                get_runner_id(
+                    method.split("/")[-1].replace(":", "_"),
+                    dataset.id,
+                    evaluation_mode,
+                    hyperparameters,
+                ),
+                DockerMethodRunner,
+                image=method,
+                dataset=dataset,
+                dataset_part=evaluation_mode,
+                hyperparameters=hyperparameters,
+                resultsFolder=self.runner_results_dir,
+                debug=self.debug,
+                cpu_count=1,
+                mem_limit=memory_limit,
+                profile=profile,
+            )
+        return Experiment(
+            get_runner_id(
+                f"{method.name}_{method.version}",
+                dataset.id,
+                evaluation_mode,
+                hyperparameters,
+            ),
+            LocalMethodRunner,
+            detection_method=method,
+            dataset=dataset,
+            dataset_part=evaluation_mode,
+            hyperparameters=hyperparameters,
+            resultsFolder=self.runner_results_dir,
+            debug=self.debug,
+            profile=profile,
         )
-        param_matrix = pd.DataFrame(index=index).reset_index()
 
-        return param_matrix.to_dict(orient="records")
+    def _iterate_experiments(
+        self,
+        hyperparameters_map: Dict,
+        evaluation_mode: Union["training", "evaluation"],
+        memory_limit=None,
+        profile=False,
+    ) -> Iterator[Experiment]:
+        """
+        Lazily generates the experiments of the benchmark, experiments with the same id (e.g. same hyperparameters) are only generated once.
+        """
+
+        def iterate_hyperparameters(hyperparameters):
+            if self.multi_parameters:
+                return LDIMBenchmark._iterate_hyperparameters_matrix(hyperparameters)
+            return [hyperparameters]
+
+        generated_ids = set()
+        for dataset in self.datasets:
+            for method in self.methods_docker + self.methods_local:
+                method_id = (
+                    get_method_name_from_docker_image(method)
+                    if isinstance(method, str)
+                    else method.name
+                )
+                for hyperparameters in iterate_hyperparameters(
+                    hyperparameters_map[method_id][dataset.id]
+                ):
+                    experiment = self._create_experiment(
+                        method,
+                        dataset,
+                        evaluation_mode,
+                        hyperparameters,
+                        memory_limit,
+                        profile,
+                    )
+                    if experiment.id in generated_ids:
+                        continue
+                    generated_ids.add(experiment.id)
+                    yield experiment
 
     def add_local_methods(self, methods):
         """
@@ -566,16 +765,34 @@ class LDIMBenchmark:
         n_repeats=3,
         n_measures=10,
         n_max=91,
+        n_warmup=1,
+        parallel=True,
+        max_workers=None,
+        simulator: Literal["WNTR", "EPANET"] = "WNTR",
     ):
+        """
+        Analyses the time and memory complexity of the methods on synthetic datasets of growing size.
+
+        :param methods: List of docker images or local methods
+        :param style: Dimension to grow the datasets in
+        :param n_warmup: Number of unmeasured runs per worker before measuring
+        :param parallel: Run the different dataset sizes concurrently (each run pinned to its own CPU)
+        :param max_workers: Maximum number of concurrent runs
+        :param simulator: Hydraulic solver used to generate the datasets (EPANET is considerably faster)
+        """
+        from ldimbenchmark.benchmark_complexity import (
+            get_method_name,
+            run_benchmark_complexity,
+        )
+
         complexity_results_path = os.path.join(self.complexity_results_dir, style)
         os.makedirs(complexity_results_path, exist_ok=True)
         hyperparameters_map = self._get_hyperparameters_for_methods_and_datasets(
             hyperparameters=self.hyperparameters,
-            method_ids=[
-                get_method_name_from_docker_image(lmethod) for lmethod in methods
-            ],
+            method_ids=[get_method_name(method) for method in methods],
             dataset_base_ids=[],
         )
+
         return run_benchmark_complexity(
             methods,
             cache_dir=os.path.join(self.cache_dir, "datagen"),
@@ -586,6 +803,10 @@ class LDIMBenchmark:
             n_repeats=n_repeats,
             n_measures=n_measures,
             n_max=n_max,
+            n_warmup=n_warmup,
+            parallel=parallel,
+            max_workers=max_workers,
+            simulator=simulator,
         )
 
     def run_benchmark(
@@ -595,11 +816,14 @@ class LDIMBenchmark:
         parallel=False,
         parallel_max_workers=0,
         memory_limit=None,
+        profile=False,
     ):
         """
         Runs the benchmark.
 
+        :param use_cached: Skip experiments which completed in a previous run (see :mod:`~ldimbenchmark.benchmark.journal`)
         :param parallel: If the benchmark should be run in parallel
+        :param profile: Capture a cProfile of the prepare and detect stages of each run (stored in `<run>/profiles/`)
         :param results_dir: Directory where the results should be stored
                 evaluation_mode       A string indicating the mode of the benchmark. If
                                 "training", the benchmark will be run in training mode and the training data of a data set will be used.
@@ -607,6 +831,7 @@ class LDIMBenchmark:
                                 evaluation mode and the evaluation data of a data set will be used.
                                 Default is "training".
         """
+        import enlighten
 
         if len(self.methods_docker) > 0 and len(self.methods_local) > 0:
             raise ValueError("Cannot run local and docker methods at the same time")
@@ -623,71 +848,19 @@ class LDIMBenchmark:
             dataset_base_ids=[dataset.id for dataset in self.datasets],
         )
 
-        # TODO: Move to parallel step execution step in run_benchmark, but still validate at least once
-        for dataset in self.datasets:
-            for method in self.methods_docker:
-                method_name = method.split(":")[0].split("/")[-1]
-                self.hyperparameter_list = [
-                    hyperparameters_map[method_name][dataset.id]
-                ]
-                if self.multi_parameters:
-                    self.hyperparameter_list = LDIMBenchmark._get_hyperparameters_matrix_from_hyperparameters_with_list(
-                        hyperparameters_map[method_name][dataset.id]
-                    )
-
-                logging.info(f"Generating {len(self.hyperparameter_list)} Experiments")
-                for hyperparameters in self.hyperparameter_list:
-                    self.experiments.append(
-                        DockerMethodRunner(
-                            method,
-                            dataset,
-                            evaluation_mode,
-                            hyperparameters,
-                            resultsFolder=self.runner_results_dir,
-                            debug=self.debug,
-                            cpu_count=1,
-                            mem_limit=memory_limit,
-                        )
-                    )
-
-            for method in self.methods_local:
-                self.hyperparameter_list = [
-                    hyperparameters_map[method.name][dataset.id]
-                ]
-                if self.multi_parameters:
-                    self.hyperparameter_list = LDIMBenchmark._get_hyperparameters_matrix_from_hyperparameters_with_list(
-                        hyperparameters_map[method.name][dataset.id]
-                    )
-
-                logging.info(f"Generating {len(self.hyperparameter_list)} Experiments")
-                for hyperparameters in self.hyperparameter_list:
-                    self.experiments.append(
-                        LocalMethodRunner(
-                            detection_method=method,
-                            dataset=dataset,
-                            dataset_part=evaluation_mode,
-                            hyperparameters=hyperparameters,
-                            resultsFolder=self.runner_results_dir,
-                            debug=self.debug,
-                        )
-                    )
+        # Experiments are generated lazily and their runners only created when they are executed
+        experiments = self._iterate_experiments(
+            hyperparameters_map, evaluation_mode, memory_limit, profile
+        )
+        num_experiments = self._count_experiments(hyperparameters_map)
+        logging.info(f"Generating {num_experiments} Experiments")
+        completed_runs = (
+            read_completed(self.runner_results_dir) if use_cached else set()
+        )
+        self.experiment_ids = []
 
-        # Remove already run experiments
-        result_folders = glob(os.path.join(self.runner_results_dir, "*"))
-        num_experiments = len(self.experiments)
-        self.initial_experiments = self.experiments
-        # for experiment in self.experiments:
-        #     if experiment.resultsFolder in result_folders:
-        #         self.experiments.remove(experiment)
-        if use_cached:
-            self.experiments = list(
-                filter(
-                    lambda x: x.resultsFolder not in result_folders, self.experiments
-                )
-            )
-        logging.info(f"Executing {len(self.experiments)} experiments.")
         manager = enlighten.get_manager()
-        if len(self.experiments) < num_experiments:
+        if len(completed_runs) > 0:
             status_bar = manager.status_bar(
                 " Using cached experiments! ",
                 position=1,
@@ -699,9 +872,18 @@ class LDIMBenchmark:
             total=num_experiments,
             desc="Experiments",
             unit="experiments",
-            count=num_experiments - len(self.experiments),
         )
         bar_experiments.refresh()
+
+        def pending_experiments():
+            # Remove already run experiments
+            for experiment in experiments:
+                self.experiment_ids.append(experiment.id)
+                if experiment.id in completed_runs:
+                    bar_experiments.update()
+                    continue
+                yield experiment
+
         # This line makes sure we can call update with an effect
         if parallel:
             worker_num = CPU_COUNT
@@ -710,11 +892,19 @@ class LDIMBenchmark:
             try:
                 # TODO Implement Staggering to alivate pressure on RAM through execution at the same time, instead spread them out
                 with ProcessPoolExecutor(max_workers=worker_num) as executor:
-                    # submit all tasks and get future objects
-                    futures = [
-                        executor.submit(execute_experiment, runner)
-                        for runner in self.experiments
-                    ]
+                    # Only keep a few experiments queued, so that not all runners are created up front
+                    futures = set()
+                    for experiment in pending_experiments():
+                        futures.add(
+                            executor.submit(
+                                execute_experiment, experiment.create_runner()
+                            )
+                        )
+                        if len(futures) >= 2 * worker_num:
+                            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                future.result()
+                                bar_experiments.update()
                     # process results from tasks in order of task completion
                     for future in as_completed(futures):
                         future.result()
@@ -725,19 +915,363 @@ class LDIMBenchmark:
                 os.kill(os.getpid(), 9)
                 manager.stop()
         else:
-            for experiment in self.experiments:
-                experiment.run()
+            for experiment in pending_experiments():
+                experiment.create_runner().run()
                 bar_experiments.update()
+        logging.info(f"Finished {len(self.experiment_ids)} experiments.")
         if "status_bar" in locals():
             status_bar.close()
         bar_experiments.close()
         manager.stop()
 
+    def _run_pending_experiments(
+        self, experiments: List[Experiment], parallel=False, parallel_max_workers=0
+    ):
+        """
+        Runs the experiments which have not completed yet, failed runs are only logged (and have no results).
+        """
+        completed_runs = read_completed(self.runner_results_dir)
+        pending = {
+            experiment.id: experiment
+            for experiment in experiments
+            if experiment.id not in completed_runs
+        }
+        if parallel and len(pending) > 1:
+            worker_num = (
+                CPU_COUNT if parallel_max_workers <= 0 else parallel_max_workers
+            )
+            with ProcessPoolExecutor(max_workers=worker_num) as executor:
+                futures = {
+                    executor.submit(
+                        execute_experiment, experiment.create_runner()
+                    ): experiment.id
+                    for experiment in pending.values()
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logging.warning(f"Run {futures[future]} failed: {e}")
+        else:
+            for experiment in pending.values():
+                try:
+                    experiment.create_runner().run()
+                except Exception as e:
+                    logging.warning(f"Run {experiment.id} failed: {e}")
+
+    def _score_run(self, run_id: str, metric: str) -> float:
+        """
+        Score of a run according to the evaluation metric (NaN if the run has no results).
+        """
+        result = load_result(os.path.join(self.runner_results_dir, run_id))
+        if len(result) == 0:
+            return np.nan
+        results = pd.DataFrame([result])
+        for function in [
+            precision,
+            recall,
+            specifity,
+            falsePositiveRate,
+            falseNegativeRate,
+            f1Score,
+        ]:
+            results = function(results)
+        # Metrics are undefined (NaN) if nothing was detected
+        return float(np.nan_to_num(results[metric].iloc[0]))
+
+    def run_hyperparameter_search(
+        self,
+        strategy: Literal["halving", "hyperband", "bayesian"] = "hyperband",
+        n_candidates: int = 27,
+        min_budget: float = 1 / 9,
+        eta: int = 3,
+        n_iterations: int = 20,
+        metric: str = "F1",
+        seed: int = None,
+        parallel=False,
+        parallel_max_workers=0,
+    ) -> pd.DataFrame:
+        """
+        Searches the hyperparameters of the methods on the training part of each dataset,
+        which needs far less full runs than the exhaustive grid search (`multi_parameters=True`).
+
+        Hyperparameters given as list in the benchmark hyperparameters are searched over these values,
+        numeric hyperparameters which are not given are searched between their `min` and `max` (see :class:`~ldimbenchmark.classes.Hyperparameter`).
+
+        Strategies (see :mod:`~ldimbenchmark.benchmark.search`):
+            "halving" - Successive halving: Evaluates `n_candidates` on `min_budget` of the training data and only promotes the best `1/eta` to the next (`eta` times longer) budget
+            "hyperband" - Successive halving in brackets with different numbers of candidates and starting budgets
+            "bayesian" - Bayesian optimization with a gaussian process surrogate, `n_iterations` runs on the full training data
+
+        :param metric: Evaluation metric to maximize (e.g. "F1" or "precision")
+        :param seed: Seed for sampling the candidates
+        :return: The trials (method, dataset, budget, hyperparameters, score and run id of each evaluation),
+            see :func:`~ldimbenchmark.benchmark.search.get_best_hyperparameters` for the best hyperparameters
+        """
+        from ldimbenchmark.benchmark.search import (
+            bayesian_optimization,
+            get_search_space,
+            get_training_slice,
+            hyperband,
+            sample_candidates,
+            successive_halving,
+        )
+
+        hyperparameters_map = self._get_hyperparameters_for_methods_and_datasets(
+            hyperparameters=self.hyperparameters,
+            method_ids=[
+                get_method_name_from_docker_image(dmethod)
+                for dmethod in self.methods_docker
+            ]
+            + [lmethod.name for lmethod in self.methods_local],
+            dataset_base_ids=[dataset.id for dataset in self.datasets],
+        )
+        random_state = np.random.default_rng(seed)
+
+        trials = []
+        for dataset in self.datasets:
+            sliced_datasets = {}
+            for method in self.methods_docker + self.methods_local:
+                if isinstance(method, str):
+                    method_id = get_method_name_from_docker_image(method)
+                    # The hyperparameter definitions are only known inside of the container
+                    method_hyperparameters = []
+                else:
+                    method_id = method.name
+                    method_hyperparameters = method.metadata["hyperparameters"]
+                space, fixed = get_search_space(
+                    hyperparameters_map[method_id][dataset.id], method_hyperparameters
+                )
+                if len(space) == 0:
+                    raise ValueError(
+                        f"No hyperparameters to search for method {method_id} on dataset {dataset.id}"
+                    )
+                run_ids = {}
+
+                def evaluate(candidates: List[Dict], budget: float) -> List[float]:
+                    if budget not in sliced_datasets:
+                        sliced_datasets[budget] = get_training_slice(dataset, budget)
+                    experiments = [
+                        self._create_experiment(
+                            method,
+                            sliced_datasets[budget],
+                            "training",
+                            {**fixed, **candidate},
+                        )
+                        for candidate in candidates
+                    ]
+                    self._run_pending_experiments(
+                        experiments, parallel, parallel_max_workers
+                    )
+                    for candidate, experiment in zip(candidates, experiments):
+                        run_ids[(budget, str(candidate))] = experiment.id
+                    return [
+                        self._score_run(experiment.id, metric)
+                        for experiment in experiments
+                    ]
+
+                logging.info(
+                    f"Searching hyperparameters {list(space.keys())} of {method_id} on {dataset.id} ({strategy})"
+                )
+                if strategy == "halving":
+                    method_trials = successive_halving(
+                        evaluate,
+                        sample_candidates(space, n_candidates, random_state),
+                        min_budget=min_budget,
+                        eta=eta,
+                    )
+                elif strategy == "hyperband":
+                    method_trials = hyperband(
+                        evaluate,
+                        space,
+                        min_budget=min_budget,
+                        eta=eta,
+                        random_state=random_state,
+                    )
+                elif strategy == "bayesian":
+                    method_trials = bayesian_optimization(
+                        evaluate,
+                        space,
+                        n_iterations=n_iterations,
+                        random_state=random_state,
+                    )
+                else:
+                    raise ValueError(f"Unknown search strategy '{strategy}'")
+
+                for trial in method_trials:
+                    trials.append(
+                        {
+                            "method": method_id,
+                            "dataset": dataset.id,
+                            "strategy": strategy,
+                            **trial,
+                            "hyperparameters": {**fixed, **trial["hyperparameters"]},
+                            "run_id": run_ids[
+                                (trial["budget"], str(trial["hyperparameters"]))
+                            ],
+                        }
+                    )
+        return pd.DataFrame(trials)
+
+    def run_smoke_benchmark(
+        self,
+        evaluation_mode: Union["training", "evaluation"] = "evaluation",
+        n_leaks: int = 5,
+        n_leak_free: int = 2,
+        window_before: Union[str, pd.Timedelta] = "1D",
+        window_after: Union[str, pd.Timedelta] = "2D",
+        training_length: Union[str, pd.Timedelta, None] = "7D",
+        confidence: float = 0.95,
+        n_bootstrap: int = 1000,
+        seed: int = None,
+        parallel=False,
+        parallel_max_workers=0,
+        print_results: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Runs all methods only on short windows of each dataset for fast feedback (see :mod:`~ldimbenchmark.benchmark.smoke`).
+
+        For each dataset `n_leaks` of its leaks are sampled, each leak window spans from `window_before` to `window_after` the leak start.
+        Additionally `n_leak_free` windows of the same length without any leak are sampled.
+        Each window is a separate run, so the runs are cached like the runs of `run_benchmark`.
+        As the methods are prepared for every window, the training part is shortened to its last `training_length` (in evaluation mode).
+        Docker methods receive the windows through their options (see :meth:`~ldimbenchmark.DockerMethodRunner.get_options`).
+
+        :param evaluation_mode: Dataset part to select the windows from
+        :param training_length: Length of the training data the methods are prepared on, None for the full training part
+        :param confidence: Confidence level of the estimated metrics
+        :param n_bootstrap: Number of bootstrap resamples of the windows
+        :param seed: Seed for sampling the windows
+        :return: Estimated precision, recall and F1 (with confidence intervals) per method, hyperparameters and dataset,
+            see :func:`~ldimbenchmark.benchmark.smoke.bootstrap_metrics`
+        """
+        from ldimbenchmark.benchmark.smoke import bootstrap_metrics, get_smoke_windows
+
+        if len(self.methods_docker) > 0 and len(self.methods_local) > 0:
+            raise ValueError("Cannot run local and docker methods at the same time")
+
+        hyperparameters_map = self._get_hyperparameters_for_methods_and_datasets(
+            hyperparameters=self.hyperparameters,
+            method_ids=[
+                get_method_name_from_docker_image(dmethod)
+                for dmethod in self.methods_docker
+            ]
+            + [lmethod.name for lmethod in self.methods_local],
+            dataset_base_ids=[dataset.id for dataset in self.datasets],
+        )
+        random_state = np.random.default_rng(seed)
+
+        experiments = []
+        runs = []
+        for dataset in self.datasets:
+            # Only the leaks are needed to select the windows
+            dataset.loadData({sensor_type: "ignored" for sensor_type in SENSOR_TYPES})
+            part = dataset.info["dataset"][evaluation_mode]
+            windows = get_smoke_windows(
+                dataset.leaks,
+                part["start"],
+                part["end"],
+                n_leaks=n_leaks,
+                n_leak_free=n_leak_free,
+                before=pd.Timedelta(window_before),
+                after=pd.Timedelta(window_after),
+                random_state=random_state,
+            )
+            logging.info(
+                f"Smoke benchmark: Running on {len(windows)} windows of {dataset.id}"
+            )
+            training_dataset = dataset
+            training = dataset.info["dataset"]["training"]
+            if (
+                evaluation_mode == "evaluation"
+                and training_length is not None
+                and training["end"] - training["start"] > pd.Timedelta(training_length)
+            ):
+                training_dataset = get_dataset_time_slice(
+                    dataset,
+                    "training",
+                    training["end"] - pd.Timedelta(training_length),
+                    training["end"],
+                )
+            for window_start, window_end, kind in windows:
+                window_dataset = get_dataset_time_slice(
+                    training_dataset, evaluation_mode, window_start, window_end
+                )
+                for method in self.methods_docker + self.methods_local:
+                    method_id = (
+                        get_method_name_from_docker_image(method)
+                        if isinstance(method, str)
+                        else method.name
+                    )
+                    hyperparameters_list = (
+                        LDIMBenchmark._iterate_hyperparameters_matrix(
+                            hyperparameters_map[method_id][dataset.id]
+                        )
+                        if self.multi_parameters
+                        else [hyperparameters_map[method_id][dataset.id]]
+                    )
+                    for hyperparameters in hyperparameters_list:
+                        experiment = self._create_experiment(
+                            method, window_dataset, evaluation_mode, hyperparameters
+                        )
+                        experiments.append(experiment)
+                        runs.append(
+                            {
+                                "method": method_id,
+                                "hyperparameters": str(hyperparameters),
+                                "dataset": dataset.id,
+                                "window": kind,
+                                "run_id": experiment.id,
+                            }
+                        )
+
+        self._run_pending_experiments(experiments, parallel, parallel_max_workers)
+        self.experiment_ids = [experiment.id for experiment in experiments]
+
+        for run in runs:
+            result = load_result(os.path.join(self.runner_results_dir, run["run_id"]))
+            for column in ["true_positives", "false_positives", "false_negatives"]:
+                run[column] = result.get(column, np.nan)
+        runs = pd.DataFrame(runs)
+        failed_runs = runs["true_positives"].isna()
+        if failed_runs.any():
+            logging.warning(
+                f"Smoke benchmark: Ignoring {failed_runs.sum()} runs without results"
+            )
+        results = bootstrap_metrics(
+            runs[~failed_runs],
+            by=["method", "hyperparameters", "dataset"],
+            confidence=confidence,
+            n_bootstrap=n_bootstrap,
+            random_state=random_state,
+        )
+
+        if print_results:
+            from tabulate import tabulate
+
+            print(tabulate(results, headers="keys"))
+        return results
+
+    def aggregate_profiles(
+        self,
+        method: str = None,
+        stage: Literal["prepare", "detect"] = "detect",
+        top: int = 20,
+    ):
+        """
+        Aggregates the hot functions of the profiled runs (see `run_benchmark(profile=True)`).
+        """
+        return aggregate_profiles(
+            self.runner_results_dir, method=method, stage=stage, top=top
+        )
+
     def evaluate_derivations(self):
         sensitivity_results_folder = os.path.join(
             self.evaluation_results_dir, "sensitvity"
         )
         os.makedirs(sensitivity_results_folder, exist_ok=True)
+        from ldimbenchmark.evaluation.sensitivity import evaluate_derivations
+
         evaluate_derivations(
             os.path.join(self.evaluation_results_dir, "results.db"),
             sensitivity_results_folder,
@@ -763,7 +1297,11 @@ class LDIMBenchmark:
 
         :param current_only: Switch for either evaluating only the current benchmark or incorporate previous runs.
         :param write_results: Write the evaluation results to the results directory.
+            With "db" the runs are upserted into results.db, runs of previous evaluations are kept.
         :param evaluations: The Evaluation Metrics to be run.
+
+        The leak pairs of all evaluated runs are kept in `matches` afterwards
+        (see :func:`~ldimbenchmark.evaluation_metrics.matches.aggregate_matches` for evaluating groups of runs).
         """
 
         if not isinstance(write_results, list):
@@ -786,35 +1324,43 @@ class LDIMBenchmark:
             lambda x: os.path.basename(x)
         )
 
-        pickle_cache_path = os.path.join(self.cache_dir, "results.pkl")
-        if os.path.exists(pickle_cache_path):
+        runs_cache_path = os.path.join(self.cache_dir, "runs.pkl")
+        matches_cache_path = os.path.join(self.cache_dir, "matches.pkl")
+        if os.path.exists(runs_cache_path) and os.path.exists(matches_cache_path):
             logging.info("Reading results from Cache")
-            previous_results = pd.read_pickle(pickle_cache_path)
+            previous_runs = pd.read_pickle(runs_cache_path)
+            previous_matches = pd.read_pickle(matches_cache_path)
 
             result_folders_frame = result_folders_frame[
-                ~result_folders_frame["id"].isin(previous_results["_folder"])
+                ~result_folders_frame["id"].isin(previous_runs["_folder"])
             ]
             result_folders = list(result_folders_frame[0].values)
         else:
-            previous_results = pd.DataFrame(columns=["_folder"])
+            previous_runs = pd.DataFrame(columns=["_folder"])
+            previous_matches = pd.DataFrame(columns=MATCHES_COLUMNS)
 
         if current_only:
-            if not hasattr(self, "initial_experiments"):
+            if len(self.experiment_ids) == 0:
                 logging.warning(
                     "Ignoring current_only switch, since no initial experiments were set. This is probably because 'run_benchmark' was not executed before."
                 )
             else:
-                experiment_ids = [exp.id for exp in self.initial_experiments]
+                experiment_ids = self.experiment_ids
                 result_folders_frame = result_folders_frame[
                     result_folders_frame["id"].isin(experiment_ids)
                 ]
 
-                previous_results = previous_results[
-                    previous_results["_folder"].isin(experiment_ids)
+                previous_runs = previous_runs[
+                    previous_runs["_folder"].isin(experiment_ids)
+                ]
+                previous_matches = previous_matches[
+                    previous_matches["run_id"].isin(experiment_ids)
                 ]
 
                 result_folders = list(result_folders_frame[0].values)
 
+        import enlighten
+
         manager = enlighten.get_manager()
         pbar1 = manager.counter(
             total=len(result_folders),
@@ -822,27 +1368,47 @@ class LDIMBenchmark:
             unit="results",
         )
         pbar1.refresh()
-        results = []
+        runs = [previous_runs]
+        matches = [previous_matches.astype({"run_id": str})]
         parallel = True
         if parallel == True:
-            with ProcessPoolExecutor() as executor:
+            # Chunks of runs per task, so that the workers return few but large tables
+            chunk_size = max(1, min(256, len(result_folders) // (CPU_COUNT * 4)))
+            with ProcessPoolExecutor(max_workers=CPU_COUNT) as executor:
                 # submit all tasks and get future objects
-                futures = [
-                    executor.submit(load_result, folder) for folder in result_folders
-                ]
+                futures = {
+                    executor.submit(
+                        load_runs, result_folders[start : start + chunk_size]
+                    ): len(result_folders[start : start + chunk_size])
+                    for start in range(0, len(result_folders), chunk_size)
+                }
                 # process results from tasks in order of task completion
                 for future in as_completed(futures):
-                    result = future.result()
-                    results.append(result)
-                    pbar1.update()
+                    chunk_runs, chunk_matches = future.result()
+                    runs.append(chunk_runs)
+                    matches.append(chunk_matches)
+                    pbar1.update(futures[future])
         else:
-            for experiment_result in result_folders:
-                results.append(load_result(experiment_result))
-                pbar1.update()
+            chunk_runs, chunk_matches = load_runs(result_folders)
+            runs.append(chunk_runs)
+            matches.append(chunk_matches)
+            pbar1.update(len(result_folders))
         pbar1.close()
 
-        results = pd.concat([previous_results, pd.DataFrame(results)])
-        results.to_pickle(pickle_cache_path)
+        runs = pd.concat(runs, ignore_index=True)
+        matches = pd.concat(matches, ignore_index=True)
+        runs.to_pickle(runs_cache_path)
+        matches.to_pickle(matches_cache_path)
+
+        # All metrics are calculated on the matches of all runs at once
+        matches["run_id"] = pd.Categorical(
+            matches["run_id"], categories=runs["_folder"].unique()
+        )
+        self.matches = matches
+        counts = count_matches(matches, "run_id").reindex(runs["_folder"])
+        results = pd.concat(
+            [counts.reset_index(drop=True), runs.reset_index(drop=True)], axis=1
+        )
 
         for function in evaluations:
             results = function(results)
@@ -850,33 +1416,19 @@ class LDIMBenchmark:
         results = resultFilter(results)
         # https://towardsdatascience.com/performance-metrics-confusion-matrix-precision-recall-and-f1-score-a8fe076a2262
         results = results.set_index(["_folder"])
-        results["times_to_detection"] = results["times_to_detection"].astype(str)
 
         os.makedirs(self.evaluation_results_dir, exist_ok=True)
 
         if "csv" in write_results:
-            results = results.drop(
-                columns=["matched_leaks_list", "detected_leaks_frame"]
-            )
             logging.info("Writing results as csv")
             results.to_csv(os.path.join(self.evaluation_results_dir, "results.csv"))
 
         if "db" in write_results:
             logging.info("Writing results to database")
-            result_db = os.path.join(self.evaluation_results_dir, "results.db")
-            if os.path.exists(result_db):
-                os.remove(result_db)
-            engine = create_engine(f"sqlite:///{result_db}")
-            leak_pairs = pd.concat(list(results["detected_leaks_frame"]))
-
-            leak_pairs.to_sql("leak_pairs", engine, if_exists="replace")
-            results = results.drop(
-                columns=[
-                    "matched_leaks_list",
-                    "detected_leaks_frame",
-                ]
-            )
-            results.to_sql("results", engine, if_exists="replace")
+            with ResultsDatabase(
+                os.path.join(self.evaluation_results_dir, "results.db")
+            ) as database:
+                database.write_results(results, matches)
 
         # Generate Heatmaps if multiple parameters are used
         if self.multi_parameters and "png" in write_results:
@@ -925,14 +1477,13 @@ class LDIMBenchmark:
         console_display = results.drop(
             columns=[
                 "_folder",
-                "matched_leaks_list",
-                "detected_leaks_frame",
-                "times_to_detection",
                 "train_time",
                 "detect_time",
                 "time_initializing",
                 "total_time",
                 "method_time",
+                "memory_max",
+                "memory_avg",
             ],
             errors="ignore",
         )
@@ -980,26 +1531,142 @@ class LDIMBenchmark:
         manager.stop()
 
         if print_results:
+            from tabulate import tabulate
+
             print(tabulate(console_display, headers="keys"))
         return results
 
-    def evaluate_run(self, run_id: str, boundary_timespan_overwrite=None):
+    def _get_dataset(self, dataset_id: str) -> Dataset:
+        """
+        Finds the dataset with the given id in the datasets of the benchmark.
+
+        Runs on a time slice of a dataset (e.g. of the smoke benchmark) have the id of the slice, which is not part of the benchmark.
+        """
+        if dataset_id not in self._datasets_by_id:
+            raise Exception(f"Dataset '{dataset_id}' is not part of the benchmark")
+        return self._datasets_by_id[dataset_id]
+
+    def _load_run_dataset(
+        self,
+        dataset_id: str,
+        dataset_part: Literal["training", "evaluation"] = "evaluation",
+    ):
+        """
+        Loads only the data needed for plotting a run: pressures and flows in the time window of the run.
+
+        :return: The dataset and the loaded part of it
+        """
+        dataset = self._get_dataset(dataset_id)
+        if hasattr(dataset, "full_dataset_part"):
+            full_data = dataset.loadData().full_dataset_part
+        else:
+            # Loaded through the dataset cache, but not kept in memory
+            full_data = (
+                Dataset(dataset.path, cache_dir=dataset.cache_dir)
+                .loadData({"demands": "ignored", "levels": "ignored"})
+                .full_dataset_part
+            )
+        if dataset_part != "training":
+            dataset_part = "evaluation"
+        return dataset, extractSubDataset(dataset_part, dataset.info, full_data)
+
+    def evaluate_run(
+        self,
+        run_id: str,
+        boundary_timespan_overwrite=None,
+        parallel: bool = True,
+        max_workers: int = None,
+    ):
+        """
+        Plots an overview of the leaks of a run and one plot per leak pair (in `<evaluation_results_dir>/per_run/<run_id>`).
+
+        Only the dataset of the run is loaded.
+
+        :param boundary_timespan_overwrite: Timespan shown around each leak
+        :param parallel: Render the plots per leak in multiple processes
+        :param max_workers: Number of processes for rendering, defaults to the cpu count
+        """
+        self.evaluate_runs(
+            [run_id],
+            boundary_timespan_overwrite=boundary_timespan_overwrite,
+            parallel=parallel,
+            max_workers=max_workers,
+        )
+
+    def evaluate_runs(
+        self,
+        run_ids: List[str] = None,
+        boundary_timespan_overwrite=None,
+        parallel: bool = True,
+        max_workers: int = None,
+    ):
+        """
+        Plots many runs (see :meth:`evaluate_run`), loading each dataset only once for all of its runs.
+
+        :param run_ids: Runs to plot, defaults to all runs in the results folder (on datasets of the benchmark)
+        """
+        all_runs = run_ids is None
+        if all_runs:
+            run_ids = [
+                os.path.basename(os.path.normpath(folder))
+                for folder in glob(os.path.join(self.runner_results_dir, "*", ""))
+            ]
+
+        runs_per_dataset: Dict[tuple, List[str]] = {}
+        for run_id in run_ids:
+            run_info_file = os.path.join(
+                self.runner_results_dir, run_id, "run_info.csv"
+            )
+            if not os.path.isfile(run_info_file):
+                logging.warning(f"Run {run_id} has no results, skipping it")
+                continue
+            run_info = pd.read_csv(run_info_file).iloc[0]
+            if all_runs and run_info["dataset_id"] not in self._datasets_by_id:
+                logging.warning(
+                    f"Run {run_id} is on dataset {run_info['dataset_id']}, which is not part of the benchmark, skipping it"
+                )
+                continue
+            dataset_part = run_info.get("dataset_part", "evaluation")
+            runs_per_dataset.setdefault(
+                (run_info["dataset_id"], dataset_part), []
+            ).append(run_id)
+
+        for (dataset_id, dataset_part), dataset_run_ids in runs_per_dataset.items():
+            dataset, run_data = self._load_run_dataset(dataset_id, dataset_part)
+            for run_id in dataset_run_ids:
+                self._plot_run(
+                    run_id,
+                    dataset,
+                    run_data,
+                    boundary_timespan_overwrite=boundary_timespan_overwrite,
+                    parallel=parallel,
+                    max_workers=max_workers,
+                )
+
+    def _plot_run(
+        self,
+        run_id: str,
+        dataset: Dataset,
+        run_data,
+        boundary_timespan_overwrite=None,
+        parallel: bool = True,
+        max_workers: int = None,
+    ):
         logging.info(f"Evaluating run {run_id}")
         result_folder = os.path.join(self.runner_results_dir, run_id)
         result = load_result(result_folder)
+        if len(result) == 0:
+            return
 
-        manager = enlighten.get_manager()
-        loaded_datasets = {}
-        # TODO: Load datasets from Ids of the to evaluate run...
-        for dataset in self.datasets:
-            if type(dataset) is str:
-                loaded = Dataset(dataset)
-            else:
-                loaded = dataset
+        import enlighten
+        import matplotlib.pyplot as plt
+        import matplotlib.dates as mdates
+        from matplotlib import patches
 
-            loaded_datasets[dataset.id] = loaded.loadData()
-            if not hasattr(loaded_datasets[dataset.id], "derivations"):
-                loaded_datasets[dataset.name] = loaded_datasets[dataset.id]
+        manager = enlighten.get_manager()
+        dataset_part = (
+            "training" if result["dataset_part"] == "training" else "evaluation"
+        )
         graph_dir = os.path.join(self.evaluation_results_dir, "per_run", run_id)
         os.makedirs(graph_dir, exist_ok=True)
 
@@ -1057,10 +1724,8 @@ class LDIMBenchmark:
         ax.set_ylabel("leaks")
         ax.set_xlabel("time")
         ax.set_xlim(
-            loaded_datasets[result["dataset_id"]].info["dataset"]["evaluation"][
-                "start"
-            ],
-            loaded_datasets[result["dataset_id"]].info["dataset"]["evaluation"]["end"],
+            dataset.info["dataset"][dataset_part]["start"],
+            dataset.info["dataset"][dataset_part]["end"],
         )
         yellow_patch = patches.Patch(color="yellow", label="expected leaks")
         green_patch = patches.Patch(color="green", label="detected leaks")
@@ -1070,26 +1735,48 @@ class LDIMBenchmark:
         plt.close(fig)
 
         logging.info("Generating plots per leak ...")
+        # Only the windows around the leaks are passed to the workers (not the whole dataset)
+        plots = [
+            get_leak_plot_data(
+                run_data,
+                leak_pair,
+                additional_data_dir=result_folder,
+                boundary_timespan_overwrite=boundary_timespan_overwrite,
+            )
+            for leak_pair in result["matched_leaks_list"]
+        ]
+
+        # Skip plots whose inputs did not change since they were last rendered
+        plot_hashes_file = os.path.join(graph_dir, ".leak_plots.json")
+        plot_hashes = {}
+        if os.path.isfile(plot_hashes_file):
+            with open(plot_hashes_file) as f:
+                plot_hashes = json.load(f)
+        new_plot_hashes = {}
+        plots_to_render = []
+        for plot_data in plots:
+            plot_hash = get_leak_plot_hash(plot_data)
+            new_plot_hashes[plot_data["name"]] = plot_hash
+            if plot_hashes.get(plot_data["name"]) != plot_hash or not os.path.isfile(
+                os.path.join(graph_dir, plot_data["name"] + ".png")
+            ):
+                plots_to_render.append(plot_data)
+
         pbar2 = manager.counter(
-            total=len(result["matched_leaks_list"]),
+            total=len(plots_to_render),
             desc="Graphs:",
             unit="graphs",
         )
-        parallel = False
-        if parallel:
-            with ProcessPoolExecutor(max_workers=CPU_COUNT) as executor:
+        if parallel and len(plots_to_render) > 1:
+            with ProcessPoolExecutor(
+                max_workers=CPU_COUNT if max_workers is None else max_workers,
+                initializer=_init_plot_worker,
+            ) as executor:
                 # submit all tasks and get future objects
-                futures = []
-                for leak_pair in result["matched_leaks_list"]:
-                    future = executor.submit(
-                        plot_leak,
-                        loaded_datasets[result["dataset_id"]],
-                        leak_pair=leak_pair,
-                        additional_data_dir=result_folder,
-                        out_dir=graph_dir,
-                        boundary_timespan_overwrite=boundary_timespan_overwrite,
-                    )
-                    futures.append(future)
+                futures = [
+                    executor.submit(render_leak_plot, plot_data, graph_dir)
+                    for plot_data in plots_to_render
+                ]
 
                 # process results from tasks in order of task completion
                 for future in as_completed(futures):
@@ -1097,14 +1784,11 @@ class LDIMBenchmark:
                     pbar2.update()
 
         else:
-            for leak_pair in result["matched_leaks_list"]:
-                plot_leak(
-                    loaded_datasets[result["dataset_id"]],
-                    leak_pair=leak_pair,
-                    additional_data_dir=result_folder,
-                    out_dir=graph_dir,
-                )
+            for plot_data in plots_to_render:
+                render_leak_plot(plot_data, graph_dir)
                 pbar2.update()
+        with open(plot_hashes_file, "w") as f:
+            json.dump(new_plot_hashes, f)
         pbar2.close()
         manager.stop()
 
@@ -0,0 +1,50 @@
+"""
+Journal of the completed runs in a runner results directory.
+
+A run is appended (as one line with its id) after all its results are written,
+so that crashed runs are not mistaken as complete when resuming a benchmark.
+"""
+from glob import glob
+import logging
+import os
+from typing import Set
+
+COMPLETION_JOURNAL = ".completed_runs"
+
+
+def write_completed(results_dir: str, run_id: str):
+    """
+    Marks a run as completed.
+
+    The line is written with a single append, which is atomic for concurrent runners writing to the same journal.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    file = os.open(
+        os.path.join(results_dir, COMPLETION_JOURNAL),
+        os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+    )
+    try:
+        os.write(file, f"{run_id}\n".encode("utf-8"))
+    finally:
+        os.close(file)
+
+
+def read_completed(results_dir: str) -> Set[str]:
+    """
+    Ids of the completed runs in the results directory.
+
+    Results directories written before the journal existed are journaled once from the runs that have a run_info.csv.
+    """
+    journal_path = os.path.join(results_dir, COMPLETION_JOURNAL)
+    if not os.path.exists(journal_path):
+        run_folders = glob(os.path.join(results_dir, "*", "run_info.csv"))
+        if len(run_folders) == 0:
+            return set()
+        logging.info(f"Creating completion journal for {len(run_folders)} runs")
+        for run_info in run_folders:
+            write_completed(results_dir, os.path.basename(os.path.dirname(run_info)))
+
+    with open(journal_path, "rb") as f:
+        lines = f.read().decode("utf-8").split("\n")
+    # The last entry is incomplete (or empty) if it is not terminated by a newline
+    return set(line for line in lines[:-1] if line != "")
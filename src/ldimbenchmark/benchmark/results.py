@@ -1,21 +1,28 @@
 from ast import Dict
+from glob import glob
 import logging
 import os
+import pstats
+from typing import List, Literal
 import numpy as np
 
 import pandas as pd
 from ldimbenchmark.benchmark_evaluation import evaluate_leakages
 from ldimbenchmark.classes import BenchmarkLeakageResult
+from ldimbenchmark.evaluation_metrics.matches import (
+    MATCHES_COLUMNS,
+    get_matches_table,
+)
 
 
-def load_result(folder: str, try_load_docker_stats=False) -> Dict:
-    folder = os.path.join(folder, "")
-    index = os.path.basename(os.path.dirname(folder))
-
+def _read_run_leaks(folder: str):
+    """
+    Reads the detected and the expected leaks of a run (None if the run has no results).
+    """
     detected_leaks_file = os.path.join(folder, "detected_leaks.csv")
     if not os.path.exists(detected_leaks_file):
         logging.warning(f"No detected_leaks.csv found in {folder}")
-        return {}
+        return None, None
 
     detected_leaks = pd.read_csv(
         detected_leaks_file,
@@ -28,27 +35,16 @@ def load_result(folder: str, try_load_docker_stats=False) -> Dict:
         parse_dates=True,
         date_parser=lambda x: pd.to_datetime(x, utc=True),
     )
+    return evaluation_dataset_leakages, detected_leaks
 
-    run_info = pd.read_csv(os.path.join(folder, "run_info.csv")).iloc[0]
 
-    # TODO: Ignore Detections outside of the evaluation period
-    (evaluation_results, matched_list) = evaluate_leakages(
-        evaluation_dataset_leakages, detected_leaks
-    )
-    matched_frame = pd.DataFrame(matched_list, columns=[0, 1])
-    detected_leaks_frame = pd.DataFrame(
-        pd.json_normalize(matched_frame[1]).add_prefix("detected."),
-        columns=[
-            "expected." + key
-            for key in list(BenchmarkLeakageResult.__annotations__.keys())
-        ]
-        + [
-            "detected." + key
-            for key in list(BenchmarkLeakageResult.__annotations__.keys())
-        ],
-    )
-    detected_leaks_frame["result_id"] = index
+def _get_run_record(folder: str, index: str, try_load_docker_stats=False) -> Dict:
+    """
+    Flat information about a run (method, dataset, timings and resource usage).
+    """
+    run_info = pd.read_csv(os.path.join(folder, "run_info.csv")).iloc[0]
 
+    evaluation_results = {}
     evaluation_results["method"] = run_info["method"]
     evaluation_results["method_version"] = run_info.get("method_version", None)
     evaluation_results["dataset"] = run_info["dataset"]
@@ -56,8 +52,6 @@ def load_result(folder: str, try_load_docker_stats=False) -> Dict:
     evaluation_results["dataset_id"] = run_info["dataset_id"]
     evaluation_results["dataset_derivations"] = run_info["dataset_options"]
     evaluation_results["hyperparameters"] = run_info["hyperparameters"]
-    evaluation_results["matched_leaks_list"] = matched_list
-    evaluation_results["detected_leaks_frame"] = detected_leaks_frame
 
     evaluation_results["_folder"] = index
     evaluation_results["executed_at"] = run_info.get("executed_at", None)
@@ -69,34 +63,193 @@ def load_result(folder: str, try_load_docker_stats=False) -> Dict:
         evaluation_results["train_time"] + evaluation_results["detect_time"]
     )
 
+    # Resource usage of local runs (see StageInstrumentation)
+    evaluation_results["memory_max"] = run_info.get("memory_max", None)
+    evaluation_results["memory_avg"] = run_info.get("memory_avg", None)
+
     if try_load_docker_stats:
         stats_file = os.path.join(folder, "stats.csv")
         if os.path.exists(stats_file):
             stats = pd.read_csv(stats_file)
 
-            # Convert string columns to Dictionary columns
-            stats["pids_stats"] = stats["pids_stats"].apply(lambda x: eval(x))
-            stats["blkio_stats"] = stats["blkio_stats"].apply(lambda x: eval(x))
-            stats["cpu_stats"] = stats["cpu_stats"].apply(lambda x: eval(x))
-            stats["precpu_stats"] = stats["precpu_stats"].apply(lambda x: eval(x))
-            stats["memory_stats"] = stats["memory_stats"].apply(lambda x: eval(x))
-            # stats["networks"] = stats["networks"].apply(lambda x: eval(x))
-
-            flat_stats = pd.json_normalize(stats.to_dict(orient="records"))
-
-            # According to https://github.com/docker/cli/blob/e57b5f78de635e6e2b688686d10b830c4747c4dc/cli/command/container/stats_helpers.go#L239
-            if ("memory_stats.stats.inactive_file" in flat_stats.columns) and (
-                flat_stats["memory_stats.stats.inactive_file"]
-                .gt(flat_stats["memory_stats.usage"])
-                .all()
-            ):
-                memory = (
-                    flat_stats["memory_stats.usage"]
-                    - flat_stats["memory_stats.stats.inactive_file"]
-                )
+            if "memory" in stats.columns:
+                evaluation_results["memory_avg"] = stats["memory"].mean()
+                # The cgroup peak also captures spikes between two samples
+                if stats["memory_peak"].notna().any():
+                    evaluation_results["memory_max"] = stats["memory_peak"].max()
+                else:
+                    evaluation_results["memory_max"] = stats["memory"].max()
             else:
-                memory = flat_stats["memory_stats.usage"]
-            evaluation_results["memory_avg"] = memory.mean()
-            evaluation_results["memory_max"] = memory.max()
+                # Legacy format: Convert string columns to Dictionary columns
+                stats["pids_stats"] = stats["pids_stats"].apply(lambda x: eval(x))
+                stats["blkio_stats"] = stats["blkio_stats"].apply(lambda x: eval(x))
+                stats["cpu_stats"] = stats["cpu_stats"].apply(lambda x: eval(x))
+                stats["precpu_stats"] = stats["precpu_stats"].apply(lambda x: eval(x))
+                stats["memory_stats"] = stats["memory_stats"].apply(lambda x: eval(x))
+                # stats["networks"] = stats["networks"].apply(lambda x: eval(x))
+
+                flat_stats = pd.json_normalize(stats.to_dict(orient="records"))
+
+                # According to https://github.com/docker/cli/blob/e57b5f78de635e6e2b688686d10b830c4747c4dc/cli/command/container/stats_helpers.go#L239
+                if ("memory_stats.stats.inactive_file" in flat_stats.columns) and (
+                    flat_stats["memory_stats.stats.inactive_file"]
+                    .gt(flat_stats["memory_stats.usage"])
+                    .all()
+                ):
+                    memory = (
+                        flat_stats["memory_stats.usage"]
+                        - flat_stats["memory_stats.stats.inactive_file"]
+                    )
+                else:
+                    memory = flat_stats["memory_stats.usage"]
+                evaluation_results["memory_avg"] = memory.mean()
+                evaluation_results["memory_max"] = memory.max()
 
     return evaluation_results
+
+
+def load_run(folder: str, try_load_docker_stats=False):
+    """
+    Loads a run as flat record and its leak pairs as matches table
+    (see :func:`~ldimbenchmark.evaluation_metrics.matches.get_matches_table`).
+
+    Other than `load_result` no python objects are kept per leak pair, so that many runs can be evaluated at once.
+
+    :return: Tuple of the run record and the matches (None, None if the run has no results)
+    """
+    folder = os.path.join(folder, "")
+    index = os.path.basename(os.path.dirname(folder))
+
+    expected_leaks, detected_leaks = _read_run_leaks(folder)
+    if expected_leaks is None:
+        return None, None
+
+    # TODO: Ignore Detections outside of the evaluation period
+    _, matched_list = evaluate_leakages(expected_leaks, detected_leaks)
+    return _get_run_record(folder, index, try_load_docker_stats), get_matches_table(
+        matched_list, index
+    )
+
+
+def load_runs(folders: List[str], try_load_docker_stats=False):
+    """
+    Loads a chunk of runs (see `load_run`) as one runs table and one matches table.
+
+    Returning columnar tables per chunk (instead of python objects per run) keeps sending them back from worker processes cheap.
+
+    :return: Tuple of the runs (one row per run) and the matches of the runs
+    """
+    runs = []
+    matches = []
+    for folder in folders:
+        run, run_matches = load_run(folder, try_load_docker_stats)
+        if run is not None:
+            runs.append(run)
+            matches.append(run_matches)
+
+    runs = pd.DataFrame(runs)
+    if len(matches) > 0:
+        matches = pd.concat(matches, ignore_index=True)
+    else:
+        matches = pd.DataFrame(columns=MATCHES_COLUMNS)
+    # The run id is repeated for every leak pair of the run
+    matches["run_id"] = matches["run_id"].astype("category")
+    return runs, matches
+
+
+def load_result(folder: str, try_load_docker_stats=False) -> Dict:
+    folder = os.path.join(folder, "")
+    index = os.path.basename(os.path.dirname(folder))
+
+    evaluation_dataset_leakages, detected_leaks = _read_run_leaks(folder)
+    if evaluation_dataset_leakages is None:
+        return {}
+
+    # TODO: Ignore Detections outside of the evaluation period
+    (evaluation_results, matched_list) = evaluate_leakages(
+        evaluation_dataset_leakages, detected_leaks
+    )
+    matched_frame = pd.DataFrame(matched_list, columns=[0, 1])
+    detected_leaks_frame = pd.DataFrame(
+        pd.json_normalize(matched_frame[1]).add_prefix("detected."),
+        columns=[
+            "expected." + key
+            for key in list(BenchmarkLeakageResult.__annotations__.keys())
+        ]
+        + [
+            "detected." + key
+            for key in list(BenchmarkLeakageResult.__annotations__.keys())
+        ],
+    )
+    detected_leaks_frame["result_id"] = index
+
+    evaluation_results.update(_get_run_record(folder, index, try_load_docker_stats))
+    evaluation_results["matched_leaks_list"] = matched_list
+    evaluation_results["detected_leaks_frame"] = detected_leaks_frame
+    return evaluation_results
+
+
+def aggregate_profiles(
+    runner_results_dir: str,
+    method: str = None,
+    stage: Literal["prepare", "detect"] = "detect",
+    sort_by: str = "cumulative_time",
+    top: int = 20,
+) -> pd.DataFrame:
+    """
+    Aggregates the profiles of many runs (see `run_benchmark(profile=True)`) to find the hot functions of a method.
+
+    :param runner_results_dir: Folder containing the results of the runs
+    :param method: Only aggregate runs of this method
+    :param stage: Stage of the runs to aggregate
+    :param sort_by: Column to sort the functions by
+    :param top: Number of functions to return
+    """
+    profile_files = []
+    for folder in glob(os.path.join(runner_results_dir, "*", "")):
+        profile_file = os.path.join(folder, "profiles", f"{stage}.prof")
+        if not os.path.exists(profile_file):
+            continue
+        if method is not None:
+            run_info = pd.read_csv(os.path.join(folder, "run_info.csv")).iloc[0]
+            if run_info["method"] != method:
+                continue
+        profile_files.append(profile_file)
+
+    columns = [
+        "function",
+        "calls",
+        "primitive_calls",
+        "total_time",
+        "cumulative_time",
+        "cumulative_time_per_run",
+    ]
+    if len(profile_files) == 0:
+        logging.warning(f"No profiles found in {runner_results_dir}")
+        return pd.DataFrame(columns=columns)
+
+    stats = pstats.Stats(*profile_files)
+    functions = []
+    for (file_name, line, function_name), (
+        primitive_calls,
+        calls,
+        total_time,
+        cumulative_time,
+        _,
+    ) in stats.stats.items():
+        functions.append(
+            [
+                f"{file_name}:{line}({function_name})",
+                calls,
+                primitive_calls,
+                total_time,
+                cumulative_time,
+                cumulative_time / len(profile_files),
+            ]
+        )
+    return (
+        pd.DataFrame(functions, columns=columns)
+        .sort_values(sort_by, ascending=False)
+        .head(top)
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,317 @@
+"""
+SQLite database of the evaluated runs and their leak pairs.
+
+The schema is fixed and indexed on the columns the analyses filter by (method, dataset, derivation and hyperparameters),
+so that the database can be updated incrementally and queried without loading it into pandas.
+"""
+import ast
+import logging
+import sqlite3
+from typing import Dict, List, Tuple, Union
+
+import pandas as pd
+from pandas import DataFrame
+
+from ldimbenchmark.evaluation_metrics.matches import MATCHES_COLUMNS
+
+RESULTS_COLUMNS = {
+    "_folder": "TEXT PRIMARY KEY",
+    "method": "TEXT",
+    "method_version": "TEXT",
+    "dataset": "TEXT",
+    "dataset_part": "TEXT",
+    "dataset_id": "TEXT",
+    "dataset_derivations": "TEXT",
+    "is_original": "INTEGER",
+    "dataset_derivation_type": "TEXT",
+    "derivation_kind": "TEXT",
+    "derivation_to": "TEXT",
+    "derivation_value": "REAL",
+    "hyperparameters": "TEXT",
+    "executed_at": "TEXT",
+    "true_positives": "INTEGER",
+    "false_positives": "INTEGER",
+    "true_negatives": "REAL",
+    "false_negatives": "INTEGER",
+    "time_to_detection_avg": "REAL",
+    "wrong_pipe": "INTEGER",
+    "train_time": "REAL",
+    "detect_time": "REAL",
+    "time_initializing": "REAL",
+    "total_time": "REAL",
+    "method_time": "REAL",
+    "memory_max": "REAL",
+    "memory_avg": "REAL",
+    "precision": "REAL",
+    "recall (TPR)": "REAL",
+    "TNR": "REAL",
+    "FPR": "REAL",
+    "FNR": "REAL",
+    "F1": "REAL",
+}
+
+INDEXES = {
+    "results_method": ("results", ["method", "method_version"]),
+    "results_dataset": ("results", ["dataset", "dataset_part"]),
+    "results_derivation": (
+        "results",
+        ["dataset_derivation_type", "derivation_kind", "derivation_to"],
+    ),
+    "results_is_original": ("results", ["is_original"]),
+    "hyperparameters_key": ("hyperparameters", ["key", "value"]),
+    "hyperparameters_run": ("hyperparameters", ["run_id"]),
+    "leak_pairs_run": ("leak_pairs", ["run_id", "type"]),
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_derivation(dataset_derivations: Union[str, dict, None]) -> Tuple:
+    """
+    Flattens the derivations of a dataset (as in its dataset info) to the first derivation applied.
+
+    Same semantics as :func:`~ldimbenchmark.utilities.read_multiple_dataset_infos`.
+
+    :return: Tuple of (derivation type, kind or property, sensor type or element, value), all None for original datasets
+    """
+    if isinstance(dataset_derivations, str):
+        dataset_derivations = ast.literal_eval(dataset_derivations)
+    if not isinstance(dataset_derivations, dict):
+        return None, None, None, None
+    data = dataset_derivations.get("data", None)
+    if data:
+        value = data[0].get("value", None)
+        if isinstance(value, dict):
+            value = value.get("value", None)
+        return "data", data[0].get("kind", None), str(data[0].get("to", None)), value
+    model = dataset_derivations.get("model", None)
+    if model:
+        return (
+            "model",
+            model[0].get("property", None),
+            model[0].get("element", None),
+            model[0].get("value", None),
+        )
+    return None, None, None, None
+
+
+def _flatten_hyperparameters(hyperparameters: dict, prefix: str = "") -> Dict:
+    flat = {}
+    for key, value in hyperparameters.items():
+        if isinstance(value, dict):
+            flat.update(_flatten_hyperparameters(value, f"{prefix}{key}."))
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            flat[f"{prefix}{key}"] = value
+        else:
+            flat[f"{prefix}{key}"] = str(value)
+    return flat
+
+
+def _to_rows(frame: DataFrame) -> List[Tuple]:
+    """
+    Converts a frame into rows of python values sqlite3 can bind (datetimes as iso strings, NaN as NULL).
+    """
+    frame = frame.copy()
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].astype(str).where(frame[column].notna(), None)
+    frame = frame.astype(object).where(frame.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+
+class ResultsDatabase:
+    """
+    Writes the evaluated runs to a SQLite database (results.db).
+
+    Runs are upserted by their id (`_folder`), writing the same run again replaces its results, leak pairs and hyperparameters.
+
+    Usage:
+        with ResultsDatabase("results.db") as database:
+            database.write_results(results, matches)
+            database.get_derivation_results("data", "precision", "pressures")
+    """
+
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self.connection = sqlite3.connect(database_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _get_columns(self, table: str) -> List[str]:
+        return [
+            row[1]
+            for row in self.connection.execute(f"PRAGMA table_info({_quote(table)})")
+        ]
+
+    def _create_schema(self):
+        existing_columns = self._get_columns("results")
+        if len(existing_columns) > 0 and "derivation_kind" not in existing_columns:
+            logging.warning(
+                f"Recreating {self.database_path}, it was written with an older schema"
+            )
+            with self.connection:
+                for table in ["results", "leak_pairs", "hyperparameters"]:
+                    self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+
+        columns = ", ".join(
+            f"{_quote(column)} {column_type}"
+            for column, column_type in RESULTS_COLUMNS.items()
+        )
+        match_columns = ", ".join(
+            f"{_quote(column)}" for column in MATCHES_COLUMNS if column != "run_id"
+        )
+        with self.connection:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS results ({columns})")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS hyperparameters (run_id TEXT, key TEXT, value)"
+            )
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS leak_pairs (run_id TEXT, {match_columns})"
+            )
+            for name, (table, index_columns) in INDEXES.items():
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(index_columns)})"
+                )
+
+    def _add_missing_columns(self, columns: List[str]):
+        """
+        Adds columns of additional evaluation metrics (not in the fixed schema) to the results table.
+        """
+        existing_columns = self._get_columns("results")
+        for column in columns:
+            if column not in existing_columns:
+                logging.info(f"Adding column '{column}' to the results table")
+                self.connection.execute(
+                    f"ALTER TABLE results ADD COLUMN {_quote(column)} REAL"
+                )
+
+    def write_results(
+        self,
+        results: DataFrame,
+        matches: DataFrame = None,
+        batch_size: int = 10000,
+    ):
+        """
+        Upserts evaluated runs (see :meth:`~ldimbenchmark.LDIMBenchmark.evaluate`) in batched transactions.
+
+        :param results: Results of the runs, indexed by their id (`_folder`)
+        :param matches: Leak pairs of the runs (see :func:`~ldimbenchmark.evaluation_metrics.matches.get_matches_table`)
+        :param batch_size: Number of runs written per transaction
+        """
+        results = results.reset_index()
+        results["_folder"] = results["_folder"].astype(str)
+        derivations = DataFrame(
+            [
+                get_derivation(derivations)
+                for derivations in results["dataset_derivations"]
+            ],
+            columns=[
+                "dataset_derivation_type",
+                "derivation_kind",
+                "derivation_to",
+                "derivation_value",
+            ],
+            index=results.index,
+        )
+        results = results.drop(columns=derivations.columns, errors="ignore")
+        results = pd.concat([results, derivations], axis=1)
+        results["is_original"] = derivations["dataset_derivation_type"].isnull()
+        for column in ["dataset_derivations", "hyperparameters"]:
+            results[column] = results[column].astype(str)
+        columns = [
+            column
+            for column in results.columns
+            if column in RESULTS_COLUMNS
+            or pd.api.types.is_numeric_dtype(results[column])
+        ]
+        results = results[columns]
+
+        if matches is not None:
+            matches = matches.astype({"run_id": str})
+            matches = matches[matches["run_id"].isin(results["_folder"])]
+
+        insert_results = (
+            f"INSERT OR REPLACE INTO results ({', '.join(_quote(c) for c in columns)}) "
+            + f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        insert_matches = (
+            f"INSERT INTO leak_pairs ({', '.join(_quote(c) for c in MATCHES_COLUMNS)}) "
+            + f"VALUES ({', '.join('?' for _ in MATCHES_COLUMNS)})"
+        )
+
+        with self.connection:
+            self._add_missing_columns(columns)
+        for start in range(0, len(results), batch_size):
+            batch = results.iloc[start : start + batch_size]
+            run_ids = [(run_id,) for run_id in batch["_folder"]]
+            hyperparameters = [
+                (run_id, key, value)
+                for run_id, run_hyperparameters in zip(
+                    batch["_folder"], batch["hyperparameters"]
+                )
+                for key, value in _flatten_hyperparameters(
+                    ast.literal_eval(run_hyperparameters)
+                    if run_hyperparameters not in ["nan", "None"]
+                    else {}
+                ).items()
+            ]
+            with self.connection:
+                self.connection.executemany(insert_results, _to_rows(batch))
+                self.connection.executemany(
+                    "DELETE FROM hyperparameters WHERE run_id = ?", run_ids
+                )
+                self.connection.executemany(
+                    "INSERT INTO hyperparameters (run_id, key, value) VALUES (?, ?, ?)",
+                    hyperparameters,
+                )
+                if matches is not None:
+                    self.connection.executemany(
+                        "DELETE FROM leak_pairs WHERE run_id = ?", run_ids
+                    )
+                    batch_matches = matches[matches["run_id"].isin(batch["_folder"])]
+                    self.connection.executemany(
+                        insert_matches, _to_rows(batch_matches[MATCHES_COLUMNS])
+                    )
+
+    def query(self, sql: str, params: Union[tuple, dict] = ()) -> DataFrame:
+        """
+        Runs a query against the database and returns its result.
+        """
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def get_derivations(self) -> List[Tuple[str, str, str]]:
+        """
+        All derivations in the database as (derivation type, kind or property, sensor type or element).
+        """
+        return self.connection.execute(
+            "SELECT DISTINCT dataset_derivation_type, derivation_kind, derivation_to FROM results "
+            + "WHERE dataset_derivation_type IS NOT NULL "
+            + "ORDER BY dataset_derivation_type, derivation_kind, derivation_to"
+        ).fetchall()
+
+    def get_derivation_results(
+        self, derivation_type: str, kind: str, to: str
+    ) -> DataFrame:
+        """
+        Results of the runs on datasets with the given derivation and on the original datasets.
+        """
+        results = self.query(
+            "SELECT * FROM results WHERE "
+            + "(dataset_derivation_type = ? AND derivation_kind = ? AND derivation_to = ?) "
+            + "OR is_original = 1",
+            (derivation_type, kind, to),
+        ).set_index("_folder")
+        results["is_original"] = results["is_original"].astype(bool)
+        return results
@@ -7,10 +7,23 @@ import time
 from typing import Literal, Union
 
 import pandas as pd
+from ldimbenchmark.benchmark.journal import write_completed
 from ldimbenchmark.classes import BenchmarkLeakageResult
 from ldimbenchmark.datasets.classes import Dataset
 
 
+def get_runner_id(
+    runner_base_name: str, dataset_id: str, dataset_part: str, hyperparameters: dict
+) -> str:
+    """
+    Id of a runner (and name of its results folder), without having to create the runner.
+    """
+    hyperparameter_hash = hashlib.md5(
+        json.dumps(hyperparameters, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return f"{runner_base_name}_{dataset_id}_{dataset_part}_{hyperparameter_hash}"
+
+
 class MethodRunner(ABC):
     """
     Runner for a single method and dataset.
@@ -30,6 +43,7 @@ class MethodRunner(ABC):
         method: Literal["offline", "online"] = "offline",
         debug: bool = False,
         resultsFolder: Union[str, None] = None,
+        profile: bool = False,
     ):
         """
         Base Class for a Method Runner.
@@ -68,6 +82,9 @@ class MethodRunner(ABC):
         resultsFolder : None, optional
             The path to the results folder, by default None
 
+        profile : bool, optional
+            Whether to capture a cProfile of the prepare and detect stages (stored in the results folder), by default False
+
         """
         self.runner_start_time = time.time()
         if isinstance(dataset, str):
@@ -81,12 +98,8 @@ class MethodRunner(ABC):
         self.hyperparameters = hyperparameters
         if self.hyperparameters is None:
             self.hyperparameters = {}
-        hyperparameter_hash = hashlib.md5(
-            json.dumps(hyperparameters, sort_keys=True).encode("utf-8")
-        ).hexdigest()
-
-        self.id = (
-            f"{runner_base_name}_{self.dataset.id}_{dataset_part}_{hyperparameter_hash}"
+        self.id = get_runner_id(
+            runner_base_name, self.dataset.id, dataset_part, hyperparameters
         )
 
         self.dataset_part = dataset_part
@@ -96,6 +109,12 @@ class MethodRunner(ABC):
         self.debug = debug
         self.resultsFolder = resultsFolder
         self.method_runner_type = method_runner_type
+        self.profile = profile
+        # Folder of the completion journal, set by runners which create their own results folder in it
+        self.journal_dir = None
+
+        if not self.resultsFolder and self.profile:
+            raise Exception("Profiling requires a results folder.")
 
         if not self.resultsFolder and self.debug:
             raise Exception("Debug mode requires a results folder.")
@@ -121,6 +140,7 @@ class MethodRunner(ABC):
         time_training,
         time_detection,
         time_initializing,
+        additional_run_info: dict = None,
     ):
         self.runner_stop_time = time.time()
         if self.resultsFolder:
@@ -159,6 +179,7 @@ class MethodRunner(ABC):
                             "%Y-%m-%d %H:%M:%S"
                         ),
                         "method_runner_type": self.method_runner_type,
+                        **(additional_run_info or {}),
                     }
                 ],
             ).to_csv(
@@ -167,6 +188,14 @@ class MethodRunner(ABC):
                 date_format="%Y-%m-%d %H:%M:%S",
             )
         self.tryWriteEvaluationLeaks()
+        self.markCompleted()
+
+    def markCompleted(self):
+        """
+        Records the run in the completion journal, so that it is skipped when the benchmark is resumed.
+        """
+        if self.journal_dir:
+            write_completed(self.journal_dir, self.id)
 
     def tryWriteEvaluationLeaks(self):
         if hasattr(self.dataset.evaluation, "leaks"):
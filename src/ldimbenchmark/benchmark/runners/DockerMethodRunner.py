@@ -7,10 +7,12 @@ import itertools
 import json
 import logging
 import os
+import shutil
 import tarfile
 from pathlib import Path
 import tempfile
-from typing import Literal, Union
+from typing import Literal, Tuple, Union
+import numpy as np
 import pandas as pd
 
 import docker
@@ -20,20 +22,110 @@ from ldimbenchmark.classes import BenchmarkLeakageResult, LDIMMethodBase
 from ldimbenchmark.datasets.classes import Dataset
 
 
+STATS_COLUMNS = ["timestamp", "memory", "memory_peak", "cpu_usage"]
+
+# cgroup v2 locations of a container for the systemd and the cgroupfs cgroup driver
+CGROUP_V2_PATHS = [
+    "/sys/fs/cgroup/system.slice/docker-{id}.scope",
+    "/sys/fs/cgroup/docker/{id}",
+]
+
+
+def _find_container_cgroup(container_id: str) -> Union[str, None]:
+    for cgroup_path in CGROUP_V2_PATHS:
+        cgroup_path = cgroup_path.format(id=container_id)
+        if os.path.isfile(os.path.join(cgroup_path, "memory.current")):
+            return cgroup_path
+    return None
+
+
+def _read_cgroup_file(cgroup_path: str, file_name: str) -> str:
+    with open(os.path.join(cgroup_path, file_name)) as f:
+        return f.read()
+
+
+def _sample_cgroup_statistics(cgroup_path: str) -> Tuple[float, int, int, float]:
+    """
+    Reads the current resource usage directly from the cgroup v2 files of the container.
+    """
+    memory = int(_read_cgroup_file(cgroup_path, "memory.current"))
+    memory_stat = dict(
+        line.split()
+        for line in _read_cgroup_file(cgroup_path, "memory.stat").split("\n")
+        if line
+    )
+    cpu_stat = dict(
+        line.split()
+        for line in _read_cgroup_file(cgroup_path, "cpu.stat").split("\n")
+        if line
+    )
+    # memory.peak is only available since Linux 5.19
+    memory_peak = np.nan
+    if os.path.isfile(os.path.join(cgroup_path, "memory.peak")):
+        memory_peak = int(_read_cgroup_file(cgroup_path, "memory.peak"))
+    return (
+        time.time(),
+        # Same calculation as `docker stats`
+        memory - int(memory_stat.get("inactive_file", 0)),
+        memory_peak,
+        int(cpu_stat["usage_usec"]) / 1e6,
+    )
+
+
+def _sample_docker_statistics(stats: dict) -> Tuple[float, int, int, float]:
+    """
+    Reduces a stats object of the docker API to the relevant numbers.
+    """
+    memory_stats = stats.get("memory_stats", {})
+    memory = memory_stats.get("usage", np.nan)
+    # According to https://github.com/docker/cli/blob/e57b5f78de635e6e2b688686d10b830c4747c4dc/cli/command/container/stats_helpers.go#L239
+    inactive_file = memory_stats.get("stats", {}).get("inactive_file", 0)
+    if inactive_file < memory:
+        memory = memory - inactive_file
+    return (
+        time.time(),
+        memory,
+        memory_stats.get("max_usage", np.nan),
+        stats.get("cpu_stats", {}).get("cpu_usage", {}).get("total_usage", np.nan)
+        / 1e9,
+    )
+
+
 def record_docker_statistics(
     event: asyncio.Event,
     container: docker.models.containers.Container,
     resultsFolder: str,
+    interval: float = 0.1,
 ):
-    allStats = []
-    while True:
-        stats = container.stats(stream=False)
-        allStats.append(stats)
-        time.sleep(0.5)
-        if event.is_set():
-            if os.path.exists(resultsFolder):
-                pd.DataFrame(allStats).to_csv(os.path.join(resultsFolder, "stats.csv"))
-            break
+    """
+    Records the resource usage of the container until the event is set.
+
+    The cgroup v2 files of the container are read directly (every `interval` seconds) if they are accessible,
+    otherwise the streaming stats endpoint of the docker API is used (about one sample per second).
+    """
+    samples = []
+    cgroup_path = _find_container_cgroup(container.id)
+    if cgroup_path is not None:
+        while not event.is_set():
+            try:
+                samples.append(_sample_cgroup_statistics(cgroup_path))
+            except (OSError, KeyError, ValueError):
+                # Container stopped and its cgroup was removed
+                break
+            time.sleep(interval)
+    else:
+        logging.debug("No cgroup v2 found for container, using docker stats stream")
+        for stats in container.stats(stream=True, decode=True):
+            samples.append(_sample_docker_statistics(stats))
+            if event.is_set():
+                break
+
+    while not event.is_set():
+        time.sleep(interval)
+    if os.path.exists(resultsFolder):
+        pd.DataFrame(samples, columns=STATS_COLUMNS).to_csv(
+            os.path.join(resultsFolder, "stats.csv"), index=False
+        )
 
 
 class DockerMethodRunner(MethodRunner):
@@ -55,9 +147,12 @@ class DockerMethodRunner(MethodRunner):
         method: Literal["offline", "online"] = "offline",
         debug=False,
         cpu_count=1,
+        cpuset_cpus=None,
         mem_limit=None,
         capture_docker_stats=False,
+        docker_stats_interval=0.1,
         resultsFolder=None,
+        profile=False,
         docker_base_url="unix://var/run/docker.sock",
     ):
         super().__init__(
@@ -71,13 +166,18 @@ class DockerMethodRunner(MethodRunner):
             method=method,
             resultsFolder=resultsFolder,
             debug=debug,
+            profile=profile,
         )
+        # The cache is mounted into the container, so it does not need to parse the raw data
         self.dataset.ensure_cached()
 
         self.image = image
         self.docker_base_url = docker_base_url
         self.capture_docker_stats = capture_docker_stats
+        self.docker_stats_interval = docker_stats_interval
         self.cpu_count = cpu_count
+        # Pins the container to the given CPUs (e.g. "0-3" or "1,3")
+        self.cpuset_cpus = cpuset_cpus
         self.mem_limit = "4g"
         if mem_limit is not None:
             self.mem_limit = mem_limit
@@ -86,6 +186,31 @@ class DockerMethodRunner(MethodRunner):
             self.resultsFolder = None
         else:
             self.resultsFolder = os.path.join(resultsFolder, self.id)
+            self.journal_dir = resultsFolder
+
+    def get_options(self) -> dict:
+        """
+        Options passed to the container (read by :class:`~ldimbenchmark.FileBasedMethodRunner`).
+
+        The timespans of the dataset parts are passed along, since the container only sees the original dataset folder
+        (and the dataset might be a time slice of it, see :func:`~ldimbenchmark.datasets.classes.get_dataset_time_slice`).
+        """
+        return {
+            "dataset_part": self.dataset_part,
+            "dataset_timespans": {
+                part: {
+                    "start": str(self.dataset.info["dataset"][part]["start"]),
+                    "end": str(self.dataset.info["dataset"][part]["end"]),
+                }
+                for part in ["training", "evaluation"]
+            },
+            "hyperparameters": self.hyperparameters,
+            "goal": self.goal,
+            "stage": self.stage,
+            "method": self.method,
+            "debug": self.debug,
+            "profile": self.profile,
+        }
 
     def run(self):
         super().run()
@@ -93,17 +218,7 @@ class DockerMethodRunner(MethodRunner):
         folder_parameters = tempfile.TemporaryDirectory()
         path_options = os.path.join(folder_parameters.name, "options.yml")
         with open(path_options, "w") as f:
-            yaml.dump(
-                {
-                    "dataset_part": self.dataset_part,
-                    "hyperparameters": self.hyperparameters,
-                    "goal": self.goal,
-                    "stage": self.stage,
-                    "method": self.method,
-                    "debug": self.debug,
-                },
-                f,
-            )
+            yaml.dump(self.get_options(), f)
 
         # test compatibility (stages)
 
@@ -133,13 +248,18 @@ class DockerMethodRunner(MethodRunner):
                     os.path.abspath(self.dataset.path): {
                         "bind": "/input/",
                         "mode": "ro",
-                    }
+                    },
+                    os.path.abspath(self.dataset.cache_dir): {
+                        "bind": "/cache/",
+                        "mode": "ro",
+                    },
                 },
                 environment={
                     "LOG_LEVEL": "DEBUG" if self.debug else "WARNING",
                 },
                 mem_limit=self.mem_limit,
                 cpu_count=self.cpu_count,
+                cpuset_cpus=self.cpuset_cpus,
                 detach=True,
             )
 
@@ -182,7 +302,12 @@ class DockerMethodRunner(MethodRunner):
             if self.capture_docker_stats:
                 thread = Thread(
                     target=record_docker_statistics,
-                    args=(killEvent, container, self.resultsFolder),
+                    args=(
+                        killEvent,
+                        container,
+                        self.resultsFolder,
+                        self.docker_stats_interval,
+                    ),
                 )
                 thread.start()
             for log_line in container.logs(stream=True):
@@ -245,6 +370,17 @@ class DockerMethodRunner(MethodRunner):
 
         # TODO: Write results because we should not include them in the container input
         # self.tryWriteEvaluationLeaks()
+        run_info_path = os.path.join(self.resultsFolder, "run_info.csv")
+        if os.path.isfile(run_info_path):
+            container_dataset_id = pd.read_csv(run_info_path)["dataset_id"].iloc[0]
+            if container_dataset_id != self.dataset.id:
+                # Containers built with an older ldimbenchmark ignore the timespans and ran on the full dataset
+                shutil.rmtree(self.resultsFolder)
+                raise Exception(
+                    f"Container of {self.image} ran on dataset {container_dataset_id} instead of {self.dataset.id}, "
+                    + "rebuild the image with the current ldimbenchmark version to run it on time slices of datasets."
+                )
+        self.markCompleted()
         logging.info(f"Results in {self.resultsFolder}")
         return self.resultsFolder
 
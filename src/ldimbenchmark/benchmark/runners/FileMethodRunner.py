@@ -6,7 +6,7 @@ import yaml
 from ldimbenchmark.benchmark.runners.LocalMethodRunner import LocalMethodRunner
 from ldimbenchmark.benchmark.runners.BaseMethodRunner import MethodRunner
 from ldimbenchmark.classes import LDIMMethodBase
-from ldimbenchmark.datasets.classes import Dataset
+from ldimbenchmark.datasets.classes import Dataset, get_dataset_time_slice
 
 
 class FileBasedMethodRunner(LocalMethodRunner):
@@ -16,14 +16,26 @@ class FileBasedMethodRunner(LocalMethodRunner):
         inputFolder: str = "/input",
         argumentsFolder: str = "/args",
         outputFolder: str = "/output",
+        cacheFolder: str = "/cache",
         in_docker: bool = False,
     ):
         with open(os.path.join(argumentsFolder, "options.yml")) as f:
             parameters = yaml.safe_load(f)
 
+        # Use the pre-built dataset cache (mounted by the DockerMethodRunner) if available
+        dataset = Dataset(
+            inputFolder,
+            cache_dir=cacheFolder if os.path.isdir(cacheFolder) else None,
+        )
+        # The runner might run on a time slice of the dataset (e.g. in the hyperparameter search)
+        for part, timespan in parameters.get("dataset_timespans", {}).items():
+            dataset = get_dataset_time_slice(
+                dataset, part, timespan["start"], timespan["end"]
+            )
+
         super().__init__(
             detection_method=detection_method,
-            dataset=inputFolder,
+            dataset=dataset,
             dataset_part=parameters["dataset_part"],
             hyperparameters=parameters["hyperparameters"],
             method_runner_type_overwrite="docker" if in_docker else "file",
@@ -33,6 +45,7 @@ class FileBasedMethodRunner(LocalMethodRunner):
             debug=parameters["debug"],
             resultsFolder=outputFolder,
             createFolder=False,
+            profile=parameters.get("profile", False),
         )
         if self.debug:
             logging.info("Debug logging activated.")
@@ -3,12 +3,12 @@ import hashlib
 import json
 import logging
 import os
-import time
 from typing import Literal, Union
 import pandas as pd
 
 import yaml
 from ldimbenchmark.benchmark.runners.BaseMethodRunner import MethodRunner
+from ldimbenchmark.benchmark.runners.StageInstrumentation import StageInstrumentation
 from ldimbenchmark.classes import BenchmarkLeakageResult, LDIMMethodBase
 from ldimbenchmark.datasets.classes import Dataset
 
@@ -36,6 +36,8 @@ class LocalMethodRunner(MethodRunner):
         resultsFolder=None,
         createFolder: bool = True,
         method_runner_type_overwrite=None,
+        trace_allocations: bool = False,
+        profile: bool = False,
     ):
         """Initialize the LocalMethodRunner.
 
@@ -64,6 +66,12 @@ class LocalMethodRunner(MethodRunner):
         resultsFolder : None, optional
             The path to the results folder, by default None
 
+        trace_allocations : bool, optional
+            Whether to trace python allocations per stage (tracemalloc), by default False
+
+        profile : bool, optional
+            Whether to capture a cProfile of the prepare and detect stages, by default False
+
         Raises
         ------
         TypeError
@@ -85,13 +93,17 @@ class LocalMethodRunner(MethodRunner):
             method=method,
             resultsFolder=resultsFolder,
             debug=debug,
+            profile=profile,
         )
 
+        self.trace_allocations = trace_allocations
+
         # Overwrite resultsFolder
         if resultsFolder == None:
             self.resultsFolder = None
         elif createFolder:
             self.resultsFolder = os.path.join(resultsFolder, self.id)
+            self.journal_dir = resultsFolder
         else:
             self.resultsFolder = resultsFolder
 
@@ -143,23 +155,31 @@ class LocalMethodRunner(MethodRunner):
 
     def run(self):
         super().run()
-        start = time.time()
+        instrumentation = StageInstrumentation(
+            trace_allocations=self.trace_allocations,
+            profile_dir=os.path.join(self.resultsFolder, "profiles")
+            if self.profile
+            else None,
+        )
+        instrumentation.start()
         logging.info(f"Running {self.id} with params {self.hyperparameters}")
 
-        logging.info(
-            f"LocalMethodRunner - Loading Dataset {self.dataset.id}, derivations: {getattr(self.dataset.info, 'derivations', None)}"
-        )
-        self.dataset.loadData()
-        self.dataset.loadBenchmarkData()
-        logging.debug("Loading Datasets - FINISH")
-
-        # TODO: test compatibility (stages)
-        self.detection_method.init_with_benchmark_params(
-            additional_output_path=self.additional_output_path,
-            hyperparameters=self.hyperparameters,
-        )
-        end = time.time()
-        time_initializing = end - start
+        with instrumentation.measure("initializing"):
+            logging.info(
+                f"LocalMethodRunner - Loading Dataset {self.dataset.id}, derivations: {getattr(self.dataset.info, 'derivations', None)}"
+            )
+            # Only load the data the method actually uses
+            data_needed = self.detection_method.metadata.get("data_needed", None)
+            self.dataset.loadData(data_needed)
+            self.dataset.loadBenchmarkData()
+            logging.debug("Loading Datasets - FINISH")
+
+            # TODO: test compatibility (stages)
+            self.detection_method.init_with_benchmark_params(
+                additional_output_path=self.additional_output_path,
+                hyperparameters=self.hyperparameters,
+            )
+        time_initializing = instrumentation.stages["initializing"]["wall_time"]
         logging.info(
             "> Initialization time for '"
             + self.detection_method.name
@@ -167,14 +187,13 @@ class LocalMethodRunner(MethodRunner):
             + str(time_initializing)
         )
 
-        preparation_data = self.dataset.getTrainingBenchmarkData()
-        start = time.time()
-        if self.dataset_part == "training":
-            self.detection_method.prepare()
-        elif self.dataset_part == "evaluation":
-            self.detection_method.prepare(preparation_data)
-        end = time.time()
-        time_preparation = end - start
+        preparation_data = self.dataset.getTrainingBenchmarkData(data_needed)
+        with instrumentation.measure("prepare", profile=self.profile):
+            if self.dataset_part == "training":
+                self.detection_method.prepare()
+            elif self.dataset_part == "evaluation":
+                self.detection_method.prepare(preparation_data)
+        time_preparation = instrumentation.stages["prepare"]["wall_time"]
         logging.info(
             "> Preparation time for '"
             + self.detection_method.name
@@ -182,22 +201,22 @@ class LocalMethodRunner(MethodRunner):
             + str(time_preparation)
         )
 
-        start = time.time()
-        evaluation_data = copy.deepcopy(self.dataset.getEvaluationBenchmarkData())
-        start = time.time()
-        if self.dataset_part == "training":
-            detected_leaks = self.detection_method.detect_offline(preparation_data)
-        elif self.dataset_part == "evaluation":
-            detected_leaks = self.detection_method.detect_offline(evaluation_data)
-
-        end = time.time()
-        time_detection = end - start
+        evaluation_data = copy.deepcopy(
+            self.dataset.getEvaluationBenchmarkData(data_needed)
+        )
+        with instrumentation.measure("detect", profile=self.profile):
+            if self.dataset_part == "training":
+                detected_leaks = self.detection_method.detect_offline(preparation_data)
+            elif self.dataset_part == "evaluation":
+                detected_leaks = self.detection_method.detect_offline(evaluation_data)
+        time_detection = instrumentation.stages["detect"]["wall_time"]
         logging.info(
             "> Detection time for '"
             + self.detection_method.name
             + "': "
             + str(time_detection)
         )
+        instrumentation.stop()
 
         self.writeResults(
             method_name=self.detection_method.name,
@@ -207,6 +226,7 @@ class LocalMethodRunner(MethodRunner):
             time_training=time_preparation,
             time_detection=time_detection,
             time_initializing=time_initializing,
+            additional_run_info=instrumentation.get_run_info(),
         )
 
         return self.resultsFolder
@@ -0,0 +1,178 @@
+from contextlib import contextmanager
+import cProfile
+import logging
+import os
+import sys
+from threading import Event, Thread
+import time
+import tracemalloc
+from typing import Dict, List, Union
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _read_proc_status(key: str) -> Union[int, None]:
+    """
+    Reads a memory value (in bytes) from /proc/self/status (Linux only).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Resets the peak resident set size of the process (Linux only), so that it can be measured per stage.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_peak_rss() -> Union[int, None]:
+    """
+    Peak resident set size of the process in bytes.
+    """
+    peak = _read_proc_status("VmHWM")
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+        if sys.platform != "darwin":
+            peak = peak * 1024
+    return peak
+
+
+def get_current_rss() -> Union[int, None]:
+    """
+    Current resident set size of the process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class StageInstrumentation:
+    """
+    Measures wall time, cpu time, peak memory and allocations of the stages of a run.
+
+    Usage:
+        instrumentation = StageInstrumentation()
+        instrumentation.start()
+        with instrumentation.measure("prepare"):
+            ...
+        instrumentation.stop()
+        instrumentation.get_run_info()
+    """
+
+    def __init__(
+        self,
+        trace_allocations: bool = False,
+        memory_sample_interval: float = 0.05,
+        profile_dir: str = None,
+    ):
+        """
+        :param trace_allocations: Additionally trace python allocations (tracemalloc), slows down the run considerably
+        :param memory_sample_interval: Interval in seconds for sampling the memory usage (for the average)
+        :param profile_dir: Folder to write cProfile files of the stages measured with `profile=True` to
+        """
+        self.trace_allocations = trace_allocations
+        self.profile_dir = profile_dir
+        self.memory_sample_interval = memory_sample_interval
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.memory_samples: List[int] = []
+        self._stop_event = Event()
+        self._sampler = None
+
+    def _sample_memory(self):
+        while not self._stop_event.is_set():
+            rss = get_current_rss()
+            if rss is None:
+                break
+            self.memory_samples.append(rss)
+            self._stop_event.wait(self.memory_sample_interval)
+
+    def start(self):
+        self._stop_event.clear()
+        self._sampler = Thread(target=self._sample_memory, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    @contextmanager
+    def measure(self, stage: str, profile: bool = False):
+        """
+        Measures the resource usage of the code executed in the context.
+
+        :param profile: Capture a cProfile of the stage (as `<profile_dir>/<stage>.prof`)
+        """
+        profiler = None
+        if profile and self.profile_dir is not None:
+            profiler = cProfile.Profile()
+        if not _reset_peak_rss():
+            logging.debug("Could not reset peak memory, reporting process peak")
+        if self.trace_allocations:
+            tracemalloc.start()
+        allocated_blocks_start = sys.getallocatedblocks()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.process_time() - cpu_start
+            if profiler is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{stage}.prof"))
+            self.stages[stage] = {
+                "wall_time": wall_time,
+                "cpu_time": cpu_time,
+                "memory_peak": get_peak_rss(),
+                "allocated_blocks": sys.getallocatedblocks() - allocated_blocks_start,
+            }
+            if self.trace_allocations:
+                self.stages[stage][
+                    "traced_memory_peak"
+                ] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+    def get_run_info(self) -> Dict[str, float]:
+        """
+        Flat representation of the measurements to be included in the run_info.
+        """
+        run_info = {}
+        for stage, measurements in self.stages.items():
+            for key, value in measurements.items():
+                run_info[f"{stage}_{key}"] = value
+
+        memory_peaks = [
+            measurements["memory_peak"]
+            for measurements in self.stages.values()
+            if measurements["memory_peak"] is not None
+        ]
+        run_info["memory_max"] = max(memory_peaks) if len(memory_peaks) > 0 else None
+        run_info["memory_avg"] = (
+            np.mean(self.memory_samples) if len(self.memory_samples) > 0 else None
+        )
+        return run_info
@@ -1,4 +1,11 @@
-from .BaseMethodRunner import MethodRunner
-from .DockerMethodRunner import DockerMethodRunner
-from .FileMethodRunner import FileBasedMethodRunner
-from .LocalMethodRunner import LocalMethodRunner
+from ldimbenchmark._lazy import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "MethodRunner": "ldimbenchmark.benchmark.runners.BaseMethodRunner",
+        "DockerMethodRunner": "ldimbenchmark.benchmark.runners.DockerMethodRunner",
+        "FileBasedMethodRunner": "ldimbenchmark.benchmark.runners.FileMethodRunner",
+        "LocalMethodRunner": "ldimbenchmark.benchmark.runners.LocalMethodRunner",
+    },
+)
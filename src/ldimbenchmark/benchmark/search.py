@@ -0,0 +1,297 @@
+"""
+Hyperparameter search strategies, which are cheaper than the exhaustive grid search (`multi_parameters=True`).
+
+The strategies only decide which hyperparameters to run on which budget (the fraction of the training data),
+running and scoring the candidates is done by the `evaluate` callback (see :meth:`~ldimbenchmark.LDIMBenchmark.run_hyperparameter_search`).
+"""
+import logging
+import math
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ldimbenchmark.classes import Hyperparameter
+from ldimbenchmark.datasets import Dataset
+from ldimbenchmark.datasets.classes import get_dataset_time_slice
+
+# Search space: Hyperparameter name to its options or (min, max, type)
+SearchSpace = Dict[str, Union[List, Tuple[float, float, type]]]
+# Scores a list of hyperparameters on the given budget
+EvaluateCallback = Callable[[List[Dict], float], List[float]]
+
+
+def get_search_space(
+    hyperparameters: Dict, method_hyperparameters: List[Hyperparameter]
+) -> Tuple[SearchSpace, Dict]:
+    """
+    Splits the hyperparameters of a method into the search space and the fixed hyperparameters.
+
+    Hyperparameters given as list are searched over the given values,
+    numeric hyperparameters which are not given are searched between their `min` and `max`.
+
+    :param hyperparameters: Hyperparameters of the method for a dataset (as in the benchmark hyperparameters)
+    :param method_hyperparameters: Hyperparameter definitions of the method (see :class:`~ldimbenchmark.classes.MethodMetadata`)
+    :return: Tuple of the search space and the fixed hyperparameters
+    """
+    space = {}
+    fixed = {}
+    for name, value in hyperparameters.items():
+        if isinstance(value, list) and not name.startswith("_"):
+            space[name] = value
+        else:
+            fixed[name] = value
+    for hyperparameter in method_hyperparameters:
+        if hyperparameter.name in hyperparameters:
+            continue
+        if hyperparameter.options is not None:
+            space[hyperparameter.name] = hyperparameter.options
+        elif (
+            hyperparameter.type in [int, float]
+            and hyperparameter.min is not None
+            and hyperparameter.max is not None
+        ):
+            space[hyperparameter.name] = (
+                hyperparameter.min,
+                hyperparameter.max,
+                hyperparameter.type,
+            )
+    return space, fixed
+
+
+def _is_log_scaled(minimum: float, maximum: float) -> bool:
+    # Ranges over multiple orders of magnitude (e.g. 1 to 8760 hours) are searched on log scale
+    return minimum > 0 and maximum / minimum >= 100
+
+
+def to_unit(space: SearchSpace, hyperparameters: Dict) -> np.ndarray:
+    """
+    Encodes hyperparameters as point in the unit hypercube (used by the surrogate model).
+    """
+    point = []
+    for name, dimension in space.items():
+        value = hyperparameters[name]
+        if isinstance(dimension, list):
+            point.append(
+                dimension.index(value) / max(len(dimension) - 1, 1)
+                if value in dimension
+                else 0.0
+            )
+        else:
+            minimum, maximum, _ = dimension
+            if _is_log_scaled(minimum, maximum):
+                minimum, maximum, value = (
+                    math.log(minimum),
+                    math.log(maximum),
+                    math.log(value),
+                )
+            point.append((value - minimum) / (maximum - minimum))
+    return np.array(point, dtype=float)
+
+
+def from_unit(space: SearchSpace, point: np.ndarray) -> Dict:
+    """
+    Decodes a point in the unit hypercube into hyperparameters (inverse of `to_unit`).
+    """
+    hyperparameters = {}
+    for position, (name, dimension) in zip(point, space.items()):
+        position = min(max(float(position), 0.0), 1.0)
+        if isinstance(dimension, list):
+            hyperparameters[name] = dimension[
+                min(int(position * len(dimension)), len(dimension) - 1)
+            ]
+        else:
+            minimum, maximum, value_type = dimension
+            if _is_log_scaled(minimum, maximum):
+                value = math.exp(
+                    math.log(minimum)
+                    + position * (math.log(maximum) - math.log(minimum))
+                )
+            else:
+                value = minimum + position * (maximum - minimum)
+            if value_type == int:
+                value = int(min(max(round(value), minimum), maximum))
+            hyperparameters[name] = value_type(value)
+    return hyperparameters
+
+
+def sample_candidates(
+    space: SearchSpace, count: int, random_state: np.random.Generator
+) -> List[Dict]:
+    """
+    Samples hyperparameters uniformly from the search space (log-uniformly for wide numeric ranges).
+    """
+    return [
+        from_unit(space, point) for point in random_state.random((count, len(space)))
+    ]
+
+
+def get_training_slice(dataset: Dataset, budget: float) -> Dataset:
+    """
+    Dataset whose training part is shortened to the first `budget` fraction (see :func:`~ldimbenchmark.datasets.classes.get_dataset_time_slice`).
+    """
+    if budget >= 1:
+        return dataset
+    training = dataset.info["dataset"]["training"]
+    return get_dataset_time_slice(
+        dataset,
+        "training",
+        training["start"],
+        training["start"] + (training["end"] - training["start"]) * budget,
+    )
+
+
+def _get_ranking(scores: List[float]) -> np.ndarray:
+    # Failed candidates (NaN) are ranked last
+    return np.argsort(-np.nan_to_num(np.array(scores, dtype=float), nan=-np.inf))
+
+
+def get_budgets(min_budget: float, eta: int) -> List[float]:
+    """
+    Budgets of the rungs of successive halving: min_budget, min_budget * eta, ... up to the full budget (1).
+    """
+    rungs = max(int(math.ceil(round(math.log(1 / min_budget, eta), 8))), 0)
+    return [min(min_budget * eta**rung, 1.0) for rung in range(rungs)] + [1.0]
+
+
+def successive_halving(
+    evaluate: EvaluateCallback,
+    candidates: List[Dict],
+    min_budget: float = 1 / 9,
+    eta: int = 3,
+) -> List[Dict]:
+    """
+    Evaluates all candidates on the smallest budget and promotes the best `1/eta` of them to the next budget, until the full budget.
+
+    :param evaluate: Callback scoring a list of hyperparameters on a budget (higher is better)
+    :param candidates: Hyperparameters to start with
+    :param min_budget: Fraction of the training data the candidates are first evaluated on
+    :param eta: Reduction factor of the candidates (and increase of the budget) per rung
+    :return: The trials (rung, budget, hyperparameters and score of each evaluation)
+    """
+    trials = []
+    budgets = get_budgets(min_budget, eta)
+    for rung, budget in enumerate(budgets):
+        logging.info(
+            f"Successive halving: Evaluating {len(candidates)} candidates on {budget:.0%} of the training data"
+        )
+        scores = evaluate(candidates, budget)
+        trials += [
+            {
+                "rung": rung,
+                "budget": budget,
+                "hyperparameters": hyperparameters,
+                "score": score,
+            }
+            for hyperparameters, score in zip(candidates, scores)
+        ]
+        if rung < len(budgets) - 1:
+            promoted = max(len(candidates) // eta, 1)
+            candidates = [
+                candidates[index] for index in _get_ranking(scores)[:promoted]
+            ]
+    return trials
+
+
+def hyperband(
+    evaluate: EvaluateCallback,
+    space: SearchSpace,
+    min_budget: float = 1 / 9,
+    eta: int = 3,
+    random_state: np.random.Generator = None,
+) -> List[Dict]:
+    """
+    Runs successive halving in brackets, from many candidates on a small budget to few candidates on the full budget.
+
+    See: Li et al. (2018), Hyperband: A Novel Bandit-Based Approach to Hyperparameter Optimization
+    """
+    if random_state is None:
+        random_state = np.random.default_rng()
+    trials = []
+    brackets = len(get_budgets(min_budget, eta)) - 1
+    for bracket in range(brackets, -1, -1):
+        count = int(math.ceil((brackets + 1) / (bracket + 1) * eta**bracket))
+        bracket_trials = successive_halving(
+            evaluate,
+            sample_candidates(space, count, random_state),
+            min_budget=float(eta) ** -bracket,
+            eta=eta,
+        )
+        trials += [{"bracket": bracket, **trial} for trial in bracket_trials]
+    return trials
+
+
+def _expected_improvement(
+    mean: np.ndarray, std: np.ndarray, best: float, xi: float = 0.01
+) -> np.ndarray:
+    from scipy.stats import norm
+
+    std = np.maximum(std, 1e-9)
+    z = (mean - best - xi) / std
+    return (mean - best - xi) * norm.cdf(z) + std * norm.pdf(z)
+
+
+def bayesian_optimization(
+    evaluate: EvaluateCallback,
+    space: SearchSpace,
+    n_iterations: int = 20,
+    n_initial: int = 5,
+    budget: float = 1.0,
+    random_state: np.random.Generator = None,
+    n_samples: int = 1000,
+) -> List[Dict]:
+    """
+    Sequentially evaluates the candidates with the highest expected improvement according to a gaussian process (fitted on the previous scores).
+
+    :param n_iterations: Number of evaluations (including the initial ones)
+    :param n_initial: Number of randomly sampled candidates to start with
+    :param budget: Fraction of the training data the candidates are evaluated on
+    :param n_samples: Number of random points the expected improvement is maximized over
+    """
+    from sklearn.gaussian_process import GaussianProcessRegressor
+    from sklearn.gaussian_process.kernels import Matern, WhiteKernel
+
+    if random_state is None:
+        random_state = np.random.default_rng()
+    trials = []
+    candidates = sample_candidates(space, min(n_initial, n_iterations), random_state)
+    for hyperparameters, score in zip(candidates, evaluate(candidates, budget)):
+        trials.append(
+            {"budget": budget, "hyperparameters": hyperparameters, "score": score}
+        )
+
+    while len(trials) < n_iterations:
+        points = np.array(
+            [to_unit(space, trial["hyperparameters"]) for trial in trials]
+        )
+        scores = np.array([trial["score"] for trial in trials], dtype=float)
+        # Failed candidates are as bad as the worst candidate
+        scores = np.nan_to_num(
+            scores, nan=np.nanmin(scores) if np.isfinite(scores).any() else 0.0
+        )
+        surrogate = GaussianProcessRegressor(
+            kernel=Matern(nu=2.5) + WhiteKernel(),
+            normalize_y=True,
+            random_state=int(random_state.integers(2**31)),
+        ).fit(points, scores)
+        samples = random_state.random((n_samples, len(space)))
+        mean, std = surrogate.predict(samples, return_std=True)
+        hyperparameters = from_unit(
+            space, samples[np.argmax(_expected_improvement(mean, std, scores.max()))]
+        )
+        score = evaluate([hyperparameters], budget)[0]
+        trials.append(
+            {"budget": budget, "hyperparameters": hyperparameters, "score": score}
+        )
+    return trials
+
+
+def get_best_hyperparameters(trials: pd.DataFrame) -> pd.Series:
+    """
+    Best hyperparameters found per method and dataset (on the full budget).
+
+    :param trials: Trials as returned by :meth:`~ldimbenchmark.LDIMBenchmark.run_hyperparameter_search`
+    """
+    full_trials = trials[trials["budget"] >= 1].dropna(subset=["score"])
+    best = full_trials.loc[full_trials.groupby(["method", "dataset"])["score"].idxmax()]
+    return best.set_index(["method", "dataset"])["hyperparameters"]
@@ -0,0 +1,137 @@
+"""
+Smoke benchmark: Runs the methods only on short windows of each dataset for fast feedback.
+
+The windows are placed around a sample of the ground truth leaks (leak windows) and in stretches without any leak (leak-free windows, which can only produce false positives).
+Since every window is a separate run, the metrics over all runs are estimated with bootstrap confidence intervals (resampling the windows).
+"""
+import logging
+from typing import Callable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ldimbenchmark.evaluation_metrics import f1Score, precision, recall
+
+COUNT_COLUMNS = ["true_positives", "false_positives", "false_negatives"]
+
+
+def get_smoke_windows(
+    leaks: DataFrame,
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    n_leaks: int = 5,
+    n_leak_free: int = 2,
+    before: pd.Timedelta = pd.Timedelta("1D"),
+    after: pd.Timedelta = pd.Timedelta("2D"),
+    random_state: np.random.Generator = None,
+    max_tries: int = 100,
+) -> List[Tuple[pd.Timestamp, pd.Timestamp, str]]:
+    """
+    Selects the windows of a dataset part to run the smoke benchmark on.
+
+    :param leaks: Ground truth leaks of the dataset (with `leak_time_start` and `leak_time_end`)
+    :param start: Start of the dataset part
+    :param end: End of the dataset part
+    :param n_leaks: Number of leaks to sample, each leak window spans from `before` the leak start to `after` the leak start
+    :param n_leak_free: Number of leak-free windows (of the same length as the leak windows) to sample
+    :param max_tries: Number of random positions tried per leak-free window
+    :return: List of (start, end, kind) with kind "leak" or "leak-free", windows are clipped to the dataset part
+    """
+    if random_state is None:
+        random_state = np.random.default_rng()
+    start = pd.to_datetime(start, utc=True)
+    end = pd.to_datetime(end, utc=True)
+    leak_starts = pd.to_datetime(leaks["leak_time_start"], utc=True)
+    # Leaks without end last until the end of the dataset
+    leak_ends = pd.to_datetime(leaks["leak_time_end"], utc=True).fillna(
+        max(end, leak_starts.max())
+    )
+
+    windows = []
+    part_leaks = leak_starts[(leak_starts > start) & (leak_starts < end)].sort_values()
+    if len(part_leaks) > n_leaks:
+        part_leaks = part_leaks.iloc[
+            np.sort(random_state.choice(len(part_leaks), n_leaks, replace=False))
+        ]
+    for leak_start in part_leaks:
+        windows.append(
+            (max(leak_start - before, start), min(leak_start + after, end), "leak")
+        )
+
+    length = before + after
+    if length >= end - start:
+        if n_leak_free > 0:
+            logging.warning(
+                f"Dataset part is shorter than the window length {length}, no leak-free windows are selected"
+            )
+        return windows
+    leak_free = 0
+    for _ in range(n_leak_free * max_tries):
+        if leak_free >= n_leak_free:
+            break
+        window_start = start + (end - start - length) * random_state.random()
+        window_end = window_start + length
+        if ((leak_starts < window_end) & (leak_ends > window_start)).any():
+            continue
+        windows.append((window_start.floor("s"), window_end.floor("s"), "leak-free"))
+        leak_free += 1
+    if leak_free < n_leak_free:
+        logging.warning(
+            f"Only found {leak_free} of {n_leak_free} leak-free windows of length {length}"
+        )
+    return windows
+
+
+def bootstrap_metrics(
+    counts: DataFrame,
+    by: Union[str, List[str]],
+    evaluations: List[Callable] = [precision, recall, f1Score],
+    confidence: float = 0.95,
+    n_bootstrap: int = 1000,
+    random_state: np.random.Generator = None,
+) -> DataFrame:
+    """
+    Estimates the metrics of groups of runs (e.g. all windows of a method) with bootstrap confidence intervals.
+
+    The metrics are calculated on the summed counts of all runs of a group,
+    the confidence interval is given by the percentiles of the metrics over `n_bootstrap` resamples (with replacement) of the runs.
+
+    :param counts: One row per run with the columns to group by and the counts (true positives, false positives and false negatives)
+    :param evaluations: Metrics to calculate on the counts (e.g. :func:`~ldimbenchmark.evaluation_metrics.precision`)
+    :param confidence: Confidence level of the intervals
+    :return: Counts and metrics per group, the interval bounds of each metric in `<metric>_ci_low` and `<metric>_ci_high`
+    """
+    if random_state is None:
+        random_state = np.random.default_rng()
+    lower_percentile = (1 - confidence) / 2 * 100
+    upper_percentile = 100 - lower_percentile
+
+    group_columns = [by] if isinstance(by, str) else by
+    results = []
+    for group, runs in counts.groupby(by, sort=True):
+        values = runs[COUNT_COLUMNS].to_numpy(dtype=float)
+        estimate = DataFrame([values.sum(axis=0)], columns=COUNT_COLUMNS)
+        samples = random_state.integers(0, len(values), (n_bootstrap, len(values)))
+        resampled = DataFrame(values[samples].sum(axis=1), columns=COUNT_COLUMNS)
+        for function in evaluations:
+            estimate = function(estimate)
+            resampled = function(resampled)
+        metrics = [column for column in estimate.columns if column not in COUNT_COLUMNS]
+
+        result = dict(
+            zip(group_columns, group if isinstance(group, tuple) else (group,))
+        )
+        result["windows"] = len(values)
+        result.update(estimate.iloc[0].to_dict())
+        for metric in metrics:
+            # Resamples with undefined metrics (e.g. nothing detected) are ignored
+            metric_values = resampled[metric].to_numpy(dtype=float)
+            metric_values = metric_values[np.isfinite(metric_values)]
+            result[f"{metric}_ci_low"], result[f"{metric}_ci_high"] = (
+                np.percentile(metric_values, [lower_percentile, upper_percentile])
+                if len(metric_values) > 0
+                else (np.nan, np.nan)
+            )
+        results.append(result)
+    return DataFrame(results, columns=None if results else group_columns).set_index(by)
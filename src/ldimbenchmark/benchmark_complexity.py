@@ -1,18 +1,21 @@
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
-import importlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import copy
+import multiprocessing
 import os
+import queue
 import shutil
+import tempfile
 import time
-from datetime import datetime
 from glob import glob
 import logging
-import docker
 
 import enlighten
 from matplotlib import pyplot as plt
 from matplotlib.ticker import FormatStrFormatter
 from ldimbenchmark.benchmark.results import load_result
-from ldimbenchmark.benchmark.runners import DockerMethodRunner
+from ldimbenchmark.benchmark.runners.DockerMethodRunner import DockerMethodRunner
+from ldimbenchmark.benchmark.runners.LocalMethodRunner import LocalMethodRunner
 from ldimbenchmark.constants import LDIM_BENCHMARK_CACHE_DIR
 from ldimbenchmark.datasets import Dataset
 from ldimbenchmark.generator import (
@@ -22,33 +25,260 @@ from ldimbenchmark.generator import (
 from ldimbenchmark.classes import LDIMMethodBase
 import numpy as np
 import pandas as pd
-import wntr
-import yaml
 import big_o
 import matplotlib as mpl
-from typing import List
+from typing import Dict, List, Literal, Union
 
 from ldimbenchmark.utilities import convert_byte_size, get_method_name_from_docker_image
 
+# CPU the current worker process is pinned to
+_WORKER_CPU = None
+# Seconds a starting worker waits for a free CPU
+_CPU_QUEUE_TIMEOUT = 10
 
-def loadDataset_local(dataset_path):
-    dataset = Dataset(dataset_path)
-    dataset.loadData().loadBenchmarkData()
-    del dataset
-    dataset = Dataset(dataset_path)
 
-    # dataset.is_valid()
-    number = int(os.path.basename(os.path.normpath(dataset_path)).split("-")[-1])
-    return (
-        number,
-        dataset
-        # dataset.getTrainingBenchmarkData(),
-        # dataset.getEvaluationBenchmarkData(),
+def get_method_name(method: Union[str, LDIMMethodBase]) -> str:
+    if isinstance(method, str):
+        return get_method_name_from_docker_image(method)
+    return method.name
+
+
+def get_available_cpus() -> List[int]:
+    """
+    CPUs the current process is allowed to run on.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def _cache_dataset(dataset_path: str):
+    # Builds the dataset cache once, so the measured runs do not parse the raw data
+    Dataset(dataset_path).ensure_cached()
+    return int(os.path.basename(os.path.normpath(dataset_path)).split("-")[-1])
+
+
+def _run_method(
+    method: Union[str, LDIMMethodBase],
+    dataset_path: str,
+    hyperparameters: dict,
+    results_folder: str,
+    debug: bool,
+):
+    if isinstance(method, str):
+        runner = DockerMethodRunner(
+            method,
+            Dataset(dataset_path),
+            "evaluation",
+            hyperparameters,
+            resultsFolder=results_folder,
+            debug=debug,
+            capture_docker_stats=True,
+            cpu_count=1,
+            cpuset_cpus=None if _WORKER_CPU is None else str(_WORKER_CPU),
+            mem_limit="20g",
+        )
+    else:
+        runner = LocalMethodRunner(
+            detection_method=copy.deepcopy(method),
+            dataset=Dataset(dataset_path),
+            dataset_part="evaluation",
+            hyperparameters=hyperparameters,
+            resultsFolder=results_folder,
+            debug=debug,
+        )
+    try:
+        return runner.run()
+    except Exception as e:
+        logging.error(f"Failed to run {runner.id}: {e}")
+        return None
+
+
+def _init_complexity_worker(cpu_queue, warmup_args):
+    """
+    Pins the worker to its own CPU and warms it up (imports, caches, image), so concurrent runs do not perturb each other.
+    """
+    global _WORKER_CPU
+    try:
+        # Workers only find the queue empty if the pool has more workers than CPUs queued
+        _WORKER_CPU = cpu_queue.get(timeout=_CPU_QUEUE_TIMEOUT)
+    except queue.Empty:
+        logging.warning("No free CPU left for the worker, running without pinning")
+        _WORKER_CPU = None
+    if _WORKER_CPU is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {_WORKER_CPU})
+
+    method, dataset_path, hyperparameters, n_warmup = warmup_args
+    with tempfile.TemporaryDirectory() as warmup_folder:
+        for _ in range(n_warmup):
+            _run_method(method, dataset_path, hyperparameters, warmup_folder, False)
+
+
+def _measure_complexity(
+    method: Union[str, LDIMMethodBase],
+    number: int,
+    repeat: int,
+    dataset_path: str,
+    hyperparameters: dict,
+    results_folder: str,
+    debug: bool,
+) -> Dict:
+    result_folder = _run_method(
+        method, dataset_path, hyperparameters, results_folder, debug
+    )
+    result = {}
+    if result_folder is not None:
+        result = load_result(result_folder, try_load_docker_stats=True)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "time": result.get("method_time", np.nan),
+        "memory": result.get("memory_max", np.nan),
+    }
+
+
+def _run_measurements(
+    method: Union[str, LDIMMethodBase],
+    n_samples,
+    n_repeats: int,
+    datasets: Dict[int, str],
+    hyperparameters: dict,
+    results_folder: str,
+    debug: bool,
+    cpus: List[int],
+    n_warmup: int,
+    on_measurement=None,
+) -> List[Dict]:
+    """
+    Measures the method n_repeats times on each problem size, with one worker pinned to each of the cpus.
+
+    If a worker dies (e.g. killed by the OOM killer on a large problem size) the pool is broken,
+    the runs in progress are counted as failed and the pool is recreated for the remaining runs.
+    After failures on two problem sizes the larger problem sizes are skipped.
+    """
+    # Small problem sizes first, so failures on the large ones can be skipped
+    tasks = [(n, r) for n in n_samples for r in range(n_repeats)]
+    measurements = []
+    failed_numbers = set()
+
+    def record(measurement: Dict):
+        measurements.append(measurement)
+        if on_measurement is not None:
+            on_measurement(measurement)
+        if np.isnan(measurement["time"]):
+            failed_numbers.add(measurement["number"])
+            if len(failed_numbers) == 2:
+                # if we failed twice, we assume that the method is not working for larger problems
+                logging.error(
+                    f"Failed to run {get_method_name(method)} on dataset {measurement['number']} repeatedly. Skipping larger datasets!"
+                )
+
+    def is_skipped(n) -> bool:
+        return len(failed_numbers) > 1 and n > min(failed_numbers)
+
+    while len(tasks) > 0:
+        # A broken pool does not replace its workers, so every pool gets its own CPUs to pin to
+        cpu_queue = multiprocessing.Queue()
+        for cpu in cpus:
+            cpu_queue.put(cpu)
+        finished = set()
+        broken = False
+        with ProcessPoolExecutor(
+            max_workers=len(cpus),
+            initializer=_init_complexity_worker,
+            initargs=(
+                cpu_queue,
+                (method, datasets[n_samples[0]], hyperparameters, n_warmup),
+            ),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _measure_complexity,
+                    method,
+                    n,
+                    r,
+                    datasets[n],
+                    hyperparameters,
+                    os.path.join(results_folder, str(r)),
+                    debug,
+                ): (n, r)
+                for n, r in tasks
+            }
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    measurement = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    break
+                except Exception as e:
+                    n, r = futures[future]
+                    logging.exception(
+                        f"Failed to measure {get_method_name(method)} on dataset {n}: {e}"
+                    )
+                    measurement = {
+                        "number": n,
+                        "repeat": r,
+                        "time": np.nan,
+                        "memory": np.nan,
+                    }
+                finished.add(futures[future])
+                record(measurement)
+                if len(failed_numbers) > 1:
+                    for pending, (n, _) in futures.items():
+                        if is_skipped(n):
+                            pending.cancel()
+            if broken:
+                # Runs which completed before the pool broke
+                for future, task in futures.items():
+                    if (
+                        task not in finished
+                        and future.done()
+                        and not future.cancelled()
+                        and future.exception() is None
+                    ):
+                        finished.add(task)
+                        record(future.result())
+
+        tasks = [task for task in tasks if task not in finished]
+        if broken:
+            # The first runs not finished were in progress on the workers (in submission order)
+            crashed, tasks = tasks[: len(cpus)], tasks[len(cpus) :]
+            for n, r in crashed:
+                logging.error(
+                    f"Worker running {get_method_name(method)} on dataset {n} died"
+                )
+                record({"number": n, "repeat": r, "time": np.nan, "memory": np.nan})
+        tasks = [(n, r) for n, r in tasks if not is_skipped(n)]
+    return measurements
+
+
+def _get_robust_statistics(measurements: pd.DataFrame, n_samples, n_repeats: int):
+    """
+    Median and interquartile range over the repeats for each problem size.
+    """
+    matrix = measurements.pivot(index="number", columns="repeat").reindex(
+        index=n_samples
+    )
+    values = measurements.columns.drop(["number", "repeat"])
+    matrix = pd.concat(
+        {value: matrix[value].reindex(columns=range(n_repeats)) for value in values},
+        axis=1,
+    )
+    medians = pd.DataFrame({value: matrix[value].median(axis=1) for value in values})
+    iqrs = pd.DataFrame(
+        {
+            value: matrix[value].quantile(0.75, axis=1)
+            - matrix[value].quantile(0.25, axis=1)
+            for value in values
+        }
     )
+    return matrix, medians, iqrs
 
 
 def run_benchmark_complexity(
-    methods: List[str],
+    methods: List[Union[str, LDIMMethodBase]],
     hyperparameters,
     cache_dir=os.path.join(LDIM_BENCHMARK_CACHE_DIR, "datagen"),
     out_folder="out/complexity",
@@ -57,10 +287,22 @@ def run_benchmark_complexity(
     n_repeats=3,
     n_measures=10,
     n_max=91,
+    n_warmup=1,
+    parallel=True,
+    max_workers=None,
+    simulator: Literal["WNTR", "EPANET"] = "WNTR",
 ):
     """
     Run the benchmark for the given methods and datasets.
-    :param methods: List of methods to run (only supports LocalMethodRunner currently)
+
+    The runs of all problem sizes and repeats are distributed over worker processes, each pinned to its own CPU.
+    Each worker is warmed up before measuring, the complexity is inferred from the median of the repeats.
+
+    :param methods: List of methods to run (docker images or local methods)
+    :param n_warmup: Number of unmeasured runs (on the smallest problem size) per worker
+    :param parallel: Run different problem sizes concurrently
+    :param max_workers: Maximum number of concurrent runs (defaults to the number of available CPUs)
+    :param simulator: Hydraulic solver used to generate the datasets
     """
 
     if not os.path.exists(out_folder):
@@ -74,41 +316,42 @@ def run_benchmark_complexity(
     logging.info(" > Generating Datasets")
     if style == "periods":
         datasets_dir = os.path.join(cache_dir, "synthetic-days")
-        generateDatasetsForTimespan(1, n_max, datasets_dir)
+        generateDatasetsForTimespan(1, n_max, datasets_dir, simulator=simulator)
     if style == "junctions":
         datasets_dir = os.path.join(cache_dir, "synthetic-junctions")
-        generateDatasetsForJunctions(4, n_max, datasets_dir)
+        generateDatasetsForJunctions(4, n_max, datasets_dir, simulator=simulator)
 
-    dataset_dirs = glob(datasets_dir + "/*/")
     min_n = 4
-    n_samples = np.linspace(min_n, n_max - 1, n_measures).astype("int64")
+    n_samples = np.unique(np.linspace(min_n, n_max - 1, n_measures).astype("int64"))
+    dataset_dirs = [
+        dataset_dir
+        for dataset_dir in glob(datasets_dir + "/*/")
+        if int(os.path.basename(os.path.normpath(dataset_dir)).split("-")[-1])
+        in n_samples
+    ]
+
+    cpus = get_available_cpus()
+    worker_num = 1
+    if parallel:
+        worker_num = len(cpus)
+        if max_workers is not None:
+            worker_num = min(max_workers, len(cpus))
 
     manager = enlighten.get_manager()
     bar_loading_data = manager.counter(
-        total=len(dataset_dirs), desc="Validating data", unit="datasets"
+        total=len(dataset_dirs), desc="Caching data", unit="datasets"
     )
     bar_loading_data.update(incr=0)
 
-    # logging.info(" > Loading Data")
     datasets = {}
     try:
-        parallel = True
-        if parallel:
-            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-                # submit all tasks and get future objects
-                futures = [
-                    executor.submit(loadDataset_local, dataset_dir)
-                    for dataset_dir in dataset_dirs
-                ]
-                # process results from tasks in order of task completion
-                for future in as_completed(futures):
-                    dataset_id, dataset = future.result()
-                    datasets[dataset_id] = dataset
-                    bar_loading_data.update()
-        else:
-            for dataset_dir in dataset_dirs:
-                dataset_id, dataset = loadDataset_local(dataset_dir)
-                datasets[dataset_id] = dataset
+        with ProcessPoolExecutor(max_workers=len(cpus)) as executor:
+            futures = {
+                executor.submit(_cache_dataset, dataset_dir): dataset_dir
+                for dataset_dir in dataset_dirs
+            }
+            for future in as_completed(futures):
+                datasets[future.result()] = futures[future]
                 bar_loading_data.update()
     except KeyboardInterrupt:
         manager.stop()
@@ -124,111 +367,58 @@ def run_benchmark_complexity(
     )
     logging.info(" > Starting Complexity analysis")
     for method in methods:
-        method_name = get_method_name_from_docker_image(method)
+        method_name = get_method_name(method)
         logging.info(f" - {method_name}")
         complexity_benchmark_result_folder = os.path.join(
             out_folder, "runs", method_name
         )
         shutil.rmtree(complexity_benchmark_result_folder, ignore_errors=True)
-        client = docker.from_env()
-        logging.info(" > Pulling Image")
-        try:
-            image = client.images.get(method)
-        except docker.errors.ImageNotFound:
-            logging.info("Image does not exist. Pulling it...")
-            client.images.pull(method)
-
-        summed_results = {"time": [], "ram": []}
-        for r in range(n_repeats):
-            failing = False
-            for i, n in enumerate(n_samples):
-                complexity_benchmark_result_folder_run = os.path.join(
-                    complexity_benchmark_result_folder, str(r)
-                )
-                runner = DockerMethodRunner(
-                    method,
-                    datasets[n],
-                    "evaluation",
-                    hyperparameters[method_name],
-                    resultsFolder=complexity_benchmark_result_folder_run,
-                    debug=additionalOutput,
-                    capture_docker_stats=True,
-                    cpu_count=1,
-                    mem_limit="20g",
-                )
-                result = runner.run()
-                if result is None:
-                    if failing:
-                        # if we failed twice in a row, we assume that the method is not working
-                        logging.error(
-                            f"Failed to run {method_name} on dataset {n} repeatedly. Skipping further attempts!"
-                        )
-                        break
-                    failing = True
-
-            parallel = True
-            result_folders = glob(
-                os.path.join(complexity_benchmark_result_folder_run, "*")
-            )
-            run_results = []
-            if parallel == True:
-                with ProcessPoolExecutor() as executor:
-                    # submit all tasks and get future objects
-                    futures = [
-                        executor.submit(load_result, folder, try_load_docker_stats=True)
-                        for folder in result_folders
-                    ]
-                    # process results from tasks in order of task completion
-                    for future in as_completed(futures):
-                        result = future.result()
-                        run_results.append(result)
-            else:
-                for experiment_result in result_folders:
-                    run_results.append(load_result(experiment_result, True))
-
-            run_results = pd.DataFrame(run_results)
-            run_results["number"] = (
-                run_results["dataset"].str.split("-").str[2].astype(int)
-            )
-            for i, n in enumerate(n_samples):
-                if not (run_results["number"] == n).any():
-                    # If there is no result for this number of samples, we add a an empty result
-                    run_results = run_results.append(
-                        {
-                            "number": n,
-                        },
-                        ignore_index=True,
-                    )
-
-            sorted_results = run_results.sort_values(by=["number"])
 
-            summed_results["time"] = np.append(
-                summed_results["time"], sorted_results["method_time"]
-            )
-            summed_results["ram"] = np.append(
-                summed_results["ram"], sorted_results["memory_max"]
+        bar_runs = manager.counter(
+            total=len(n_samples) * n_repeats,
+            desc=f"Runs {method_name}",
+            unit="runs",
+            leave=False,
+        )
+        try:
+            measurements = _run_measurements(
+                method,
+                n_samples,
+                n_repeats,
+                datasets,
+                hyperparameters[method_name],
+                complexity_benchmark_result_folder,
+                additionalOutput,
+                cpus[:worker_num],
+                n_warmup,
+                on_measurement=lambda measurement: bar_runs.update(),
             )
+        except KeyboardInterrupt:
+            manager.stop()
+            os.kill(os.getpid(), 9)
+        bar_runs.close()
 
-        value_matrix_time = summed_results["time"].reshape(
-            (len(n_samples), n_repeats), order="F"
+        measurements = pd.DataFrame(
+            measurements, columns=["number", "repeat", "time", "memory"]
         )
-        summed = np.sum(value_matrix_time, axis=1)
-        scaled = summed / summed.max()
+        matrix, medians, iqrs = _get_robust_statistics(
+            measurements, n_samples, n_repeats
+        )
+        value_matrix_time = matrix["time"].to_numpy(dtype="float64")
+        value_matrix_ram = matrix["memory"].to_numpy(dtype="float64")
+
+        scaled = medians["time"] / medians["time"].max()
         scaled = np.nan_to_num(scaled, nan=1)
         best_cpu, rest = big_o.infer_big_o_class(
-            sorted_results["number"], scaled, simplicity_bias=0.004
+            n_samples, scaled, simplicity_bias=0.004
         )
         classes = pd.DataFrame({"class": rest.keys(), "residual": rest.values()})
         classes.to_csv(os.path.join(out_folder, f"complexities_time_{method_name}.csv"))
 
-        value_matrix_ram = summed_results["ram"].reshape(
-            (len(n_samples), n_repeats), order="F"
-        )
-        summed = np.sum(value_matrix_ram, axis=1)
-        scaled = summed / summed.max()
+        scaled = medians["memory"] / medians["memory"].max()
         scaled = np.nan_to_num(scaled, nan=1)
         best_ram, rest = big_o.infer_big_o_class(
-            sorted_results["number"], scaled, simplicity_bias=0.00004
+            n_samples, scaled, simplicity_bias=0.00004
         )
         classes = pd.DataFrame({"class": rest.keys(), "residual": rest.values()})
         classes.to_csv(os.path.join(out_folder, f"complexities_ram_{method_name}.csv"))
@@ -243,8 +433,10 @@ def run_benchmark_complexity(
         )
 
         dataseries = {
-            f"time_overall_{method_name}": np.average(value_matrix_time, axis=1),
-            f"memory_overall_{method_name}": np.average(value_matrix_ram, axis=1),
+            f"time_overall_{method_name}": medians["time"].to_list(),
+            f"time_iqr_{method_name}": iqrs["time"].to_list(),
+            f"memory_overall_{method_name}": medians["memory"].to_list(),
+            f"memory_iqr_{method_name}": iqrs["memory"].to_list(),
         }
         for n in range(n_repeats):
             # Use underscores to hide hide the labels in the plot
@@ -254,13 +446,9 @@ def run_benchmark_complexity(
             ].tolist()
         measures = pd.DataFrame(
             dataseries,
-            index=sorted_results["number"].to_list(),
+            index=n_samples.tolist(),
         )
         result_measures.append(measures)
-        # measures.to_csv(os.path.join(out_folder, "measures_raw.csv"))
-        # pd.DataFrame(list(others.items())[1:8]).to_csv(
-        #     os.path.join(out_folder, "big_o.csv"), header=False, index=False
-        # )
         bar_running_analysis.update()
 
         # Cooldown for 10 seconds
@@ -376,11 +564,7 @@ def run_benchmark_complexity(
 
     # Raw Time Values
     ax = result_measures[
-        [
-            col
-            for col in result_measures.columns
-            if ("time" in col and not "overall" in col)
-        ]
+        [col for col in result_measures.columns if ("time" in col and "_run_" in col)]
     ].plot(alpha=0.2, color="black", label="_nolegend")
     for col in overall_measures.columns:
         if "time" in col:
@@ -402,11 +586,7 @@ def run_benchmark_complexity(
     plt.close(fig)
 
     ax = result_measures[
-        [
-            col
-            for col in result_measures.columns
-            if ("memory" in col and not "overall" in col)
-        ]
+        [col for col in result_measures.columns if ("memory" in col and "_run_" in col)]
     ].plot(alpha=0.2, color="black", label="_nolegend")
     for col in overall_measures.columns:
         if "memory" in col:
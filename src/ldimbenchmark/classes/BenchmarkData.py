@@ -1,11 +1,14 @@
 import logging
 import re
 from pandas import DataFrame
-from wntr.network import WaterNetworkModel
-from typing import Literal, Optional, TypedDict, Dict, Union, List, Type
+from typing import TYPE_CHECKING, Literal, Optional, TypedDict, Dict, Union, List, Type
 from datetime import datetime
 from abc import ABC, abstractmethod
 
+if TYPE_CHECKING:
+    from wntr.network import WaterNetworkModel
+
+
 class BenchmarkData:
     """
     Representation of the File Based Benchmark Dataset
@@ -17,7 +20,7 @@ class BenchmarkData:
         demands: Dict[str, DataFrame],
         flows: Dict[str, DataFrame],
         levels: Dict[str, DataFrame],
-        model: WaterNetworkModel,
+        model: "WaterNetworkModel",
         dmas: Dict[str, List[str]],
     ):
         """
@@ -1,7 +1,9 @@
 import logging
 import re
-from typing import List
+from typing import List, Union
 from abc import ABC, abstractmethod
+
+from pandas import DataFrame, Series
 from ldimbenchmark.classes.BenchmarkData import BenchmarkData
 from ldimbenchmark.classes.BenchmarkLeakageResult import BenchmarkLeakageResult
 
@@ -66,6 +68,24 @@ class LDIMMethodBase(ABC):
             self.hyperparameters = {}
         self.hyperparameters.update(hyperparameters)
 
+    def write_debug_data(
+        self, name: str, data: Union[DataFrame, Series], append: bool = False
+    ) -> None:
+        """
+        Writes time indexed debug data (only in debug mode), which is plotted alongside the leaks.
+
+        The data is stored as indexed table, so that only the time window around a leak has to be read again.
+
+        :param name: Name of the debug data
+        :param data: Time indexed data
+        :param append: Append the data as new chunk (e.g. for writing debug data in `detect_online`)
+        """
+        if not self.debug:
+            return
+        from ldimbenchmark.utilities import write_debug_data
+
+        write_debug_data(self.additional_output_path, name, data, append=append)
+
     @abstractmethod
     def prepare(self, training_data: BenchmarkData = None) -> None:
         """
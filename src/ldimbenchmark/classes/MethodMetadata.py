@@ -1,7 +1,6 @@
 import logging
 import re
 from pandas import DataFrame
-from wntr.network import WaterNetworkModel
 from typing import Literal, Optional, TypedDict, Dict, Union, List, Type
 from datetime import datetime
 from abc import ABC, abstractmethod
@@ -2,7 +2,14 @@
 dataset_library.py
 """
 
+from ldimbenchmark._lazy import lazy_attributes
 
-from ldimbenchmark.datasets.library import DatasetLibrary, DATASETS
-from ldimbenchmark.datasets.classes import Dataset
-from ldimbenchmark.datasets.derivation import DatasetDerivator
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "DatasetLibrary": "ldimbenchmark.datasets.library",
+        "DATASETS": "ldimbenchmark.datasets.library",
+        "Dataset": "ldimbenchmark.datasets.classes",
+        "DatasetDerivator": "ldimbenchmark.datasets.derivation",
+    },
+)
@@ -2,7 +2,6 @@ from asyncio import as_completed
 from concurrent.futures import ProcessPoolExecutor
 from math import nan
 import math
-from ldimbenchmark.benchmark.benchmark import plot_leak
 from ldimbenchmark.constants import CPU_COUNT
 from ldimbenchmark.datasets.classes import Dataset
 import os
@@ -1,18 +1,16 @@
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 import pickle
 import numpy as np
 import pandas as pd
 import os
-from wntr.network.io import read_inpfile, write_inpfile
-from wntr.network import WaterNetworkModel
 from datetime import datetime
-from ldimbenchmark.classes import BenchmarkData
+from ldimbenchmark.classes import BenchmarkData, MethodMetadataDataNeeded
 import numpy as np
 import pandas as pd
 import os
 from glob import glob
 import json
-from typing import Literal, Optional, TypedDict, Dict
+from typing import TYPE_CHECKING, List, Literal, Optional, TypedDict, Dict
 from ldimbenchmark.constants import CPU_COUNT, LDIM_BENCHMARK_CACHE_DIR
 import shutil
 import hashlib
@@ -25,7 +23,10 @@ import copy
 import yaml
 from yaml import CDumper
 from yaml.representer import SafeRepresenter
-from ldimbenchmark.utilities import dirhash
+from ldimbenchmark.utilities import _filehash, dirhash
+
+if TYPE_CHECKING:
+    from wntr.network import WaterNetworkModel
 
 
 # Fix for Timestamp parsing/dumping in yaml
@@ -74,19 +75,36 @@ class DatasetInfo(TypedDict):
     inp_file: str
     derivations: DatasetInfoDerivations
     checksum: Optional[str]
+    format_version: Optional[int]
+
+
+SENSOR_TYPES = ["pressures", "demands", "flows", "levels"]
+# Version of the layout of the data files:
+# 1: one file per sensor in a folder per sensor type (e.g. `pressures/J-01.csv`)
+# 2: one hdf5 file per sensor type (e.g. `pressures.h5`)
+DATASET_FORMAT_VERSION = 2
+
+
+def _is_ignored(data_needed: MethodMetadataDataNeeded, data_type: str) -> bool:
+    """
+    Checks if the data type is marked as "ignored" by the method metadata.
+    """
+    return isinstance(data_needed, dict) and data_needed.get(data_type) == "ignored"
 
 
 class _LoadedDatasetPartNew:
     """
     A sub-dataset of a loaded dataset (e.g. training or evaluation)
+
+    Sensor types which were not loaded are None.
     """
 
     def __init__(self, dict: Dict[str, DataFrame]):
-        self.pressures: Dict[str, DataFrame] = dict["pressures"]
-        self.demands: Dict[str, DataFrame] = dict["demands"]
-        self.flows: Dict[str, DataFrame] = dict["flows"]
-        self.levels: Dict[str, DataFrame] = dict["levels"]
-        self.leaks: DataFrame = dict["leaks"]
+        self.pressures: Dict[str, DataFrame] = dict.get("pressures", None)
+        self.demands: Dict[str, DataFrame] = dict.get("demands", None)
+        self.flows: Dict[str, DataFrame] = dict.get("flows", None)
+        self.levels: Dict[str, DataFrame] = dict.get("levels", None)
+        self.leaks: DataFrame = dict.get("leaks", None)
 
 
 def write_to_file(dataframe, file_path):
@@ -94,24 +112,94 @@ def write_to_file(dataframe, file_path):
     dataframe.to_hdf(file_path, key="df", index=True)
 
 
+def stack_sensors(frames: Dict[str, DataFrame]) -> List[DataFrame]:
+    """
+    Stacks the sensors with identical timestamps into one frame each (columns: sensor, original column).
+    """
+    groups: List[List[str]] = []
+    for key in sorted(frames.keys()):
+        for group in groups:
+            if frames[group[0]].index.equals(frames[key].index):
+                group.append(key)
+                break
+        else:
+            groups.append([key])
+    return [
+        pd.concat([frames[key] for key in group], axis=1, keys=group)
+        for group in groups
+    ]
+
+
+def write_with_checksum(file_path: str, data: bytes, block_size: int = 1024 * 1024):
+    """
+    Writes the data to the file while calculating its md5 checksum.
+
+    :return: The checksum of the written file
+    """
+    hasher = hashlib.md5()
+    view = memoryview(data)
+    with open(file_path, "wb") as f:
+        for start in range(0, len(view), block_size):
+            block = view[start : start + block_size]
+            hasher.update(block)
+            f.write(block)
+    return hasher.hexdigest()
+
+
+def write_sensor_type_file(frames: Dict[str, DataFrame], file_path: str) -> str:
+    """
+    Writes all sensors of a sensor type into a single hdf5 file
+    (one table per group of sensors sharing their timestamps).
+
+    :return: The checksum of the written file
+    """
+    with pd.HDFStore(file_path, mode="w") as store:
+        for number, stacked in enumerate(stack_sensors(frames)):
+            store.put(f"sensors_{number}", stacked)
+    return _filehash(file_path, hashlib.md5)
+
+
+def read_sensor_type_file(file_path: str) -> Dict[str, DataFrame]:
+    """
+    Reads the sensors written by :func:`write_sensor_type_file`.
+    """
+    sensors = {}
+    with pd.HDFStore(file_path, mode="r") as store:
+        for key in store.keys():
+            stacked = store.get(key)
+            for sensor in stacked.columns.get_level_values(0).unique():
+                sensors[sensor] = stacked[sensor]
+    return sensors
+
+
 def parse_frame_dates(frame):
     frame.index = pd.to_datetime(frame.index, utc=True)
     return frame
 
 
 def loadDatasetsDirectly(
-    dataset_path: str, dataset_info: DatasetInfo
+    dataset_path: str,
+    dataset_info: DatasetInfo,
+    sensor_types: List[str] = SENSOR_TYPES,
 ) -> _LoadedDatasetPartNew:
     """
     Load the dataset directly from the files.
+
+    :param sensor_types: Sensor types to load, all others are skipped
     """
     datasets = {}
 
     # TODO: Run checks as to confirm that the dataset_info.yaml information are right
     # eg. check start and end times
 
-    data_dirs = ["demands", "flows", "levels", "pressures"]
-    for data_dir in data_dirs:
+    for data_dir in sensor_types:
+        # Datasets exported in bulk have one file per sensor type
+        sensor_type_file = os.path.join(dataset_path, f"{data_dir}.h5")
+        if os.path.isfile(sensor_type_file):
+            logging.debug(f"Trying to load: {sensor_type_file}")
+            datasets[data_dir] = read_sensor_type_file(sensor_type_file)
+            continue
+
         data_dir_in_dataset_dir = os.path.join(dataset_path, data_dir)
         if not os.path.exists(data_dir_in_dataset_dir):
             raise FileNotFoundError(
@@ -183,11 +271,13 @@ class Dataset:
     It converts and represents the Low Level Interface for the LDIMBenchmark.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, cache_dir: str = None):
         """
         :param path: Path to the dataset folder
+        :param cache_dir: Folder for the binary cache of the dataset, defaults to the dataset folder
         """
         self.path = path
+        self.cache_dir = path if cache_dir is None else cache_dir
         self.__validation_file_name = ".validation"
         self.__validation_path = os.path.join(self.path, self.__validation_file_name)
         self.__dataset_info_file_name = "dataset_info.yaml"
@@ -252,6 +342,12 @@ class Dataset:
                     self.info["checksum"] = None
                 self.checksum = self.info["checksum"]
 
+                format_version = self.info.get("format_version", 1)
+                if format_version > DATASET_FORMAT_VERSION:
+                    raise Exception(
+                        f"Dataset format version {format_version} is not supported (supported up to version {DATASET_FORMAT_VERSION}), please update ldimbenchmark."
+                    )
+
         else:
             raise Exception(
                 f"No dataset_info.yaml file found! (not at: '{self.__dataset_info_file_path}')"
@@ -259,9 +355,14 @@ class Dataset:
 
         self.name = self.info["name"]
         self._update_id()
-        self.__pickle_path = os.path.join(self.path, f"dataset-{self.id}.pickle")
+        # Caches are hidden files, so that they are not part of the data checksum
+        self.__cache_id = self.id
+        self.__model_pickle_path = os.path.join(
+            self.cache_dir, f".model-{self.id}.pickle"
+        )
 
-        self.model = read_inpfile(os.path.join(self.path, self.info["inp_file"]))
+        # The model is parsed lazily on first access (see `model`)
+        self._model = None
         dma_path = os.path.join(self.path, "dmas.json")
         if os.path.isfile(dma_path):
             # file exists
@@ -273,6 +374,41 @@ class Dataset:
             )
             self.dmas = None
 
+    @property
+    def model(self) -> "WaterNetworkModel":
+        """
+        Water network model of the dataset.
+        Parsing the .inp file is expensive, so it is only done on first access and cached as pickle.
+        """
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    @model.setter
+    def model(self, model: "WaterNetworkModel"):
+        self._model = model
+
+    def _load_model(self) -> "WaterNetworkModel":
+        if os.path.isfile(self.__model_pickle_path):
+            try:
+                with open(self.__model_pickle_path, "rb") as f:
+                    return pickle.load(f)
+            except Exception:
+                logging.error(f"Could not load model pickle {self.id}! Regenerating...")
+
+        from wntr.network.io import read_inpfile
+
+        model = read_inpfile(os.path.join(self.path, self.info["inp_file"]))
+        try:
+            with open(self.__model_pickle_path, "wb") as f:
+                pickle.dump(model, f)
+        except OSError:
+            logging.debug(f"Could not write model cache for {self.id}")
+        return model
+
+    def _get_cache_path(self, part: str) -> str:
+        return os.path.join(self.cache_dir, f".dataset-{self.__cache_id}-{part}.pickle")
+
     def _update_id(self, force=False):
         """
         Sets the id (hash) according to the information in "dataset_info.yaml"
@@ -427,24 +563,69 @@ class Dataset:
         self.full_dataset_part.leaks = leaks
 
     def ensure_cached(self):
-        if not os.path.isfile(self.__pickle_path):
+        """
+        Builds the binary cache (sensor data and model) of the dataset if it does not exist yet.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if not all(
+            os.path.isfile(self._get_cache_path(part))
+            for part in SENSOR_TYPES + ["leaks"]
+        ):
             logging.info(f"Ensuring {self.id} is cached")
             self.loadData()
+        if not os.path.isfile(self.__model_pickle_path):
+            self._load_model()
+
+    def loadData(self, data_needed: MethodMetadataDataNeeded = None):
+        """
+        Loads the data of the dataset (from the cache if available).
 
-    def loadData(self):
+        :param data_needed: Data needs of a method, sensor types marked as "ignored" are not loaded
+        """
         logging.debug(f"Loading dataset {self.id}")
         if not hasattr(self, "full_dataset_part"):
-            if os.path.isfile(self.__pickle_path):
+            self.full_dataset_part = _LoadedDatasetPartNew({})
+
+        missing_parts = [
+            part
+            for part in SENSOR_TYPES + ["leaks"]
+            if getattr(self.full_dataset_part, part) is None
+            and not _is_ignored(data_needed, part)
+        ]
+        loaded_parts = {}
+        for part in missing_parts:
+            cache_path = self._get_cache_path(part)
+            if os.path.isfile(cache_path):
                 try:
-                    with open(self.__pickle_path, "rb") as f:
-                        self.full_dataset_part = pickle.load(f)
+                    with open(cache_path, "rb") as f:
+                        loaded_parts[part] = pickle.load(f)
                 except Exception as e:
-                    logging.error(f"Could not load pickle {self.id}! Regenerating...")
+                    logging.error(
+                        f"Could not load pickle {self.id} ({part})! Regenerating..."
+                    )
 
-            if not hasattr(self, "full_dataset_part"):
-                self.full_dataset_part = loadDatasetsDirectly(self.path, self.info)
-                with open(self.__pickle_path, "wb") as f:
-                    pickle.dump(self.full_dataset_part, f)
+        uncached_parts = [part for part in missing_parts if part not in loaded_parts]
+        if len(uncached_parts) > 0:
+            directly_loaded = loadDatasetsDirectly(
+                self.path,
+                self.info,
+                [part for part in uncached_parts if part in SENSOR_TYPES],
+            )
+            for part in uncached_parts:
+                loaded_parts[part] = getattr(directly_loaded, part)
+                try:
+                    with open(self._get_cache_path(part), "wb") as f:
+                        pickle.dump(loaded_parts[part], f)
+                except OSError:
+                    logging.debug(f"Could not write cache for {self.id} ({part})")
+
+        for part, data in loaded_parts.items():
+            setattr(self.full_dataset_part, part, data)
+        if len(loaded_parts) > 0:
+            # Benchmark data has to be extracted again to include the new parts
+            for dataset_part in ["train", "evaluation"]:
+                if hasattr(self, dataset_part):
+                    delattr(self, dataset_part)
         logging.debug(f"Stopped loading dataset {self.id}")
         return self
 
@@ -465,65 +646,105 @@ class Dataset:
         logging.info("Stop Loading benchmark data...")
         return self
 
-    def getTrainingBenchmarkData(self):
+    def _getBenchmarkData(
+        self,
+        dataset_part: _LoadedDatasetPartNew,
+        data_needed: MethodMetadataDataNeeded = None,
+    ):
+        # Data marked as "ignored" is not supplied (see MethodMetadataDataNeeded)
+        sensor_data = {
+            sensor_type: {}
+            if _is_ignored(data_needed, sensor_type)
+            else getattr(dataset_part, sensor_type)
+            for sensor_type in SENSOR_TYPES
+        }
         return BenchmarkData(
-            pressures=self.train.pressures,
-            demands=self.train.demands,
-            flows=self.train.flows,
-            levels=self.train.levels,
-            model=self.model,
+            **sensor_data,
+            model=None if _is_ignored(data_needed, "model") else self.model,
             dmas=self.dmas,
         )
 
-    def getEvaluationBenchmarkData(self):
-        return BenchmarkData(
-            pressures=self.evaluation.pressures,
-            demands=self.evaluation.demands,
-            flows=self.evaluation.flows,
-            levels=self.evaluation.levels,
-            model=self.model,
-            dmas=self.dmas,
-        )
+    def getTrainingBenchmarkData(self, data_needed: MethodMetadataDataNeeded = None):
+        return self._getBenchmarkData(self.train, data_needed)
+
+    def getEvaluationBenchmarkData(self, data_needed: MethodMetadataDataNeeded = None):
+        return self._getBenchmarkData(self.evaluation, data_needed)
 
-    def exportTo(self, folder: str):
+    def exportTo(self, folder: str, format_version: int = DATASET_FORMAT_VERSION):
         """
-        Exports the dataset to a given folder
+        Exports the dataset to a given folder.
+
+        :param format_version: Layout of the sensor data files (see `DATASET_FORMAT_VERSION`),
+            version 2 writes one hdf5 file per sensor type (e.g. `pressures.h5`),
+            version 1 writes one csv file per sensor (e.g. `pressures/J-01.csv`), which can be read by older versions of ldimbenchmark
         """
+        if format_version not in [1, 2]:
+            raise ValueError(f"Unknown dataset format version {format_version}")
+        os.makedirs(folder, exist_ok=True)
+
+        inp_file_path = os.path.join(folder, self.info["inp_file"])
+        if self._model is not None:
+            from wntr.network.io import write_inpfile
+
+            write_inpfile(self.model, inp_file_path)
+        elif os.path.abspath(folder) != os.path.abspath(self.path):
+            # The model was never loaded (so not changed), no need to parse it
+            shutil.copyfile(
+                os.path.join(self.path, self.info["inp_file"]), inp_file_path
+            )
 
-        write_inpfile(self.model, os.path.join(folder, self.info["inp_file"]))
-
-        # TODO: Probably better parallelize
-        for sensor_type in ["pressures", "demands", "flows", "levels"]:
-            os.makedirs(os.path.join(folder, sensor_type), exist_ok=True)
-            filepaths = [
-                os.path.join(folder, sensor_type, f"{sensor}.h5")
-                for sensor in getattr(self, sensor_type).keys()
-            ]
-            values = getattr(self, sensor_type).values()
-            # logging.debug(filepaths)
-            with ProcessPoolExecutor(max_workers=CPU_COUNT) as executor:
-                # submit all tasks and get future objects
-                futures = [
-                    executor.submit(write_to_file, sensor, path)
-                    for sensor, path in zip(values, filepaths)
-                ]
-                # process results from tasks in order of task completion
-                for future in as_completed(futures):
-                    future.result()
-
-        self.leaks.to_csv(os.path.join(folder, "leaks.csv"))
+        file_hashes = {}
+        for sensor_type in SENSOR_TYPES:
+            # Only the files of one format may exist, as the newer format is loaded first
+            sensor_dir = os.path.join(folder, sensor_type)
+            if os.path.isdir(sensor_dir):
+                shutil.rmtree(sensor_dir)
+            sensor_type_file = os.path.join(folder, f"{sensor_type}.h5")
+            if os.path.isfile(sensor_type_file):
+                os.remove(sensor_type_file)
+
+            if format_version == 1:
+                os.makedirs(sensor_dir)
+                for sensor, frame in getattr(self, sensor_type).items():
+                    sensor_file = os.path.join(sensor_dir, f"{sensor}.csv")
+                    file_hashes[sensor_file] = write_with_checksum(
+                        sensor_file,
+                        frame.to_csv(index_label="Timestamp").encode("utf-8"),
+                    )
+            else:
+                file_hashes[sensor_type_file] = write_sensor_type_file(
+                    getattr(self, sensor_type), sensor_type_file
+                )
+
+        leaks_file = os.path.join(folder, "leaks.csv")
+        file_hashes[leaks_file] = write_with_checksum(
+            leaks_file, self.leaks.to_csv().encode("utf-8")
+        )
         if self.dmas is not None:
-            with open(os.path.join(folder, "dmas.json"), "w") as f:
-                json.dump(self.dmas, f)
-        data_hash = self._get_data_checksum(folder)
-        self.info["checksum"] = data_hash
+            dmas_file = os.path.join(folder, "dmas.json")
+            file_hashes[dmas_file] = write_with_checksum(
+                dmas_file, json.dumps(self.dmas).encode("utf-8")
+            )
+        self.info["format_version"] = format_version
+        self.info["checksum"] = dirhash(
+            folder,
+            "md5",
+            ignore_hidden=True,
+            excluded_files=[
+                self.__dataset_info_file_name,
+            ],
+            file_hashes=file_hashes,
+        )
 
         with open(os.path.join(folder, self.__dataset_info_file_name), "w") as f:
             yaml.dump(
                 self.info, f, sort_keys=False, default_flow_style=None, Dumper=TSDumper
             )
-        if os.path.exists(self.__pickle_path):
-            os.remove(self.__pickle_path)
+        if os.path.abspath(folder) == os.path.abspath(self.path):
+            for cache_file in glob(
+                os.path.join(self.cache_dir, f".*-{self.__cache_id}*.pickle")
+            ):
+                os.remove(cache_file)
         self._update_id()
         self.is_valid()
 
@@ -539,6 +760,9 @@ def getTimeSliceOfDataset(
     Get a time slice of a dataframe.
     """
 
+    if dataset is None:
+        return None
+
     new_dataset_slice = {}
     for key in dataset:
         logging.debug(key)
@@ -552,6 +776,30 @@ def getTimeSliceOfDataset(
     return new_dataset_slice
 
 
+def get_dataset_time_slice(
+    dataset: Dataset,
+    dataset_part: Literal["training", "evaluation"],
+    start: datetime,
+    end: datetime,
+) -> Dataset:
+    """
+    Dataset whose training or evaluation part is restricted to the given timespan.
+
+    The sliced dataset has its own id (so its runs do not collide with the runs on the full dataset),
+    but shares the (loaded and cached) data with `dataset`.
+    """
+    sliced = copy.copy(dataset)
+    sliced.info = copy.deepcopy(dataset.info)
+    sliced.info["dataset"][dataset_part]["start"] = pd.to_datetime(start, utc=True)
+    sliced.info["dataset"][dataset_part]["end"] = pd.to_datetime(end, utc=True)
+    sliced._update_id()
+    # Benchmark data has to be extracted again for the sliced part
+    for part in ["train", "evaluation"]:
+        if part in sliced.__dict__:
+            delattr(sliced, part)
+    return sliced
+
+
 def extractSubDataset(
     type: Literal["training", "evaluation"],
     config: DatasetInfo,
@@ -1,35 +1,36 @@
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
-import itertools
+import json
 import logging
 import math
 import os
 import random
 import shutil
 import tempfile
-import enlighten
+import zlib
 
 from pandas import DataFrame
 import pandas as pd
-from ldimbenchmark.constants import CPU_COUNT
 
 from ldimbenchmark.datasets import Dataset
+from ldimbenchmark.datasets.classes import stack_sensors
 
 import numpy as np
-import scipy.stats as stats
 
-from typing import Literal, Union, List
+from typing import Dict, Literal, Union, List
 
 from collections.abc import Sequence
 from numpy.random import Generator, PCG64
 
+NOISE_SEED = 27565124760782368551060429849508057759
 
-def get_random_norm(
-    noise_level: float, size: int, seed: int = 27565124760782368551060429849508057759
-):
+
+def get_random_norm(noise_level: float, size: int, seed: int = NOISE_SEED):
     """
     Generate a random normal distribution with a given noise level
     """
+    import scipy.stats as stats
+
     random_gen = Generator(PCG64(seed))
     lower, upper = -noise_level, noise_level
     mu, sigma = 0, noise_level / 3
@@ -47,9 +48,7 @@ def get_random_norm(
     )
 
 
-def get_random_selection(
-    size: int, selection: int, seed: int = 27565124760782368551060429849508057759
-):
+def get_random_selection(size: int, selection: int, seed: int = NOISE_SEED):
     """
     Generate a random normal distribution with a given noise level
     """
@@ -57,42 +56,105 @@ def get_random_selection(
     return random.sample(range(size), selection)
 
 
-def _apply_derivation_to_DataFrame(
-    derivation: Literal["precision", "sensitivity", "downsample"],
-    value: float,
-    dataframe: DataFrame,
-    key: str,
-) -> DataFrame:
-    if derivation == "precision":
-        if value >= 1:
-            raise Exception("Precision value must be smaller than 1")
-        noise = get_random_norm(value, dataframe.index.shape)
-        dataframe = dataframe.mul(1 + noise, axis=0)
-    elif derivation == "sensitivity":
-        if value["shift"] == "top":
-            dataframe = np.ceil(dataframe / value["value"]) * value["value"]
-        if value["shift"] == "middle":
-            dataframe = np.floor(dataframe / value["value"]) * value["value"] + (
-                value["value"] / 2
-            )
-        else:
-            dataframe = np.floor(dataframe / value["value"]) * value["value"]
+def get_random_norm_matrix(
+    noise_level: float,
+    size: int,
+    streams: List[np.random.SeedSequence],
+) -> np.ndarray:
+    """
+    Generate truncated normal noise (within +-noise_level) with one independent random stream per column
+    """
+    from scipy.special import ndtr, ndtri
+
+    uniforms = np.empty((size, len(streams)))
+    for column, stream in enumerate(streams):
+        uniforms[:, column] = Generator(PCG64(stream)).random(size)
+
+    # Inverse transform sampling of the normal distribution truncated at 3 sigma
+    lower, upper = ndtr(-3), ndtr(3)
+    return ndtri(lower + uniforms * (upper - lower)) * (noise_level / 3)
 
-    elif derivation == "downsample":
-        dataframe = dataframe.reset_index()
-        dataframe = dataframe.groupby(
-            (dataframe["Timestamp"] - dataframe["Timestamp"][0]).dt.total_seconds()
-            // (value),
-            group_keys=True,
-        ).first()
-        dataframe = dataframe.set_index("Timestamp")
 
-    elif derivation == "count":
-        pass
-    else:
-        raise ValueError(f"Derivation {derivation} not implemented")
+def get_downsample_positions(
+    index: pd.DatetimeIndex, interval: float
+) -> Union[slice, np.ndarray]:
+    """
+    Row positions of the first reading in each interval (counted from the first timestamp).
 
-    return (key, dataframe)
+    Returns a slice if the positions are evenly spaced, so that the data can be taken as a view.
+
+    :param index: Sorted timestamps of the sensor readings
+    :param interval: Length of the interval in seconds
+    """
+    timestamps = index.asi8
+    if len(timestamps) == 0:
+        return slice(0, 0)
+    step = int(round(interval * 1e9))
+    if step <= 0:
+        raise ValueError("Downsample interval must be positive")
+    boundaries = np.arange(timestamps[0], timestamps[-1] + 1, step)
+    # Empty intervals point at the start of the next one
+    positions = np.unique(np.searchsorted(timestamps, boundaries, side="left"))
+
+    if len(positions) == 1:
+        return slice(positions[0], positions[0] + 1)
+    strides = np.diff(positions)
+    if (strides == strides[0]).all():
+        return slice(positions[0], positions[-1] + 1, strides[0])
+    return positions
+
+
+def _apply_derivation_to_sensors(
+    derivation: Literal["precision", "sensitivity", "downsample"],
+    value: Union[float, dict],
+    frames: Dict[str, DataFrame],
+    seed_sequence: np.random.SeedSequence,
+) -> Dict[str, DataFrame]:
+    """
+    Applies the derivation to all sensors at once (as operations on the stacked sensor matrix).
+
+    :param seed_sequence: Seed of the noise, every sensor gets its own stream spawned from it
+    """
+    sensor_streams = dict(zip(sorted(frames.keys()), seed_sequence.spawn(len(frames))))
+    derived = {}
+    for stacked in stack_sensors(frames):
+        index = stacked.index
+        if derivation == "precision":
+            if value >= 1:
+                raise Exception("Precision value must be smaller than 1")
+            # Sensors with multiple columns get one stream per column
+            streams = []
+            for key in stacked.columns.get_level_values(0).unique():
+                column_count = len(frames[key].columns)
+                if column_count == 1:
+                    streams.append(sensor_streams[key])
+                else:
+                    streams += sensor_streams[key].spawn(column_count)
+            noise = get_random_norm_matrix(value, len(index), streams)
+            stacked = stacked.mul(1 + noise)
+        elif derivation == "sensitivity":
+            if value["shift"] == "top":
+                stacked = np.ceil(stacked / value["value"]) * value["value"]
+            elif value["shift"] == "middle":
+                stacked = np.floor(stacked / value["value"]) * value["value"] + (
+                    value["value"] / 2
+                )
+            else:
+                stacked = np.floor(stacked / value["value"]) * value["value"]
+        elif derivation == "downsample":
+            positions = get_downsample_positions(index, value)
+            if isinstance(positions, slice):
+                stacked = stacked.iloc[positions]
+            else:
+                stacked = stacked.take(positions)
+        elif derivation == "count":
+            pass
+        else:
+            raise ValueError(f"Derivation {derivation} not implemented")
+
+        for key in stacked.columns.get_level_values(0).unique():
+            derived[key] = stacked[key]
+    return derived
 
 
 def try_load_derivation_datasets(folder):
@@ -100,12 +162,120 @@ def try_load_derivation_datasets(folder):
         dataset = Dataset(folder)
         return (
             dataset.id,
-            str(dataset.info["derivations"]) if "derivations" in dataset.info else None,
+            dataset.name,
+            dataset.info["derivations"] if "derivations" in dataset.info else None,
         )
     except Exception:
         return None
 
 
+class DerivationIndex:
+    """
+    Persistent index of the derived datasets in a folder.
+
+    Every derivation written to the folder is appended as one JSON line
+    (name, derivations, id) to ``.derivation_index.jsonl``, so that looking up
+    an already generated derivation does not require loading every dataset in the folder.
+    """
+
+    FILE_NAME = ".derivation_index.jsonl"
+
+    def __init__(self, out_path: str):
+        self.out_path = out_path
+        self.index_path = os.path.join(out_path, self.FILE_NAME)
+        self.entries = None
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        if os.path.isfile(self.index_path):
+            self._read()
+        else:
+            self._rebuild()
+
+    @staticmethod
+    def _key(name: str, derivations) -> str:
+        return name + "|" + json.dumps(derivations, sort_keys=True, default=str)
+
+    def _read(self):
+        with open(self.index_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Ignore partially written lines (e.g. from an interrupted process)
+                    continue
+                self.entries[self._key(entry["name"], entry["derivations"])] = entry[
+                    "id"
+                ]
+
+    def _rebuild(self):
+        """
+        Builds the index by loading all datasets in the folder (only needed once for folders without index).
+        """
+        derivation_folders = glob(os.path.join(self.out_path, "*"))
+        if len(derivation_folders) == 0:
+            return
+        logging.info(f"Building derivation index for {self.out_path}")
+        lines = []
+        with ProcessPoolExecutor() as executor:
+            futures = [
+                executor.submit(try_load_derivation_datasets, folder)
+                for folder in derivation_folders
+            ]
+            for future in as_completed(futures):
+                derivation = future.result()
+                if derivation is None or derivation[2] is None:
+                    continue
+                dataset_id, name, derivations = derivation
+                self.entries[self._key(name, derivations)] = dataset_id
+                lines.append(
+                    json.dumps(
+                        {"id": dataset_id, "name": name, "derivations": derivations},
+                        default=str,
+                    )
+                )
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.writelines(line + "\n" for line in lines)
+        os.replace(temp_path, self.index_path)
+
+    def get(self, name: str, derivations) -> Union[str, None]:
+        """
+        Returns the path of the derived dataset or None if it was not generated yet.
+        """
+        self._load()
+        dataset_id = self.entries.get(self._key(name, derivations), None)
+        if dataset_id is None:
+            return None
+        dataset_path = os.path.join(self.out_path, dataset_id)
+        if not os.path.isfile(os.path.join(dataset_path, "dataset_info.yaml")):
+            logging.warning(
+                f"Derivation {dataset_id} is in the index but missing on disk. Regenerating..."
+            )
+            return None
+        return dataset_path
+
+    def add(self, dataset: Dataset):
+        """
+        Adds a (fully written) derived dataset to the index.
+        """
+        self._load()
+        derivations = dataset.info["derivations"]
+        self.entries[self._key(dataset.name, derivations)] = dataset.id
+        os.makedirs(self.out_path, exist_ok=True)
+        line = json.dumps(
+            {"id": dataset.id, "name": dataset.name, "derivations": derivations},
+            default=str,
+        )
+        # A single write in append mode, so concurrent writers do not interleave lines
+        with open(self.index_path, "a") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
 class DatasetDerivator:
     """
     Chaos Monkey for your Dataset.
@@ -128,36 +298,35 @@ class DatasetDerivator:
         self.datasets: List[Dataset] = datasets
         self.out_path = out_path
 
-        if not ignore_cache:
-            derivation_folders = glob(os.path.join(out_path, "*"))
-            dataset_derivations = []
-            parallel = True
-            if parallel == True:
-                with ProcessPoolExecutor() as executor:
-                    # submit all tasks and get future objects
-                    futures = [
-                        executor.submit(try_load_derivation_datasets, folder)
-                        for folder in derivation_folders
-                    ]
-                    # process results from tasks in order of task completion
-                    for future in as_completed(futures):
-                        derivation = future.result()
-                        if derivation is not None:
-                            dataset_derivations.append(derivation)
-            else:
-                for folder in derivation_folders:
-                    derivation = try_load_derivation_datasets(folder)
-                    if derivation is not None:
-                        dataset_derivations.append(derivation)
-
-            self.cached_derivations = DataFrame(dataset_derivations)
-        else:
-            self.cached_derivations = DataFrame(columns=[0, 1])
-
+        self.derivation_index = DerivationIndex(out_path)
         self.ignore_cache = ignore_cache
 
         self.all_derived_datasets = []
 
+    def _get_cached_derivation(self, dataset: Dataset) -> Union[str, None]:
+        """
+        Returns the path to the already generated derivation of the dataset (if any).
+        """
+        if self.ignore_cache:
+            return None
+        return self.derivation_index.get(dataset.name, dataset.info["derivations"])
+
+    def _save_derivation(self, temporaryDatasetPath: str) -> Dataset:
+        """
+        Moves the derived dataset into the output folder and registers it in the index.
+        """
+        tmp_dataset = Dataset(temporaryDatasetPath)
+        logging.info(f"Saved {tmp_dataset.id}")
+        logging.info("Populating cache")
+        tmp_dataset.is_valid()
+        tmp_dataset.loadData()
+        dataset_path = os.path.join(self.out_path, tmp_dataset.id + "/")
+        shutil.copytree(temporaryDatasetPath, dataset_path, dirs_exist_ok=True)
+
+        new_dataset = Dataset(dataset_path)
+        self.derivation_index.add(new_dataset)
+        return new_dataset
+
     def get_dervived_datasets(self, with_original: bool = False):
         if with_original:
             return self.datasets + self.all_derived_datasets
@@ -198,18 +367,8 @@ class DatasetDerivator:
                 temp_dir = tempfile.TemporaryDirectory()
                 temporaryDatasetPath = temp_dir.name
 
-                cache_entry = self.cached_derivations[
-                    (
-                        self.cached_derivations[1]
-                        == str(this_dataset.info["derivations"])
-                    )
-                    & self.cached_derivations[0].str.contains(this_dataset.name)
-                ]
-                if len(cache_entry) > 1:
-                    logging.warning(
-                        f"more than one cache entry found: {str(cache_entry[0].values)}"
-                    )
-                if len(cache_entry) < 1:
+                cached_path = self._get_cached_derivation(this_dataset)
+                if cached_path is None:
                     logging.info(
                         f"Generating Model Derivation for {this_dataset.id} with derivations {str(this_dataset.info['derivations']['model'])}"
                     )
@@ -291,17 +450,7 @@ class DatasetDerivator:
                     # os.makedirs(os.path.dirname(temporaryDatasetPath), exist_ok=True)
                     loadedDataset.exportTo(temporaryDatasetPath)
 
-                    tmp_dataset = Dataset(temporaryDatasetPath)
-                    logging.info(f"Saved {loadedDataset.id}")
-                    logging.info("Populating cache")
-                    tmp_dataset.is_valid()
-                    tmp_dataset.loadData()
-                    dataset_path = os.path.join(self.out_path, tmp_dataset.id + "/")
-                    shutil.copytree(
-                        temporaryDatasetPath, dataset_path, dirs_exist_ok=True
-                    )
-
-                    new_dataset = Dataset(dataset_path)
+                    new_dataset = self._save_derivation(temporaryDatasetPath)
 
                     newDatasets.append(new_dataset)
                     self.all_derived_datasets.append(new_dataset)
@@ -309,9 +458,7 @@ class DatasetDerivator:
                     temp_dir.cleanup()
                 else:
                     # Dataset already generated
-                    cached_dataset = Dataset(
-                        os.path.join(self.out_path, cache_entry.iloc[0][0])
-                    )
+                    cached_dataset = Dataset(cached_path)
                     newDatasets.append(cached_dataset)
                     self.all_derived_datasets.append(cached_dataset)
 
@@ -399,18 +546,8 @@ class DatasetDerivator:
                             "value": value,
                         }
                     )
-                cache_entry = self.cached_derivations[
-                    (
-                        self.cached_derivations[1]
-                        == str(this_dataset.info["derivations"])
-                    )
-                    & self.cached_derivations[0].str.contains(this_dataset.name)
-                ]
-                if len(cache_entry) > 1:
-                    raise Exception(
-                        f"more than one cache entry found: {str(cache_entry[0].values)}"
-                    )
-                if len(cache_entry) < 1:
+                cached_path = self._get_cached_derivation(this_dataset)
+                if cached_path is None:
                     temp_dir = tempfile.TemporaryDirectory()
                     temporaryDatasetPath = temp_dir.name
                     logging.info(
@@ -418,7 +555,6 @@ class DatasetDerivator:
                     )
                     loadedDataset = this_dataset.loadData()
 
-                    manager = enlighten.get_manager()
                     for application in apply_to:
                         datasets = getattr(loadedDataset, application)
                         keys = list(datasets.keys())
@@ -452,45 +588,19 @@ class DatasetDerivator:
 
                         else:
                             # For all other derivations we need to apply the derivation to the data
-                            transformations = zip(
-                                itertools.repeat(derivation, len(keys)),
-                                itertools.repeat(value, len(keys)),
-                                [datasets[key] for key in keys],
-                                keys,
+                            # Each sensor type gets its own noise streams
+                            seed_sequence = np.random.SeedSequence(
+                                [NOISE_SEED, zlib.crc32(application.encode())]
                             )
-                            bar_derivations = manager.counter(
-                                total=len(keys),
-                                desc=f"Deriving {application}",
-                                unit="sensors",
+                            datasets = _apply_derivation_to_sensors(
+                                derivation, value, datasets, seed_sequence
                             )
-                            bar_derivations.refresh()
-
-                            # logging.debug(filepaths)
-                            with ProcessPoolExecutor(max_workers=CPU_COUNT) as executor:
-                                # submit all tasks and get future objects
-                                futures = [
-                                    executor.submit(
-                                        _apply_derivation_to_DataFrame,
-                                        derivation,
-                                        value,
-                                        dataset_key,
-                                        key,
-                                    )
-                                    for derivation, value, dataset_key, key in transformations
-                                ]
-                                # process results from tasks in order of task completion
-                                for future in as_completed(futures):
-                                    key, result = future.result()
-                                    datasets[key] = result
-                                    if len(result) <= 3:
-                                        logging.warn(
-                                            "Derived data would only have three data points. That's not a proper dataset anymore. Aborting."
-                                        )
-
-                                        abort = True
-
-                                    bar_derivations.update()
-                            bar_derivations.close()
+                            if any(len(result) <= 3 for result in datasets.values()):
+                                logging.warn(
+                                    "Derived data would only have three data points. That's not a proper dataset anymore. Aborting."
+                                )
+
+                                abort = True
                         setattr(loadedDataset, application, datasets)
 
                     if not abort:
@@ -500,29 +610,16 @@ class DatasetDerivator:
                         )
                         loadedDataset.exportTo(temporaryDatasetPath)
 
-                        tmp_dataset = Dataset(temporaryDatasetPath)
-                        logging.info(f"Saved {loadedDataset.id}")
-                        logging.info("Populating cache")
-                        tmp_dataset.is_valid()
-                        tmp_dataset.loadData()
-                        dataset_path = os.path.join(self.out_path, tmp_dataset.id + "/")
-                        shutil.copytree(
-                            temporaryDatasetPath, dataset_path, dirs_exist_ok=True
-                        )
-
-                        new_dataset = Dataset(dataset_path)
+                        new_dataset = self._save_derivation(temporaryDatasetPath)
 
                         newDatasets.append(new_dataset)
                         self.all_derived_datasets.append(new_dataset)
 
                     temp_dir.cleanup()
-                    manager.stop()
 
                 else:
                     # Dataset already generated
-                    cached_dataset = Dataset(
-                        os.path.join(self.out_path, cache_entry.iloc[0][0])
-                    )
+                    cached_dataset = Dataset(cached_path)
                     newDatasets.append(cached_dataset)
                     self.all_derived_datasets.append(cached_dataset)
 
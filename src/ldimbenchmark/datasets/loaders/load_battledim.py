@@ -3,11 +3,8 @@ Module containing the loader for the Battledim dataset.
 """
 
 from concurrent.futures import ProcessPoolExecutor, as_completed
-import enlighten
-import requests
 from os import path
 import os
-import wntr
 import os
 from os import path
 import yaml
@@ -29,6 +26,8 @@ def download_file(args):
     if os.path.exists(out_file_path):
         logging.info(f"File {out_file_path} already exists.")
         return
+    import requests
+
     res = requests.get(url)
     os.makedirs(path.dirname(out_file_path), exist_ok=True)
     logging.info(out_file_path)
@@ -68,6 +67,8 @@ class BattledimDatasetLoader(_LoadDatasetBase):
             zip(URLs.keys(), [path.join(downloadPath, file) for file in URLs.values()])
         )
 
+        import enlighten
+
         manager = enlighten.get_manager()
         pbar = manager.counter(
             total=len(args), desc="Download Battledim Files", unit="Files"
@@ -85,6 +86,8 @@ class BattledimDatasetLoader(_LoadDatasetBase):
     def prepare_dataset(unpreparedDatasetPath=None, preparedDatasetPath=None):
         # Preprocess Battledim Data
 
+        import wntr
+
         os.makedirs(preparedDatasetPath, exist_ok=True)
 
         wn = wntr.network.WaterNetworkModel(
@@ -5,7 +5,6 @@ import datetime
 import json
 from typing import List, Tuple
 import pandas as pd
-from sqlalchemy import create_engine
 import os
 
 import itertools
@@ -17,10 +16,10 @@ import numpy as np
 import ast
 import seaborn as sns
 
+from ldimbenchmark.benchmark.results_database import ResultsDatabase
 from ldimbenchmark.utilities import (
     delta_format,
     get_unit_for_property,
-    read_multiple_dataset_infos,
 )
 
 
@@ -216,66 +215,29 @@ def plot_derivation_plot(
 
 
 def evaluate_derivations(database_path: str, out_folder: str):
-    results_db_path = os.path.join(database_path)
-    engine = create_engine(f"sqlite:///{results_db_path}")
-    results = pd.read_sql("results", engine, index_col="_folder")
-
-    flattened_results = read_multiple_dataset_infos(results)
-
-    if (flattened_results["dataset_derivation_type"] == "data").any():
-        data_derivation_type = flattened_results[
-            flattened_results["dataset_derivations.data.kind"].notna()
-        ]["dataset_derivations.data.kind"].unique()
-        data_to = flattened_results[
-            flattened_results["dataset_derivations.data.to"].notna()
-        ]["dataset_derivations.data.to"].unique()
-    else:
-        data_derivation_type = []
-        data_to = []
-
-    if (flattened_results["dataset_derivation_type"] == "model").any():
-        model_derivation_property = flattened_results[
-            flattened_results["dataset_derivations.model.property"].notna()
-        ]["dataset_derivations.model.property"].unique()
-        model_to = flattened_results[
-            flattened_results["dataset_derivations.model.element"].notna()
-        ]["dataset_derivations.model.element"].unique()
-    else:
-        model_derivation_property = []
-        model_to = []
-
-    # Fill Nan values for F1 score
-    flattened_results["F1"] = flattened_results["F1"].fillna(0)
-    # Set derivation factor for original datasets to 0
-    flattened_results["dataset_derivations.value"] = flattened_results[
-        "dataset_derivations.value"
-    ].fillna(0)
-
-    # Data based derivations
-    derivations = [
-        ("dataset_derivations.data.kind", derivation_type)
-        for derivation_type in data_derivation_type
-    ]
-
-    applied_to = [("dataset_derivations.data.to", to) for to in data_to]
-    plot_derivation_plot(
-        flattened_results,
-        derivations=derivations,
-        applied_to=applied_to,
-        out_folder=out_folder,
-    )
+    """
+    Plots the performance of the methods over the derivations of the datasets.
 
-    # Model based derivations
-    derivations = [
-        ("dataset_derivations.model.property", derivation_type)
-        for derivation_type in model_derivation_property
-    ]
-    applied_to = [("dataset_derivations.model.element", to) for to in model_to]
-    plot_derivation_plot(
-        flattened_results,
-        derivations=derivations,
-        applied_to=applied_to,
-        out_folder=out_folder,
-    )
+    Only the runs of each derivation (and on the original datasets) are queried from the results database.
 
-    # %%
+    :param database_path: Path to the results database (see :class:`~ldimbenchmark.benchmark.results_database.ResultsDatabase`)
+    """
+    with ResultsDatabase(database_path) as database:
+        for derivation_type, kind, to in database.get_derivations():
+            results = database.get_derivation_results(derivation_type, kind, to)
+            results = results.rename(
+                columns={"derivation_value": "dataset_derivations.value"}
+            )
+            # Fill Nan values for F1 score
+            results["F1"] = results["F1"].fillna(0)
+            # Set derivation factor for original datasets to 0
+            results["dataset_derivations.value"] = results[
+                "dataset_derivations.value"
+            ].fillna(0)
+
+            plot_derivation_plot(
+                results,
+                derivations=[("derivation_kind", kind)],
+                applied_to=[("derivation_to", to)],
+                out_folder=out_folder,
+            )
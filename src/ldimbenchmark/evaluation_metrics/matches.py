@@ -0,0 +1,158 @@
+"""
+Evaluation on the leak pairs of many runs at once.
+
+The leak pairs of all runs are kept in one long format table (one row per leak pair, flat typed columns)
+so that the metrics can be calculated as vectorised group operations.
+"""
+from typing import Callable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+LEAK_COLUMNS = [
+    "leak_pipe_id",
+    "leak_time_start",
+    "leak_time_end",
+    "leak_time_peak",
+    "leak_area",
+    "leak_diameter",
+    "leak_max_flow",
+]
+LEAK_TIME_COLUMNS = ["leak_time_start", "leak_time_end", "leak_time_peak"]
+MATCH_TYPES = ["tp", "fp", "fn"]
+
+MATCHES_COLUMNS = (
+    ["run_id", "type"]
+    + ["expected." + column for column in LEAK_COLUMNS]
+    + ["detected." + column for column in LEAK_COLUMNS]
+    + ["time_to_detection", "wrong_pipe"]
+)
+
+
+def get_matches_table(
+    matched_list: List[Tuple[Union[dict, None], Union[dict, None]]], run_id: str
+) -> DataFrame:
+    """
+    Flattens the leak pairs of a run (see :func:`~ldimbenchmark.benchmark_evaluation.evaluate_leakages`) into a matches table.
+
+    Each pair is classified as in `evaluate_leakages`:
+    tp (detected within the expected leak), fp (no expected leak) or fn (not detected, or detected outside of the expected leak).
+
+    :param matched_list: List of (expected leak, detected leak) pairs
+    :param run_id: Id of the run the pairs belong to
+    """
+    has_expected = np.array(
+        [expected is not None for expected, _ in matched_list], dtype=bool
+    )
+    has_detected = np.array(
+        [detected is not None for _, detected in matched_list], dtype=bool
+    )
+    columns = {}
+    for prefix, position in [("expected.", 0), ("detected.", 1)]:
+        leaks = [pair[position] or {} for pair in matched_list]
+        for column in LEAK_COLUMNS:
+            values = [leak.get(column, None) for leak in leaks]
+            if column in LEAK_TIME_COLUMNS:
+                columns[prefix + column] = pd.Series(
+                    pd.to_datetime(values, utc=True), dtype="datetime64[ns, UTC]"
+                )
+            elif column == "leak_pipe_id":
+                columns[prefix + column] = pd.Series(values, dtype="object")
+            else:
+                columns[prefix + column] = pd.to_numeric(
+                    pd.Series(values, dtype="object"), errors="coerce"
+                )
+
+    matches = DataFrame(columns, index=pd.RangeIndex(len(matched_list)))
+
+    in_time = (
+        matches["detected.leak_time_start"] >= matches["expected.leak_time_start"]
+    ) & (matches["detected.leak_time_end"] <= matches["expected.leak_time_end"])
+    match_type = np.select(
+        [~has_expected, ~has_detected, in_time.to_numpy()],
+        ["fp", "fn", "tp"],
+        default="fn",
+    )
+    matches.insert(0, "run_id", run_id)
+    matches.insert(1, "type", pd.Categorical(match_type, categories=MATCH_TYPES))
+    is_tp = match_type == "tp"
+    matches["time_to_detection"] = (
+        (matches["detected.leak_time_start"] - matches["expected.leak_time_start"])
+        .dt.total_seconds()
+        .where(is_tp)
+    )
+    matches["wrong_pipe"] = is_tp & (
+        matches["expected.leak_pipe_id"] != matches["detected.leak_pipe_id"]
+    )
+    return matches[MATCHES_COLUMNS]
+
+
+def count_matches(
+    matches: DataFrame, by: Union[str, List[str]] = "run_id"
+) -> DataFrame:
+    """
+    Counts the true positives, false positives and false negatives (and the average time to detection) per group.
+
+    Runs without any leak pair are included if `run_id` is categorical (with all runs as categories).
+
+    :param by: Column(s) of the matches table to group by
+    """
+    counts = (
+        DataFrame(
+            {
+                "true_positives": matches["type"] == "tp",
+                "false_positives": matches["type"] == "fp",
+                "false_negatives": matches["type"] == "fn",
+                "time_to_detection": matches["time_to_detection"],
+                "wrong_pipe": matches["wrong_pipe"].astype(bool),
+            }
+        )
+        .groupby(
+            [matches[column] for column in ([by] if isinstance(by, str) else by)],
+            observed=isinstance(by, list),
+        )
+        .agg(
+            true_positives=("true_positives", "sum"),
+            false_positives=("false_positives", "sum"),
+            false_negatives=("false_negatives", "sum"),
+            time_to_detection_avg=("time_to_detection", "mean"),
+            wrong_pipe=("wrong_pipe", "sum"),
+        )
+    )
+    # Not applicable, we dont have information about non-leaks
+    counts.insert(2, "true_negatives", np.nan)
+    return counts
+
+
+def get_time_to_detection_distribution(
+    matches: DataFrame, by: Union[str, List[str]] = "run_id"
+) -> DataFrame:
+    """
+    Distribution (count, mean, std, quartiles) of the time to detection (in seconds) of the true positives per group.
+    """
+    true_positives = matches[matches["type"] == "tp"]
+    return true_positives.groupby(by, observed=True)["time_to_detection"].describe()
+
+
+def aggregate_matches(
+    matches: DataFrame,
+    runs: DataFrame,
+    by: List[str] = ["method", "dataset"],
+    evaluations: List[Callable] = [],
+) -> DataFrame:
+    """
+    Evaluates groups of runs (e.g. per method and dataset or derivation) over all their leak pairs.
+
+    :param runs: The runs, indexed by their run id, containing the columns to group by
+    :param by: Columns of the runs to group by
+    :param evaluations: Metrics to calculate on the counts (e.g. :func:`~ldimbenchmark.evaluation_metrics.precision`)
+    """
+    run_ids = matches["run_id"].astype(str)
+    grouped_matches = matches.drop(columns=["run_id"]).assign(
+        **{column: runs[column].reindex(run_ids).to_numpy() for column in by}
+    )
+    results = count_matches(grouped_matches, by)
+    for function in evaluations:
+        results = function(results)
+    return results
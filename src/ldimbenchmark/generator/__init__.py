@@ -9,6 +9,7 @@ import matplotlib.pyplot as plt
 import os
 import yaml
 import numpy as np
+from typing import Literal
 
 
 import logging
@@ -104,105 +105,100 @@ import logging
 #     fig.savefig(f"out/network_poulakis-{size}.png")
 
 
-def generateDatasetForJunctionNumber(
-    junctions: int, out_dir: str = LDIM_BENCHMARK_CACHE_DIR
-):
-    if os.path.exists(out_dir):
-        logging.info(f"Skipping {out_dir} as it already exists")
-        return
-    os.makedirs(out_dir, exist_ok=True)
+GENERATOR_CONFIG = """
+model:
+  startTime: 2022-01-01 00:00
+  endTime: 2022-03-01 00:00
+  timestep: 5min
 
-    wn = generatePoulakisNetwork(network_size=0, max_junctions=junctions)
+leakages:
+- linkID: P-03
+  startTime: 2022-02-01 00:00
+  peakTime: 2022-02-15 12:00
+  endTime: 2022-03-01 00:00
+  leakDiameter: 0.011843  # (m)
 
-    fig, ax = plt.subplots(1, 1, figsize=(12, 10))
-    ax = wntr.graphics.plot_network(
-        wn,
-        ax=ax,
-        title="Poulakis Network",
-        node_labels=True,
-        link_labels=True,
-    )  # node_attribute='elevation',)
-    fig.savefig(os.path.join(out_dir, f"network_poulakis-j-{junctions}.png"))
+pressure_sensors: 'all'
 
-    yaml_example = """
-    model:
-      startTime: 2022-01-01 00:00
-      endTime: 2022-03-01 00:00
-      timestep: 5min
+flow_sensors:
+- P-01
 
-    leakages:
-    - linkID: P-03
-      startTime: 2022-02-01 00:00
-      peakTime: 2022-02-15 12:00
-      endTime: 2022-03-01 00:00
-      leakDiameter: 0.011843  # (m)
+level_sensors: []
 
-    pressure_sensors: 'all'
+amrs:
+- J-03
 
-    flow_sensors:
-    - P-01
+"""
 
-    level_sensors: []
 
-    amrs:
-    - J-03
+def getTimespanConfig(days: int, leakfree_timespan_hours: int):
+    """
+    Generator configuration for a dataset of the given days, with the leak starting after leakfree_timespan_hours.
+    """
+    startDate = np.datetime64("2022-01-01 00:00")
+    endDate = startDate + np.timedelta64(days, "D")
+    config = yaml.safe_load(GENERATOR_CONFIG)
+    config["model"]["startTime"] = str(startDate)
+    config["model"]["endTime"] = str(endDate)
+
+    config["leakages"][0]["startTime"] = str(
+        startDate + np.timedelta64(leakfree_timespan_hours, "h")
+    )
+    config["leakages"][0]["peakTime"] = str(
+        startDate + np.timedelta64(leakfree_timespan_hours + 1, "h")
+    )
+    config["leakages"][0]["endTime"] = str(endDate)
+    return config
 
+
+def generateDatasetForJunctionNumber(
+    junctions: int,
+    out_dir: str = LDIM_BENCHMARK_CACHE_DIR,
+    simulator: Literal["WNTR", "EPANET"] = "WNTR",
+    plot: bool = True,
+):
+    """
+    :param plot: Render the network (slow for large networks)
     """
-    config = yaml.safe_load(yaml_example)
+    if os.path.exists(out_dir):
+        logging.info(f"Skipping {out_dir} as it already exists")
+        return
+    os.makedirs(out_dir, exist_ok=True)
+
+    wn = generatePoulakisNetwork(network_size=0, max_junctions=junctions)
+
+    if plot:
+        fig, ax = plt.subplots(1, 1, figsize=(12, 10))
+        ax = wntr.graphics.plot_network(
+            wn,
+            ax=ax,
+            title="Poulakis Network",
+            node_labels=True,
+            link_labels=True,
+        )  # node_attribute='elevation',)
+        fig.savefig(os.path.join(out_dir, f"network_poulakis-j-{junctions}.png"))
+        plt.close(fig)
+
+    config = yaml.safe_load(GENERATOR_CONFIG)
     # Call leak dataset creator
-    generator = DatasetGenerator(wn, config)
+    generator = DatasetGenerator(wn, config, simulator=simulator)
     generator.generate()
     generator.write_generated_data(out_dir, f"synthetic-j-{junctions}")
 
 
-def generateDatasetForTimeSpanDays(days: int, out_dir: str):
+def generateDatasetForTimeSpanDays(
+    days: int, out_dir: str, simulator: Literal["WNTR", "EPANET"] = "WNTR"
+):
     if os.path.exists(out_dir):
         logging.info(f"Skipping {out_dir} as it already exists")
         return
     os.makedirs(out_dir, exist_ok=True)
     wn = generatePoulakisNetwork()
 
-    startDate = np.datetime64("2022-01-01 00:00")
-    endDate = startDate + np.timedelta64(days, "D")
-    yaml_example = """
-    model:
-      startTime: 2022-01-01 00:00
-      endTime: 2022-03-01 00:00
-      timestep: 5min
-
-    leakages:
-    - linkID: P-03
-      startTime: 2022-02-01 00:00
-      peakTime: 2022-02-15 12:00
-      endTime: 2022-03-01 00:00
-      leakDiameter: 0.011843  # (m)
-
-    pressure_sensors: 'all'
-
-    flow_sensors:
-    - P-01
-
-    level_sensors: []
-
-    amrs:
-    - J-03
-
-    """
-    config = yaml.safe_load(yaml_example)
-    config["model"]["startTime"] = str(startDate)
-    config["model"]["endTime"] = str(endDate)
-
-    leakfree_timespan = int((days * 24) / 2)
-    config["leakages"][0]["startTime"] = str(
-        startDate + np.timedelta64(leakfree_timespan, "h")
-    )
-    config["leakages"][0]["peakTime"] = str(
-        startDate + np.timedelta64(leakfree_timespan + 1, "h")
-    )
-    config["leakages"][0]["endTime"] = str(endDate)
+    config = getTimespanConfig(days, int((days * 24) / 2))
 
     # Call leak dataset creator
-    generator = DatasetGenerator(wn, config)
+    generator = DatasetGenerator(wn, config, simulator=simulator)
     generator.generate()
     generator.write_generated_data(out_dir, f"synthetic-days-{days}")
 
@@ -211,6 +207,8 @@ def generateDatasetsForJunctions(
     junction_count_low: int,
     junction_count_high: int,
     out_dir: str = LDIM_BENCHMARK_CACHE_DIR,
+    simulator: Literal["WNTR", "EPANET"] = "WNTR",
+    plot: bool = True,
 ):
     parallel = True
     if parallel == True:
@@ -227,7 +225,13 @@ def generateDatasetsForJunctions(
             with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
                 # submit all tasks and get future objects
                 futures = [
-                    executor.submit(generateDatasetForJunctionNumber, junction, num)
+                    executor.submit(
+                        generateDatasetForJunctionNumber,
+                        junction,
+                        num,
+                        simulator,
+                        plot,
+                    )
                     for junction, num in arguments_list
                 ]
                 # process results from tasks in order of task completion
@@ -239,28 +243,43 @@ def generateDatasetsForJunctions(
 
 
 def generateDatasetsForTimespan(
-    days_low: int, days_high: int, out_dir: str = LDIM_BENCHMARK_CACHE_DIR
+    days_low: int,
+    days_high: int,
+    out_dir: str = LDIM_BENCHMARK_CACHE_DIR,
+    simulator: Literal["WNTR", "EPANET"] = "WNTR",
 ):
-    parallel = True
-    if parallel == True:
-        days = range(days_low, days_high)
-        arguments_list = zip(
-            days, [os.path.join(out_dir, f"synthetic-days-{day}") for day in days]
-        )
+    """
+    Generates the datasets for the timespans from days_low to days_high (exclusive).
 
-        try:
-            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
-                # submit all tasks and get future objects
-                futures = [
-                    executor.submit(generateDatasetForTimeSpanDays, day, num)
-                    for day, num in arguments_list
-                ]
-                # process results from tasks in order of task completion
-                for future in as_completed(futures):
-                    future.result()
-        except KeyboardInterrupt:
-            executor._processes.clear()
-            os.kill(os.getpid(), 9)
+    The longest timespan is simulated only once with the leak in its middle,
+    the shorter datasets are windows of it centered on the leak.
+    As with `generateDatasetForTimeSpanDays` the leak starts after half of each dataset,
+    so the training (first quarter) and leak-free timespan grow with the days.
+    """
+    days = [
+        day
+        for day in range(days_low, days_high)
+        if not os.path.exists(os.path.join(out_dir, f"synthetic-days-{day}"))
+    ]
+    if len(days) == 0:
+        logging.info(f"Skipping {out_dir} as all datasets already exist")
+        return
+
+    wn = generatePoulakisNetwork()
+    config = getTimespanConfig(max(days), int((max(days) * 24) / 2))
+    generator = DatasetGenerator(wn, config, simulator=simulator)
+    generator.generate()
+
+    leakStart = np.datetime64(config["leakages"][0]["startTime"])
+    for day in days:
+        day_out_dir = os.path.join(out_dir, f"synthetic-days-{day}")
+        os.makedirs(day_out_dir, exist_ok=True)
+        generator.write_generated_data(
+            day_out_dir,
+            f"synthetic-days-{day}",
+            start_time=leakStart - np.timedelta64(day * 12, "h"),
+            end_time=leakStart + np.timedelta64(day * 12, "h"),
+        )
 
 
 # if args.variations == "junctions":
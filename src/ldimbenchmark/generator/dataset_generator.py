@@ -8,10 +8,18 @@ import yaml
 from math import sqrt
 import math
 from pydantic import BaseModel
-from typing import List, Union
+import logging
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Literal, Union
 from wntr.network import write_inpfile
 from ldimbenchmark.classes import BenchmarkLeakageResult
 
+DECIMAL_SIZE = 4
+
+# Maximum number of split networks kept per worker when generating scenarios
+MAX_CACHED_SCENARIO_NETWORKS = 32
+
 
 class DatasetGeneratorConfigModel(BaseModel):
     startTime: datetime
@@ -37,10 +45,23 @@ class DatasetGeneratorConfig(BaseModel):
 
 
 class DatasetGenerator:
-    def __init__(self, water_network_model, configVar):
+    def __init__(
+        self,
+        water_network_model,
+        configVar,
+        simulator: Literal["WNTR", "EPANET"] = "WNTR",
+    ):
+        """
+        :param simulator: Hydraulic solver to use, EPANET is much faster but only supports global
+            PDD pressure settings (the required pressure of the leak nodes is ignored)
+        """
         config = DatasetGeneratorConfig(**configVar)
         # TODO: Check that leaks are withing timeframe
 
+        if simulator not in ["WNTR", "EPANET"]:
+            raise ValueError(f"Unknown simulator {simulator}, must be WNTR or EPANET")
+        self.simulator = simulator
+
         # Statics
         # demand-driven (DD) or pressure dependent demand (PDD)
         self.mode_simulation = "PDD"  # 'PDD'#'PDD'
@@ -72,6 +93,9 @@ class DatasetGenerator:
         self.wn.options.time.report_timestep = self.time_step
         self.wn.options.time.pattern_timestep = self.time_step
         self.wn.options.time.duration = self.time_stamps_count * self.time_step
+        # EPANET only uses the global PDD settings
+        self.wn.options.hydraulic.required_pressure = 25
+        self.wn.options.hydraulic.minimum_pressure = 0
         # self.wn.options.report.
         # Why?
         for name, node in self.wn.junctions():
@@ -79,94 +103,116 @@ class DatasetGenerator:
             # print(node.required_pressure)
             # print(node.minimum_pressure)
 
-    def generate(self):
-        wn_with_leaks = self.wn
-        self.leaks = []
-        for leak in self.leakages:
-            # Split pipe and add a leak node
-
-            leak_start_time = self.time_stamps.get_loc(leak.startTime)
-            leak_end_time = self.time_stamps.get_loc(leak.endTime)
-            leak_peak_time = self.time_stamps.get_loc(leak.peakTime)
-            leak_diameter = float(leak.leakDiameter)
-
-            # Classify as abrupt leak if maximum is reached within 24 hours
-            leak_type = (
-                "abrupt"
-                if (leak_peak_time - leak_start_time) * self.time_step < 60 * 60 * 24
-                else "incipient"
-            )
+    def _add_leak_node(self, wn, link_id: str):
+        """
+        Splits the pipe and adds a leak node, whose demand follows the pattern `<leak_node>_pattern`.
+        """
+        pipe_id = wn.get_link(link_id)
+        node_leak = f"{pipe_id}_leaknode"
+        # Splits pipe and adds junction with zero-demand
+        wn = wntr.morph.split_pipe(wn, pipe_id, f"{pipe_id}_B", node_leak)
+        leak_node = wn.get_node(node_leak)
+
+        # Remove default zero-demand
+        del leak_node.demand_timeseries_list[0]
+        # basedemand
+        pattern_name = f"{str(leak_node)}_pattern"
+        wn.add_pattern(pattern_name, [0] * self.time_stamps_count)
+        leak_node.add_demand(1, pattern_name)
+
+        leak_node.required_pressure = 1
+        # Pressure below demand is not filled at all
+        leak_node.minimum_pressure = 0
+        return wn, leak_node
+
+    def _get_leak(self, leak: DatasetGeneratorConfigLeak, leak_node):
+        """
+        Demand pattern of the leak node and the according leak information.
+        """
+        leak_start_time = self.time_stamps.get_loc(leak.startTime)
+        leak_end_time = self.time_stamps.get_loc(leak.endTime)
+        leak_peak_time = self.time_stamps.get_loc(leak.peakTime)
+        leak_diameter = float(leak.leakDiameter)
+
+        # Classify as abrupt leak if maximum is reached within 24 hours
+        leak_type = (
+            "abrupt"
+            if (leak_peak_time - leak_start_time) * self.time_step < 60 * 60 * 24
+            else "incipient"
+        )
 
-            leak_area = math.pi * (leak_diameter / 2) ** 2
+        leak_area = math.pi * (leak_diameter / 2) ** 2
 
-            # Split pipe to add a leak
-            pipe_id = wn_with_leaks.get_link(leak.linkID)
-            node_leak = f"{pipe_id}_leaknode"
-            # Splits pipe and adds junction with zero-demand
-            wn_with_leaks = wntr.morph.split_pipe(
-                wn_with_leaks, pipe_id, f"{pipe_id}_B", node_leak
-            )
-            leak_node = wn_with_leaks.get_node(node_leak)
+        # Generate linearly increasing leak diameter till peak time
+        steps_till_peak = leak_peak_time - leak_start_time
+        increment_leak_diameter = np.linspace(
+            0, leak_diameter, num=steps_till_peak, endpoint=True
+        )
 
-            # Generate linearly increasing leak diameter till peak time
-            steps_till_peak = leak_peak_time - leak_start_time
-            increment_leak_diameter = np.linspace(
-                0, leak_diameter, num=steps_till_peak, endpoint=True
-            )
+        emitter_scale = 0.75 * sqrt(2 / 1000) * 990.27
+        increment_leak_area = (
+            emitter_scale * math.pi * (increment_leak_diameter / 2) ** 2 * 10000
+        )
 
-            emitter_scale = 0.75 * sqrt(2 / 1000) * 990.27
-            increment_leak_area = (
-                emitter_scale * math.pi * (increment_leak_diameter / 2) ** 2 * 10000
-            )
+        leak_max_magnitude = increment_leak_area[len(increment_leak_area) - 1]
 
-            leak_max_magnitude = increment_leak_area[len(increment_leak_area) - 1]
+        pattern_array = (
+            [0] * leak_start_time
+            + increment_leak_area.tolist()
+            + [leak_max_magnitude] * (leak_end_time - leak_peak_time)
+            + [0] * (self.time_stamps_count - leak_end_time)
+        )
 
-            pattern_array = (
-                [0] * leak_start_time
-                + increment_leak_area.tolist()
-                + [leak_max_magnitude] * (leak_end_time - leak_peak_time)
-                + [0] * (self.time_stamps_count - leak_end_time)
-            )
+        # plt.plot(pattern_array)
+
+        # save times of leak
+        leak_start = self.time_stamps[leak_start_time]
+        leak_start_time_string = leak_start._date_repr + " " + leak_start._time_repr
+        leak_end = self.time_stamps[leak_end_time]
+        leak_end_time_string = leak_end._date_repr + " " + leak_end._time_repr
+        leak_peak_time_string = (
+            self.time_stamps[leak_peak_time]._date_repr
+            + " "
+            + self.time_stamps[leak_peak_time]._time_repr
+        )
 
-            # plt.plot(pattern_array)
-
-            # Remove default zero-demand
-            del leak_node.demand_timeseries_list[0]
-            # basedemand
-            pattern_name = f"{str(leak_node)}_pattern"
-            wn_with_leaks.add_pattern(pattern_name, pattern_array)
-            leak_node.add_demand(1, pattern_name)
-
-            leak_node.required_pressure = 1
-            # Pressure below demand is not filled at all
-            leak_node.minimum_pressure = 0
-
-            # save times of leak
-            leak_start = self.time_stamps[leak_start_time]
-            leak_start_time_string = leak_start._date_repr + " " + leak_start._time_repr
-            leak_end = self.time_stamps[leak_end_time]
-            leak_end_time_string = leak_end._date_repr + " " + leak_end._time_repr
-            leak_peak_time_string = (
-                self.time_stamps[leak_peak_time]._date_repr
-                + " "
-                + self.time_stamps[leak_peak_time]._time_repr
-            )
+        pipe_id = self.wn.get_link(leak.linkID)
+        leak_pipe_nodes = [pipe_id.start_node_name, pipe_id.end_node_name]
+
+        return pattern_array, BenchmarkLeakageResult(
+            leak_pipe_id=str(pipe_id),
+            leak_pipe_nodes=leak_pipe_nodes,
+            leak_node=str(leak_node),
+            leak_diameter=leak_diameter,
+            leak_area=leak_area,
+            leak_type=leak_type,
+            leak_time_start=leak_start_time_string,
+            leak_time_peak=leak_peak_time_string,
+            leak_time_end=leak_end_time_string,
+        )
 
-            leak_pipe_nodes = [pipe_id.start_node_name, pipe_id.end_node_name]
-
-            self.leaks.append(
-                BenchmarkLeakageResult(
-                    leak_pipe_id=str(pipe_id),
-                    leak_pipe_nodes=leak_pipe_nodes,
-                    leak_node=str(leak_node),
-                    leak_diameter=leak_diameter,
-                    leak_area=leak_area,
-                    leak_type=leak_type,
-                    leak_time_start=leak_start_time_string,
-                    leak_time_peak=leak_peak_time_string,
-                    leak_time_end=leak_end_time_string,
+    def _simulate(self, wn):
+        if self.simulator == "EPANET":
+            sim = wntr.sim.EpanetSimulator(wn)
+            # EPANET writes its input and report files to disk
+            with tempfile.TemporaryDirectory() as simulation_folder:
+                return sim.run_sim(
+                    file_prefix=os.path.join(simulation_folder, "simulation")
                 )
-            )
+        sim = wntr.sim.WNTRSimulator(wn)
+        return sim.run_sim()
+
+    def generate(self):
+        wn_with_leaks = self.wn
+        self.leaks = []
+        for leak in self.leakages:
+            # Split pipe and add a leak node
+            wn_with_leaks, leak_node = self._add_leak_node(wn_with_leaks, leak.linkID)
+            pattern_array, leak_result = self._get_leak(leak, leak_node)
+            wn_with_leaks.get_pattern(
+                f"{leak_node}_pattern"
+            ).multipliers = pattern_array
+            self.leaks.append(leak_result)
 
         # Save the water network model to a file before using it in a simulation
         # with open("wn_with_leaks.pickle", "wb") as f:
@@ -177,9 +223,7 @@ class DatasetGenerator:
         # wntr.graphics.plot_network(wn_with_leaks, title="Poulakis Network", node_labels=True, link_labels=True,)
         # wn_with_leaks.write_inpfile("out/simulation/simulated.inp")
         # wn_with_leaks = wntr.network.read_inpfile("out/simulation/simulated.inp")
-        sim = wntr.sim.WNTRSimulator(wn_with_leaks)
-
-        self.results = sim.run_sim()
+        self.results = self._simulate(wn_with_leaks)
         if self.results.node["pressure"].empty:
             print("Negative pressures.")
             return -1
@@ -191,17 +235,136 @@ class DatasetGenerator:
         self.leak_dataframe = pd.DataFrame(self.leaks)
         return self.time_stamps, self.results, self.leak_dataframe, wn_with_leaks
 
-    def write_generated_data(self, results_folder, model_name="synthetic_dataset"):
+    def _get_positions(self, time_stamps: pd.DatetimeIndex) -> slice:
+        """
+        Positions of the (consecutive) time_stamps in the simulation results.
+        """
+        return slice(
+            self.time_stamps.get_loc(time_stamps[0]),
+            self.time_stamps.get_loc(time_stamps[-1]) + 1,
+        )
+
+    def _get_leaks_within(self, time_stamps: pd.DatetimeIndex) -> pd.DataFrame:
+        """
+        Leaks as seen in a dataset spanning the time_stamps.
+        """
+        start = time_stamps[0]
+        end = time_stamps[-1]
+        end_string = end._date_repr + " " + end._time_repr
+        positions = self._get_positions(time_stamps)
+        leaks = []
+        for leak in self.leaks:
+            if (
+                pd.Timestamp(leak["leak_time_start"]) > end
+                or pd.Timestamp(leak["leak_time_end"]) < start
+            ):
+                continue
+            leak = dict(leak)
+            if pd.Timestamp(leak["leak_time_end"]) > end:
+                leak["leak_time_end"] = end_string
+            if pd.Timestamp(leak["leak_time_peak"]) > end:
+                leak["leak_time_peak"] = end_string
+            leak["leak_max_flow"] = (
+                self.results.node["demand"][leak["leak_node"]].values[positions].max()
+            )
+            leaks.append(leak)
+        return pd.DataFrame(leaks, columns=self.leak_dataframe.columns)
+
+    def _get_sensor_readings(
+        self, results, time_stamps: pd.DatetimeIndex
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Readings of the configured sensors, one frame per sensor type with the sensor ids as columns.
+        """
+        # Pressures (m), Demands (m^3/s), Flows (m^3/s), Levels (m)
+        readings = {
+            "pressures": {},
+            "demands": {},
+            "flows": {},
+            "levels": {},
+        }
+        # Sets, as large networks have tens of thousands of sensors
+        pressure_sensors = set(self.pressure_sensors)
+        amrs = set(self.amrs)
+        level_sensors = set(self.level_sensors)
+        flow_sensors = set(self.flow_sensors)
+        positions = self._get_positions(time_stamps)
+        for node_id in results.node["demand"].columns:
+            if (
+                node_id in pressure_sensors
+                and self.wn.get_node(node_id).node_type == "Junction"
+            ):
+                readings["pressures"][node_id] = results.node["pressure"][
+                    node_id
+                ].values[positions]
+            if node_id in amrs:
+                # dem = [elem * 3600 * 1000 for elem in dem] #CMH / L/s
+                readings["demands"][node_id] = results.node["demand"][node_id].values[
+                    positions
+                ]
+            if node_id in level_sensors:
+                readings["levels"][node_id] = results.node["pressure"][node_id].values[
+                    positions
+                ]
+
+        for link_id in results.link["flowrate"].columns:
+            if link_id in flow_sensors:
+                readings["flows"][link_id] = results.link["flowrate"][link_id].values[
+                    positions
+                ]
+
+        return {
+            sensor_type: pd.DataFrame(values, index=time_stamps)
+            for sensor_type, values in readings.items()
+        }
+
+    def write_generated_data(
+        self,
+        results_folder,
+        model_name="synthetic_dataset",
+        end_time=None,
+        start_time=None,
+    ):
+        """
+        Writes the generated dataset to the results_folder.
+
+        The training part spans the first half of the time before the first leak of the written dataset.
+
+        :param start_time: Only write the data from this time on
+        :param end_time: Only write the data until this time, so datasets of shorter timespans can be derived from one simulation
+        """
         if self.results == None:
             print("Run the 'dataset_generator()' Function before. No results to write.")
             return
 
-        # Create CSV files
-        decimal_size = 4
+        time_stamps = self.time_stamps
+        leak_dataframe = self.leak_dataframe
+        simulation_start_time = self.simulation_start_time
+        simulation_end_time = self.simulation_end_time
+        if start_time is not None or end_time is not None:
+            mask = np.ones(len(time_stamps), dtype=bool)
+            if start_time is not None:
+                mask &= time_stamps >= pd.Timestamp(start_time)
+            if end_time is not None:
+                mask &= time_stamps <= pd.Timestamp(end_time)
+            time_stamps = time_stamps[mask]
+            simulation_start_time = time_stamps[0].to_pydatetime()
+            simulation_end_time = time_stamps[-1].to_pydatetime()
+            leak_dataframe = self._get_leaks_within(time_stamps)
 
+        # Create CSV files
+        decimal_size = DECIMAL_SIZE
+
+        first_leak_start = min(
+            [
+                leak.startTime
+                for leak in self.leakages
+                if leak.startTime >= simulation_start_time
+            ],
+            default=simulation_end_time,
+        )
         training_evaluation_split = (
-            self.simulation_start_time
-            + (self.leakages[0].startTime - self.simulation_start_time) / 2
+            simulation_start_time + (first_leak_start - simulation_start_time) / 2
         )
         # TODO: Fix start and end times to be exclusive, should be (instead of same day for training and evaluation)
         #     start: 2019-01-01 00:00
@@ -214,16 +377,16 @@ class DatasetGenerator:
         inp_file: model.inp
         dataset:
           training:
-            start: '{str(self.simulation_start_time)}'
+            start: '{str(simulation_start_time)}'
             end: '{str(training_evaluation_split)}'
           evaluation:
             start: '{str(training_evaluation_split)}'
-            end: '{str(self.simulation_end_time)}'
+            end: '{str(simulation_end_time)}'
         """
         # Convert info to yaml dictionary
         dataset_info = yaml.safe_load(dataset_info)
-        dataset_info["leakages"] = self.leak_dataframe.to_dict("records")
-        self.leak_dataframe.to_csv(os.path.join(results_folder, "leaks.csv"))
+        dataset_info["leakages"] = leak_dataframe.to_dict("records")
+        leak_dataframe.to_csv(os.path.join(results_folder, "leaks.csv"))
 
         # Write info to file
         with open(os.path.join(results_folder, f"dataset_info.yaml"), "w") as f:
@@ -232,93 +395,207 @@ class DatasetGenerator:
         write_inpfile(self.wn, os.path.join(results_folder, f"model.inp"))
 
         # Map Index to TimeStamp
-        leak_values = pd.DataFrame(index=self.time_stamps)
-        # leak_values.index = self.time_stamps
-        for index, leak in self.leak_dataframe.iterrows():
+        leak_values = pd.DataFrame(index=time_stamps)
+        # leak_values.index = time_stamps
+        for index, leak in leak_dataframe.iterrows():
             leak_values[leak["leak_pipe_id"]] = self.results.node["demand"][
                 leak["leak_node"]
-            ].values[: len(self.time_stamps)]
+            ].values[self._get_positions(time_stamps)]
 
         leak_values.round(decimal_size).to_csv(
             os.path.join(results_folder, f"leakages_demand.csv"),
             index_label="Timestamp",
         )
 
-        # Create xlsx file with Measurements
-        total_pressures = pd.DataFrame(index=self.time_stamps)
-        total_demands = pd.DataFrame(index=self.time_stamps)
-        total_flows = pd.DataFrame(index=self.time_stamps)
-        total_levels = pd.DataFrame(index=self.time_stamps)
-
-        for folders in ["pressures", "demands", "flows", "levels"]:
-            os.makedirs(os.path.join(results_folder, folders), exist_ok=True)
-
-        for node_id, values in self.results.node["demand"].items():
-            if (
-                node_id in self.pressure_sensors
-                and self.wn.get_node(node_id).node_type == "Junction"
-            ):
-                pres = self.results.node["pressure"][node_id].values[
-                    : len(self.time_stamps)
-                ]
-                pd.DataFrame(pres, index=self.time_stamps).round(decimal_size).to_csv(
-                    os.path.join(results_folder, "pressures", f"{node_id}.csv"),
+        sensor_readings = self._get_sensor_readings(self.results, time_stamps)
+        for sensor_type, readings in sensor_readings.items():
+            os.makedirs(os.path.join(results_folder, sensor_type), exist_ok=True)
+            for sensor_id in readings.columns:
+                readings[[sensor_id]].round(decimal_size).to_csv(
+                    os.path.join(results_folder, sensor_type, f"{sensor_id}.csv"),
                     index_label="Timestamp",
-                    header=[node_id],
                 )
-                # pres = pres[:len(self.time_stamp)]
-                total_pressures[node_id] = pres
-
-            if node_id in self.amrs:
-                dem = self.results.node["demand"][node_id].values[
-                    : len(self.time_stamps)
-                ]
-                pd.DataFrame(dem, index=self.time_stamps).round(decimal_size).to_csv(
-                    os.path.join(results_folder, "demands", f"{node_id}.csv"),
-                    index_label="Timestamp",
-                    header=[node_id],
-                )
-                # dem = dem[:len(self.time_stamp)]
-                # dem = [elem * 3600 * 1000 for elem in dem] #CMH / L/s
-                total_demands[node_id] = dem
-
-            if node_id in self.level_sensors:
-                level_pres = self.results.node["pressure"][node_id].values[
-                    : len(self.time_stamps)
-                ]
-                pd.DataFrame(level_pres, index=self.time_stamps).round(
-                    decimal_size
-                ).to_csv(
-                    os.path.join(results_folder, "levels", f"{node_id}.csv"),
-                    index_label="Timestamp",
-                    header=[node_id],
-                )
-                # level_pres = level_pres[:len(self.time_stamp)]
-                # level_pres = [round(elem, decimal_size) for elem in level_pres]
-                total_levels[node_id] = level_pres
-
-        for link_id, values in self.results.link["flowrate"].items():
-            if link_id in self.flow_sensors:
-                flows = self.results.link["flowrate"][link_id].values[
-                    : len(self.time_stamps)
-                ]
-                pd.DataFrame(flows, index=self.time_stamps).round(decimal_size).to_csv(
-                    os.path.join(results_folder, "flows", f"{link_id}.csv"),
-                    index_label="Timestamp",
-                    header=[link_id],
-                )
-                total_flows[link_id] = flows
 
         # Pressures (m), Demands (m^3/s), Flows (m^3/s), Levels (m)
-        # total_pressures.round(decimal_size).to_csv(
+        # sensor_readings["pressures"].round(decimal_size).to_csv(
         #     os.path.join(results_folder, "pressures.csv"), index_label="Timestamp"
         # )
-        # total_demands.round(decimal_size).to_csv(
+        # sensor_readings["demands"].round(decimal_size).to_csv(
         #     os.path.join(results_folder, "demands.csv"), index_label="Timestamp"
         # )
-        # total_flows.round(decimal_size).to_csv(
+        # sensor_readings["flows"].round(decimal_size).to_csv(
         #     os.path.join(results_folder, "flows.csv"), index_label="Timestamp"
         # )
-        # total_levels.round(decimal_size).to_csv(
+        # sensor_readings["levels"].round(decimal_size).to_csv(
         #     os.path.join(results_folder, "levels.csv"), index_label="Timestamp"
         # )
+
+    def randomScenarios(
+        self,
+        count: int,
+        seed: int = None,
+        leak_diameter_range=(0.005, 0.02),
+    ) -> pd.DataFrame:
+        """
+        Creates a scenario table (see `generateScenarios`) with one leak per scenario on a random pipe,
+        with random diameter and onset, lasting until the end of the simulation.
+        """
+        rng = np.random.default_rng(seed)
+        starts = rng.integers(1, self.time_stamps_count - 1, size=count)
+        peaks = rng.integers(starts + 1, self.time_stamps_count, size=count)
+        return pd.DataFrame(
+            {
+                "scenario_id": range(count),
+                "linkID": rng.choice(self.wn.pipe_name_list, size=count),
+                "startTime": self.time_stamps[starts],
+                "peakTime": self.time_stamps[peaks],
+                "endTime": self.time_stamps[-1],
+                "leakDiameter": rng.uniform(*leak_diameter_range, size=count),
+            }
+        )
+
+    def _simulate_scenario(
+        self, scenario_id: int, leakages: List[DatasetGeneratorConfigLeak]
+    ):
+        """
+        Simulates a single scenario, reusing the split network of earlier scenarios with the same leak pipes.
+        """
+        link_ids = tuple(leak.linkID for leak in leakages)
+        if len(set(link_ids)) != len(link_ids):
+            raise Exception(
+                f"Scenario {scenario_id} contains multiple leaks on the same pipe"
+            )
+        if not hasattr(self, "_scenario_networks"):
+            self._scenario_networks = {}
+        if link_ids not in self._scenario_networks:
+            if len(self._scenario_networks) >= MAX_CACHED_SCENARIO_NETWORKS:
+                self._scenario_networks.clear()
+            wn_with_leaks = self.wn
+            leak_nodes = []
+            for link_id in link_ids:
+                wn_with_leaks, leak_node = self._add_leak_node(wn_with_leaks, link_id)
+                leak_nodes.append(leak_node)
+            self._scenario_networks[link_ids] = (wn_with_leaks, leak_nodes)
+        wn_with_leaks, leak_nodes = self._scenario_networks[link_ids]
+
+        leaks = []
+        for leak, leak_node in zip(leakages, leak_nodes):
+            pattern_array, leak_result = self._get_leak(leak, leak_node)
+            wn_with_leaks.get_pattern(
+                f"{leak_node}_pattern"
+            ).multipliers = pattern_array
+            leaks.append(leak_result)
+
+        wn_with_leaks.reset_initial_values()
+        results = self._simulate(wn_with_leaks)
+        if results.node["pressure"].empty:
+            return None
+
+        for leak in leaks:
+            leak["leak_max_flow"] = results.node["demand"][leak["leak_node"]].max()
+            leak["leak_pipe_nodes"] = str(leak["leak_pipe_nodes"])
+        leaks = pd.DataFrame(leaks)
+        leaks["scenario_id"] = scenario_id
+
+        sensor_readings = self._get_sensor_readings(results, self.time_stamps)
+        for sensor_type, readings in sensor_readings.items():
+            sensor_readings[sensor_type] = readings.round(DECIMAL_SIZE)
+            sensor_readings[sensor_type]["scenario_id"] = scenario_id
+        return leaks, sensor_readings
+
+    def generateScenarios(
+        self,
+        scenarios: pd.DataFrame,
+        store_path: str,
+        max_workers: int = None,
+        max_pending: int = None,
+    ) -> pd.DataFrame:
+        """
+        Simulates many leak scenarios on the network of the generator and writes them into one HDF5 store.
+
+        The store contains a table for each sensor type and a "leaks" table, all with a scenario_id column, e.g.:
+            pd.read_hdf(store_path, "pressures", where="scenario_id == 3")
+
+        :param scenarios: One leak per row, with the columns of the leakages config (linkID, startTime, peakTime, endTime, leakDiameter)
+            and a scenario_id (defaults to the row number), leaks with the same scenario_id are simulated together
+        :param max_workers: Number of processes running the simulations (defaults to the number of CPUs)
+        :param max_pending: Maximum number of scenarios in flight (simulating or waiting to be written), bounds the memory usage
+        :return: The leaks of all simulated scenarios
+        """
+        if "scenario_id" not in scenarios.columns:
+            scenarios = scenarios.assign(scenario_id=range(len(scenarios)))
+        if max_workers is None:
+            max_workers = os.cpu_count()
+        if max_pending is None:
+            max_pending = max_workers * 2
+
+        scenario_leakages = [
+            (
+                scenario_id,
+                [
+                    DatasetGeneratorConfigLeak(**leak)
+                    for leak in group.drop(columns="scenario_id").to_dict("records")
+                ],
+            )
+            for scenario_id, group in scenarios.groupby("scenario_id", sort=False)
+        ]
+
+        leak_frames = []
+
+        def write_scenario(store: pd.HDFStore, result):
+            if result is None:
+                return
+            scenario_leaks, sensor_readings = result
+            leak_frames.append(scenario_leaks)
+            for sensor_type, readings in sensor_readings.items():
+                if len(readings.columns) == 1:
+                    # Only the scenario_id, no sensors of this type
+                    continue
+                store.append(
+                    sensor_type,
+                    readings,
+                    format="table",
+                    data_columns=["scenario_id"],
+                    index=False,
+                )
+
+        with pd.HDFStore(store_path, mode="w") as store:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_scenario_worker,
+                initargs=(self,),
+            ) as executor:
+                pending = set()
+                for scenario_id, leakages in scenario_leakages:
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            write_scenario(store, future.result())
+                    pending.add(
+                        executor.submit(_simulate_scenario, scenario_id, leakages)
+                    )
+                for future in pending:
+                    write_scenario(store, future.result())
+
+            if len(leak_frames) == 0:
+                logging.warning("None of the scenarios could be simulated")
+                return pd.DataFrame()
+            leaks = pd.concat(leak_frames).sort_values("scenario_id", ignore_index=True)
+            store.put("leaks", leaks, format="table", data_columns=["scenario_id"])
+            # Index the scenario ids once all data is written
+            for key in store.keys():
+                store.create_table_index(key, columns=["scenario_id"], optlevel=9)
+        return leaks
+
+
+_scenario_generator: DatasetGenerator = None
+
+
+def _init_scenario_worker(generator: DatasetGenerator):
+    # The generator (and its parsed network) is only transferred once per worker
+    global _scenario_generator
+    _scenario_generator = generator
+
+
+def _simulate_scenario(scenario_id: int, leakages: List[DatasetGeneratorConfigLeak]):
+    return _scenario_generator._simulate_scenario(scenario_id, leakages)
@@ -4,11 +4,21 @@ import wntr.network.controls as controls
 import numpy as np
 import matplotlib.pyplot as plt
 import math
+import os
+import tempfile
+import pandas as pd
 
 
-def generatePoulakisNetwork(network_size=6, max_pipes=0, max_junctions=0):
-    """ "
-    Generates a Poulakis network with (network_size,network_size) junctions.
+PIPE_ROUGHNESS = 127  # Hazen Williams Coefficient (unitless)
+BASE_DEMAND = 0.05  # m³/s
+RESERVOIR_HEAD = 52
+
+
+def getPoulakisNetworkLayout(network_size=6, max_pipes=0, max_junctions=0):
+    """
+    Junctions and pipes of a Poulakis network with (network_size,network_size) junctions, computed in bulk.
+
+    :return: Tuple of the junctions (name, x, y) and pipes (name, start_node, end_node, length, diameter)
     """
 
     if network_size == 0 and max_pipes == 0 and max_junctions == 0:
@@ -34,111 +44,158 @@ def generatePoulakisNetwork(network_size=6, max_pipes=0, max_junctions=0):
     # If max_pipes is set to high
     # pipes = netwrok_size * (network_size - 1) + network_size * network_size
 
-    wn = wntr.network.WaterNetworkModel()
+    pipe_diameter_factor = 1 if network_size == 6 else network_size / 6 * 0.95
+
+    def get_diameter(x, y):
+        return (
+            np.select(
+                [x + y <= network_size - 3, x + y <= network_size - 1],
+                [0.600, 0.450],
+                0.300,
+            )
+            * pipe_diameter_factor
+        )
+
+    # Columns (i) and rows (j) of the grid
+    i, j = np.meshgrid(
+        np.arange(1, network_size), np.arange(1, network_size + 1), indexing="ij"
+    )
+    i = i.ravel()
+    j = j.ravel()
+    junction_number = (i - 1) * network_size + j + 1
+    horizontal_pipe_number = (i - 1) * (network_size - 1) + (i - 1) * network_size + j
+    vertical_pipe_number = (i - 1) * (network_size - 1) + (i - 2) * network_size + 1 + j
+
+    # All numbers grow along a column, so this cuts off the rest of the column
+    included = np.ones(len(i), dtype=bool)
+    if max_pipes != 0:
+        included &= ~(
+            (horizontal_pipe_number > max_pipes) & (vertical_pipe_number > max_pipes)
+        )
+        has_vertical_pipe = vertical_pipe_number <= max_pipes
+        has_horizontal_pipe = horizontal_pipe_number <= max_pipes
+    else:
+        has_vertical_pipe = np.ones(len(i), dtype=bool)
+        has_horizontal_pipe = np.ones(len(i), dtype=bool)
+    if max_junctions != 0:
+        included &= junction_number <= max_junctions
+
+    def junction_names(numbers):
+        return np.array(["J-{:02d}".format(number) for number in numbers], dtype=object)
+
+    junctions = pd.DataFrame(
+        {
+            "name": junction_names(junction_number[included]),
+            "x": i[included] * 2,
+            "y": -j[included],
+        }
+    )
+
+    diameter = get_diameter(i, j)
+    # Vertical pipes connect to the junction above, horizontal pipes to the one on the left
+    vertical = included & (i >= 2) & has_vertical_pipe
+    horizontal = included & (j >= 2) & has_horizontal_pipe
+    position = np.arange(len(i))
+    pipes = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "name": [
+                        "P-{:02d}".format(number)
+                        for number in vertical_pipe_number[vertical]
+                    ],
+                    "start_node": junction_names(junction_number[vertical]),
+                    "end_node": junction_names(
+                        junction_number[vertical] - network_size
+                    ),
+                    "length": 2000,
+                    "diameter": diameter[vertical],
+                    "_order": position[vertical] * 2,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "name": [
+                        "P-{:02d}".format(number)
+                        for number in horizontal_pipe_number[horizontal]
+                    ],
+                    "start_node": junction_names(junction_number[horizontal]),
+                    "end_node": junction_names(junction_number[horizontal] - 1),
+                    "length": 1000,
+                    "diameter": diameter[horizontal],
+                    "_order": position[horizontal] * 2 + 1,
+                }
+            ),
+        ]
+    )
+    pipes = pipes.sort_values("_order").drop(columns="_order")
+    pipes.loc[len(pipes)] = ["P-01", "J-01", "J-02", 100, get_diameter(0, 0)]
+    return junctions, pipes.reset_index(drop=True)
+
+
+def writePoulakisNetworkInp(
+    inp_file: str, network_size=6, max_pipes=0, max_junctions=0
+):
+    """
+    Writes a Poulakis network directly as .inp file.
+
+    Skips building the WaterNetworkModel element by element, to generate networks with tens of thousands of junctions.
+    """
+    junctions, pipes = getPoulakisNetworkLayout(network_size, max_pipes, max_junctions)
+
+    # The .inp file uses LPS, so demands are in l/s and diameters in mm
+    sections = [
+        "[TITLE]",
+        "[JUNCTIONS]\n;ID\tElevation\tDemand\tPattern\n"
+        + "\n".join(
+            f" {name}\t0\t{BASE_DEMAND * 1000:g}\t;" for name in junctions["name"]
+        ),
+        f"[RESERVOIRS]\n;ID\tHead\tPattern\n J-01\t{RESERVOIR_HEAD}\t;",
+        "[PIPES]\n;ID\tNode1\tNode2\tLength\tDiameter\tRoughness\tMinorLoss\tStatus\n"
+        + "\n".join(
+            f" {name}\t{start}\t{end}\t{length}\t{diameter * 1000:g}\t{PIPE_ROUGHNESS}\t0\tOpen\t;"
+            for name, start, end, length, diameter in pipes.itertuples(index=False)
+        ),
+        "[OPTIONS]\n"
+        + "UNITS\tLPS\nHEADLOSS\tH-W\nTRIALS\t40\nACCURACY\t1e-09\nPATTERN\t1\nEMITTER EXPONENT\t1",
+        "[COORDINATES]\n;Node\tX-Coord\tY-Coord\nJ-01\t0\t1\n"
+        + "\n".join(
+            f"{name}\t{x}\t{y}" for name, x, y in junctions.itertuples(index=False)
+        ),
+        "[BACKDROP]\nDIMENSIONS\t0\t0\t10\t10",
+        "[END]\n",
+    ]
+    with open(inp_file, "w") as f:
+        f.write("\n\n".join(sections))
+
+
+def generatePoulakisNetwork(network_size=6, max_pipes=0, max_junctions=0):
+    """ "
+    Generates a Poulakis network with (network_size,network_size) junctions.
+
+    The network is written as .inp file in bulk (see `writePoulakisNetworkInp`) and read by wntr,
+    which is much faster for large networks than adding the elements one by one.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inp_file = os.path.join(temp_dir, "poulakis.inp")
+        writePoulakisNetworkInp(inp_file, network_size, max_pipes, max_junctions)
+        wn = wntr.network.WaterNetworkModel(inp_file)
+    wn.name = None
     wn.options.graphics.dimensions = (0, 0, 10, 10)
-    wn.options.hydraulic.trials = 40
     wn.options.hydraulic.accuracy = 10e-10
-    wn.options.hydraulic.emitter_exponent = 1
+    wn.options.hydraulic.pattern = "1"
     wn.units = "SI"
-    wn.options.hydraulic.inpfile_units = "LPS"
-    # wn.options.hydraulic.inpfile_pressure_units = 'm'
 
-    # Because we use WNTRSimulator, we need to convert D-W to H-W
-    wn.options.hydraulic.headloss = "H-W"
+    # Because we use WNTRSimulator, we need to convert D-W to H-W (set in the .inp file)
     # From Poulakis Paper (darcy-weißback) 0.25 mm == 0.0008530184 feet
     # Conversion via EPANET Manual p. 18 = 130-140 (H-W) / https://www.ewra.net/ew/pdf/EW_2017_58_74.pdf (Table 1)
-    pipe_roughness = 127  # Hazen Williams Coefficient (unitless)
 
     # If EPANET is used these more accurate values can be used:
     # wn.options.hydraulic.headloss = 'D-W'
     # pipe_roughness = 0.26 # Dary Weißbach Roughness Coefficient - mm
 
-    base_demand = 0.05  # m³/s
-
     # wn.add_tank("J-01", elevation=52, coordinates=(0, 1), diameter=1550*5, min_level=0, max_level=1, init_level=1, )
-    # Simulating Tank with height of 52m but unlimited water supply
-    wn.add_reservoir("J-01", base_head=52, coordinates=(0, 1))
-
-    pipe_diameter_factor = 1 if network_size == 6 else network_size / 6 * 0.95
-
-    def get_diameter(x, y):
-        if x + y <= network_size - 3:
-            return 0.600 * pipe_diameter_factor
-        if x + y <= network_size - 1:
-            return 0.450 * pipe_diameter_factor
-        return 0.300 * pipe_diameter_factor
-
-    horizonal_pipe_thickness = np.zeros([network_size - 2, network_size - 1])
-    vertical_pipe_thickness = np.zeros([network_size - 2, network_size + 1])
-    # x = 2
-    for i in range(1, network_size):
-        for j in range(1, network_size + 1):
-            junction_number = (i - 1) * network_size + j + 1
-
-            horizontal_pipe_number = (
-                (i - 1) * (network_size - 1) + (i - 1) * network_size + j
-            )
-            vertical_pipe_number = (
-                (i - 1) * (network_size - 1) + (i - 2) * network_size + 1 + j
-            )
-
-            if (
-                horizontal_pipe_number > max_pipes
-                and vertical_pipe_number > max_pipes
-                and max_pipes != 0
-            ):
-                break
-            if junction_number > max_junctions and max_junctions != 0:
-                break
-            current_junction = "J-{:02d}".format(junction_number)
-            wn.add_junction(
-                current_junction,
-                base_demand=base_demand,
-                demand_pattern="pat1",
-                elevation=0,
-                coordinates=(i * 2, -j),
-            )
-
-            # Add Vertical Pipes
-            if i >= 2:
-                if not (vertical_pipe_number > max_pipes and max_pipes != 0):
-                    diameter = get_diameter(i, j)
-                    # print(f"{p} {i} {j}: {diameter}")
-                    vertical_pipe_thickness[i - 2, j - 1] = diameter
-                    above_junction = "J-{:02d}".format(junction_number - network_size)
-                    wn.add_pipe(
-                        "P-{:02d}".format(vertical_pipe_number),
-                        current_junction,
-                        above_junction,
-                        length=2000,
-                        diameter=diameter,
-                        roughness=pipe_roughness,
-                    )
-
-            # Add Horizontal Pipes
-            if j >= 2:
-                if not (horizontal_pipe_number > max_pipes and max_pipes != 0):
-                    diameter = get_diameter(i, j)
-                    # print(f"{p} {i} {j}: {diameter}")
-                    horizonal_pipe_thickness[i - 2, j - 2] = diameter
-                    above_junction = "J-{:02d}".format(junction_number - 1)
-                    wn.add_pipe(
-                        "P-{:02d}".format(horizontal_pipe_number),
-                        current_junction,
-                        above_junction,
-                        length=1000,
-                        diameter=diameter,
-                        roughness=pipe_roughness,
-                    )
-
-    wn.add_pipe(
-        "P-01",
-        "J-01",
-        "J-02",
-        length=100,
-        diameter=get_diameter(0, 0),
-        roughness=pipe_roughness,
-    )
+    # The reservoir J-01 simulates a tank with height of 52m but unlimited water supply
     return wn
 
 
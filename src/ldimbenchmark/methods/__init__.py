@@ -1,5 +1,12 @@
-from .lila import LILA
-from .mnf import MNF
-from .dualmethod import DUALMethod
-from .null import NullLeakageDetectionMethod
-from .random import RandomMethod
+from ldimbenchmark._lazy import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "LILA": "ldimbenchmark.methods.lila",
+        "MNF": "ldimbenchmark.methods.mnf",
+        "DUALMethod": "ldimbenchmark.methods.dualmethod",
+        "NullLeakageDetectionMethod": "ldimbenchmark.methods.null",
+        "RandomMethod": "ldimbenchmark.methods.random",
+    },
+)
@@ -317,9 +317,7 @@ class DUALMethod(LDIMMethodBase):
         tot_outflow.index = simple_evaluation_data.pressures.index
 
         if self.debug:
-            tot_outflow.to_csv(
-                os.path.join(self.additional_output_path, "tot_outflow.csv")
-            )
+            self.write_debug_data("tot_outflow", tot_outflow)
 
             # import matplotlib as mpl
             # mpl.rcParams.update(mpl.rcParamsDefault)
@@ -346,7 +344,7 @@ class DUALMethod(LDIMMethodBase):
         )
 
         if self.debug:
-            col_max.to_csv(os.path.join(self.additional_output_path, "col_max.csv"))
+            self.write_debug_data("col_max", col_max)
             # plot = col_max.plot()
             # fig = plot.get_figure()
             # fig.savefig(self.additional_output_path + "max.png")
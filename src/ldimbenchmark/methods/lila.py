@@ -19,7 +19,6 @@ import math
 from typing import List
 import numpy as np
 import pandas as pd
-import os
 
 from ldimbenchmark.utilities import (
     SimpleBenchmarkData,
@@ -258,7 +257,7 @@ class LILA(LDIMMethodBase):
         )
 
         if self.debug:
-            MRE.to_csv(os.path.join(self.additional_output_path, "mre.csv"))
+            self.write_debug_data("mre", MRE)
             # print(MRE)
             # for sensor in MRE.columns:
             #     MRE_single = MRE[[sensor]]
@@ -267,7 +266,7 @@ class LILA(LDIMMethodBase):
             #     print(CUSUM_DATA[0])
             # print(leaks)
             # print(rawdata)
-            cusum_data.to_csv(os.path.join(self.additional_output_path, "cusum.csv"))
+            self.write_debug_data("cusum", cusum_data)
 
         # Overall MRE is not good for detection, so we just keep these Nodes as Sensors to Consider in the next Step
         return leaks
@@ -455,7 +454,7 @@ class LILA(LDIMMethodBase):
         leaks, cusum_data = cusum(MRE)
 
         if self.debug:
-            MRE.to_csv(self.additional_output_path + "mre.csv")
+            self.write_debug_data("mre", MRE)
             # print(MRE)
             # for sensor in MRE.columns:
             #     MRE_single = MRE[[sensor]]
@@ -464,7 +463,7 @@ class LILA(LDIMMethodBase):
             #     print(CUSUM_DATA[0])
             # print(leaks)
             # print(rawdata)
-            cusum_data.to_csv(self.additional_output_path + "cusum.csv")
+            self.write_debug_data("cusum", cusum_data)
 
         # Overall MRE is not good for detection, so we just keep these Nodes as Sensors to Consider in the next Step
 
@@ -1,15 +1,17 @@
 import ast
 import logging
 import math
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Union
 import numpy as np
 from pandas import DataFrame
 from ldimbenchmark.classes import BenchmarkData
-from wntr.network import WaterNetworkModel
 import pandas as pd
 
 from ldimbenchmark.constants import CPU_COUNT
 
+if TYPE_CHECKING:
+    from wntr.network import WaterNetworkModel
+
 
 class SimpleBenchmarkData:
     """
@@ -27,7 +29,7 @@ class SimpleBenchmarkData:
         demands: DataFrame,
         flows: DataFrame,
         levels: DataFrame,
-        model: WaterNetworkModel,
+        model: "WaterNetworkModel",
         dmas: List[str],
     ):
         """
@@ -177,7 +179,6 @@ def getDmaSpecificData(data: SimpleBenchmarkData, sensors: List[str]):
 import os
 import hashlib
 import re
-from joblib import Parallel, delayed
 
 HASH_FUNCS = {
     "md5": hashlib.md5,
@@ -194,12 +195,14 @@ def dirhash(
     ignore_hidden=False,
     followlinks=False,
     parallel=False,
+    file_hashes=None,
 ):
     """
     Function for deterministically creating a single hash for a directory of files,
     taking into account only file contents and not filenames.
     From https://raw.githubusercontent.com/to-mc/checksumdir/0ec7096945e4778c23e16fbfe5183fe8dc62a21c/checksumdir/__init__.py
 
+    :param file_hashes: Already known hashes of files (by path), these files are not read again
     """
     hash_func = HASH_FUNCS.get(hashfunc)
     if not hash_func:
@@ -228,12 +231,26 @@ def dirhash(
                 [os.path.join(root, f) for f in files if f not in excluded_files]
             )
 
-    if parallel:
-        hashvalues = Parallel(n_jobs=CPU_COUNT, prefer="threads")(
+    known_hashes = {}
+    if file_hashes:
+        known_hashes = {
+            os.path.abspath(path): value for path, value in file_hashes.items()
+        }
+    hashvalues = [
+        known_hashes[os.path.abspath(f)]
+        for f in fileslist
+        if os.path.abspath(f) in known_hashes
+    ]
+    fileslist = [f for f in fileslist if os.path.abspath(f) not in known_hashes]
+
+    if parallel and len(fileslist) > 1:
+        from joblib import Parallel, delayed
+
+        hashvalues += Parallel(n_jobs=CPU_COUNT, prefer="threads")(
             delayed(_filehash)(f, hash_func) for f in fileslist
         )
     else:
-        hashvalues = [_filehash(f, hash_func) for f in fileslist]
+        hashvalues += [_filehash(f, hash_func) for f in fileslist]
 
     return _reduce_hash(hashvalues, hash_func)
 
@@ -262,6 +279,60 @@ def _reduce_hash(hashlist, hashfunc):
     return hasher.hexdigest()
 
 
+DEBUG_DATA_KEY = "debug"
+
+
+def write_debug_data(
+    folder: str, name: str, data: Union[DataFrame, pd.Series], append: bool = False
+):
+    """
+    Writes time indexed debug data as hdf5 table (`<folder>/<name>.h5`), indexed by time.
+
+    :param append: Append the data as new chunk to already written debug data
+    """
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    # Table columns must be strings
+    data = data.rename(columns=str)
+    # Table columns must have a fixed type (cusum e.g. returns mixed object columns)
+    object_columns = data.select_dtypes("object").columns
+    if len(object_columns) > 0:
+        data = data.copy()
+        data[object_columns] = data[object_columns].apply(
+            pd.to_numeric, errors="coerce"
+        )
+    os.makedirs(folder, exist_ok=True)
+    data.to_hdf(
+        os.path.join(folder, f"{name}.h5"),
+        key=DEBUG_DATA_KEY,
+        format="table",
+        append=append,
+        mode="a" if append else "w",
+    )
+
+
+def read_debug_data(file_path: str, start=None, end=None) -> DataFrame:
+    """
+    Reads debug data written by :func:`write_debug_data` (or csv), only the rows between start and end are read.
+    """
+    if file_path.endswith(".csv"):
+        debug_data = pd.read_csv(file_path, parse_dates=True, index_col=0)
+        if start is not None:
+            debug_data = debug_data[debug_data.index >= start]
+        if end is not None:
+            debug_data = debug_data[debug_data.index <= end]
+        return debug_data
+
+    where = []
+    if start is not None:
+        where.append("index >= start")
+    if end is not None:
+        where.append("index <= end")
+    return pd.read_hdf(
+        file_path, key=DEBUG_DATA_KEY, where=where if len(where) > 0 else None
+    )
+
+
 def get_method_name_from_docker_image(docker_image: str) -> str:
     return docker_image.split(":")[0].split("/")[-1]
 
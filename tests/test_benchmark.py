@@ -15,6 +15,20 @@ from tests.shared import (
 )
 import logging
 from pandas.testing import assert_frame_equal
+from ldimbenchmark.utilities import read_debug_data
+from ldimbenchmark.benchmark.search import (
+    bayesian_optimization,
+    get_best_hyperparameters,
+    get_search_space,
+    get_training_slice,
+    successive_halving,
+)
+from ldimbenchmark.benchmark.smoke import bootstrap_metrics, get_smoke_windows
+from ldimbenchmark.classes import BenchmarkLeakageResult, Hyperparameter
+import numpy as np
+import shutil
+from unittest.mock import patch
+import yaml
 
 
 def test_hyperparameters_base_configurations():
@@ -196,3 +210,364 @@ def test_get_hyperparameter_matrix():
         {"param1": 3, "param2": "test1"},
         {"param1": 3, "param2": "test2"},
     ]
+
+
+def test_write_debug_data():
+    debug_folder = os.path.join(TEST_DATA_FOLDER, "debug_data", "")
+    method = YourCustomLDIMMethod()
+    method.init_with_benchmark_params(additional_output_path=debug_folder)
+    data = pd.DataFrame(
+        {"mre": range(48)},
+        index=pd.date_range("2022-01-01", periods=48, freq="1h", tz="UTC"),
+    )
+    # Written in chunks
+    method.write_debug_data("mre", data[:24])
+    method.write_debug_data("mre", data[24:], append=True)
+
+    window = read_debug_data(
+        os.path.join(debug_folder, "mre.h5"),
+        pd.Timestamp("2022-01-01 20:00", tz="UTC"),
+        pd.Timestamp("2022-01-02 02:00", tz="UTC"),
+    )
+    assert_frame_equal(
+        window, data["2022-01-01 20:00":"2022-01-02 02:00"], check_freq=False
+    )
+
+
+def test_iterate_hyperparameter_matrix_is_lazy():
+    multi_hyperparameters = {
+        "param1": list(range(1000)),
+        "param2": list(range(1000)),
+        "param3": list(range(1000)),
+    }
+
+    matrix = LDIMBenchmark._iterate_hyperparameters_matrix(multi_hyperparameters)
+    assert next(matrix) == {"param1": 0, "param2": 0, "param3": 0}
+    assert next(matrix) == {"param1": 0, "param2": 0, "param3": 1}
+
+
+def test_iterate_experiments_deduplicated(mocked_dataset1: Dataset):
+    benchmark = LDIMBenchmark(
+        hyperparameters={"mnf": {"window": [10, 10, 12], "gamma": [0.1]}},
+        datasets=mocked_dataset1,
+        results_dir="./benchmark-results",
+        multi_parameters=True,
+    )
+    benchmark.add_local_methods([MNF()])
+    hyperparameters_map = benchmark._get_hyperparameters_for_methods_and_datasets(
+        hyperparameters=benchmark.hyperparameters,
+        method_ids=["mnf"],
+        dataset_base_ids=[mocked_dataset1.id],
+    )
+
+    assert benchmark._count_experiments(hyperparameters_map) == 3
+    experiments = list(
+        benchmark._iterate_experiments(hyperparameters_map, "evaluation")
+    )
+    assert len(experiments) == 2
+    runner = experiments[0].create_runner()
+    assert runner.id == experiments[0].id
+
+
+def _quadratic_score(candidates, budget):
+    # Less training data gives noisier scores, the optimum is at x = 3
+    return [-((candidate["x"] - 3) ** 2) - (1 - budget) for candidate in candidates]
+
+
+def test_successive_halving():
+    evaluated = []
+
+    def evaluate(candidates, budget):
+        evaluated.append((len(candidates), budget))
+        return _quadratic_score(candidates, budget)
+
+    candidates = [{"x": x} for x in range(27)]
+    trials = successive_halving(evaluate, candidates, min_budget=1 / 9, eta=3)
+    assert evaluated == [(27, 1 / 9), (9, 1 / 3), (3, 1.0)]
+    assert len(trials) == 39
+    full_trials = [trial for trial in trials if trial["budget"] == 1]
+    assert max(full_trials, key=lambda trial: trial["score"])["hyperparameters"] == {
+        "x": 3
+    }
+
+
+def test_bayesian_optimization():
+    space = {"x": (0.0, 10.0, float)}
+    trials = bayesian_optimization(
+        _quadratic_score,
+        space,
+        n_iterations=15,
+        random_state=np.random.default_rng(42),
+    )
+    assert len(trials) == 15
+    best = max(trials, key=lambda trial: trial["score"])
+    assert abs(best["hyperparameters"]["x"] - 3) < 0.5
+
+
+def test_get_search_space():
+    space, fixed = get_search_space(
+        {"est_length": [24, 48], "default_flow_sensor": "J-02"},
+        LILA().metadata["hyperparameters"],
+    )
+    assert space == {
+        "est_length": [24, 48],
+        "C_threshold": (0.0, 10.0, float),
+        "delta": (0.0, 10.0, float),
+    }
+    assert fixed == {"default_flow_sensor": "J-02"}
+
+
+class ThresholdMethod(YourCustomLDIMMethod):
+    """
+    Detects the leak of the mocked dataset only with a threshold above 5.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.metadata["hyperparameters"] = [
+            Hyperparameter(
+                name="threshold",
+                description="Threshold",
+                value_type=float,
+                default=1.0,
+                min=0.0,
+                max=10.0,
+            )
+        ]
+
+    def detect_offline(self, data):
+        if self.hyperparameters["threshold"] > 5:
+            start = "2018-01-01 00:02:00"
+        else:
+            start = "2017-01-01 00:02:00"
+        return [
+            BenchmarkLeakageResult(
+                leak_pipe_id="test",
+                leak_time_start=start,
+                leak_time_end=start,
+                leak_time_peak=start,
+                leak_area=0.1,
+                leak_diameter=0.1,
+                leak_max_flow=0.1,
+            )
+        ]
+
+
+def test_run_hyperparameter_search(mocked_dataset1: Dataset):
+    results_dir = os.path.join(TEST_DATA_FOLDER, "search_results")
+    shutil.rmtree(results_dir, ignore_errors=True)
+    benchmark = LDIMBenchmark(
+        hyperparameters={},
+        datasets=mocked_dataset1,
+        results_dir=results_dir,
+    )
+    benchmark.add_local_methods([ThresholdMethod()])
+
+    trials = benchmark.run_hyperparameter_search(
+        strategy="halving", n_candidates=9, min_budget=1 / 3, seed=42
+    )
+    assert list(trials["budget"].value_counts().sort_index()) == [9, 3]
+    # The runs on the shortened training data are separate runs
+    assert trials["run_id"].nunique() == 12
+    best = get_best_hyperparameters(trials).iloc[0]
+    assert best["threshold"] > 5
+    assert trials.loc[trials["budget"] == 1, "score"].max() == 1.0
+
+
+def test_get_smoke_windows():
+    leaks = pd.DataFrame(
+        {
+            "leak_time_start": pd.to_datetime(
+                ["2018-01-02", "2018-01-10", "2018-02-10"], utc=True
+            ),
+            "leak_time_end": pd.to_datetime(
+                ["2018-01-04", "2018-01-12", None], utc=True
+            ),
+        }
+    )
+    windows = get_smoke_windows(
+        leaks,
+        pd.Timestamp("2018-01-01", tz="UTC"),
+        pd.Timestamp("2018-03-01", tz="UTC"),
+        n_leaks=2,
+        n_leak_free=3,
+        before=pd.Timedelta("1D"),
+        after=pd.Timedelta("2D"),
+        random_state=np.random.default_rng(42),
+    )
+    leak_windows = [window for window in windows if window[2] == "leak"]
+    leak_free_windows = [window for window in windows if window[2] == "leak-free"]
+    assert len(leak_windows) == 2
+    assert len(leak_free_windows) == 3
+    for start, end, _ in leak_windows:
+        assert end - start == pd.Timedelta("3D")
+    for start, end, _ in leak_free_windows:
+        assert end - start == pd.Timedelta("3D")
+        # The last leak lasts until the end of the dataset
+        assert end <= pd.Timestamp("2018-02-10", tz="UTC")
+        assert not (
+            (leaks["leak_time_start"] < end)
+            & (
+                leaks["leak_time_end"].fillna(pd.Timestamp.max.tz_localize("UTC"))
+                > start
+            )
+        ).any()
+
+
+def test_bootstrap_metrics():
+    counts = pd.DataFrame(
+        {
+            "method": ["a"] * 4 + ["b"] * 4,
+            "true_positives": [1, 1, 0, 0, 1, 1, 1, 1],
+            "false_positives": [0, 1, 1, 0, 0, 0, 0, 0],
+            "false_negatives": [0, 0, 1, 0, 0, 0, 0, 0],
+        }
+    )
+    results = bootstrap_metrics(
+        counts, "method", random_state=np.random.default_rng(42)
+    )
+    assert results.loc["a", "precision"] == 0.5
+    assert (
+        results.loc["a", "precision_ci_low"]
+        < 0.5
+        < results.loc["a", "precision_ci_high"]
+    )
+    # Perfect results do not vary between the resamples
+    assert results.loc["b", "F1_ci_low"] == results.loc["b", "F1_ci_high"] == 1.0
+    assert list(results["windows"]) == [4, 4]
+
+
+def test_run_smoke_benchmark(mocked_dataset1: Dataset):
+    results_dir = os.path.join(TEST_DATA_FOLDER, "smoke_results")
+    shutil.rmtree(results_dir, ignore_errors=True)
+    benchmark = LDIMBenchmark(
+        hyperparameters={"threshold": [1.0, 6.0]},
+        datasets=mocked_dataset1,
+        results_dir=results_dir,
+        multi_parameters=True,
+    )
+    benchmark.add_local_methods([ThresholdMethod()])
+
+    results = benchmark.run_smoke_benchmark(
+        "training",
+        window_before="1min",
+        window_after="3min",
+        seed=42,
+        n_bootstrap=100,
+    )
+    # The only leak of the training part lasts until its end, so there are no leak-free windows
+    assert list(results["windows"]) == [1, 1]
+    results = results.reset_index().set_index("hyperparameters")
+    assert results.loc[str({"threshold": 6.0}), "F1"] == 1.0
+    assert results.loc[str({"threshold": 1.0}), "true_positives"] == 0
+    assert len(benchmark.experiment_ids) == 2
+
+
+class TrainingRecordingMethod(ThresholdMethod):
+    """
+    Records the timespan of the training data it is prepared on.
+    """
+
+    training_timespans = []
+
+    def prepare(self, data=None):
+        pressures = data.pressures["J-02"]
+        TrainingRecordingMethod.training_timespans.append(
+            (pressures.index.min(), pressures.index.max())
+        )
+
+
+def test_run_smoke_benchmark_evaluation(mocked_dataset1: Dataset):
+    results_dir = os.path.join(TEST_DATA_FOLDER, "smoke_results_evaluation")
+    shutil.rmtree(results_dir, ignore_errors=True)
+    benchmark = LDIMBenchmark(
+        hyperparameters={"threshold": 6.0},
+        datasets=mocked_dataset1,
+        results_dir=results_dir,
+    )
+    benchmark.add_local_methods([TrainingRecordingMethod()])
+    TrainingRecordingMethod.training_timespans = []
+
+    results = benchmark.run_smoke_benchmark(
+        window_before="1min",
+        window_after="2min",
+        training_length="3min",
+        seed=42,
+        n_bootstrap=100,
+    )
+    # The evaluation part has no leak, so only leak-free windows are run
+    assert list(results["windows"]) == [2]
+    assert results["true_positives"].iloc[0] == 0
+    assert len(TrainingRecordingMethod.training_timespans) == 2
+    # The methods are only prepared on the end of the training part
+    for start, end in TrainingRecordingMethod.training_timespans:
+        assert start >= pd.Timestamp("2018-01-01 00:06:00", tz="UTC")
+        assert end <= pd.Timestamp("2018-01-01 00:09:00", tz="UTC")
+
+
+def test_docker_runner_time_slice(mocked_dataset1: Dataset):
+    sliced_dataset = get_training_slice(mocked_dataset1, 0.5)
+    docker_runner = DockerMethodRunner(
+        image="ldimbenchmark/test:0.1",
+        dataset=sliced_dataset,
+        dataset_part="evaluation",
+        hyperparameters={"threshold": 6.0},
+    )
+    args_dir = os.path.join(TEST_DATA_FOLDER, "sliced_args")
+    out_dir = os.path.join(TEST_DATA_FOLDER, "sliced_out")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(args_dir, exist_ok=True)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(args_dir, "options.yml"), "w") as f:
+        yaml.dump(docker_runner.get_options(), f)
+
+    # The runner inside of the container only sees the original dataset folder
+    TrainingRecordingMethod.training_timespans = []
+    runner = FileBasedMethodRunner(
+        detection_method=TrainingRecordingMethod(),
+        inputFolder=mocked_dataset1.path,
+        argumentsFolder=args_dir,
+        outputFolder=out_dir,
+    )
+    assert runner.dataset.id == sliced_dataset.id
+    runner.run()
+    assert pd.read_csv(os.path.join(out_dir, "run_info.csv"))["dataset_id"][0] == (
+        sliced_dataset.id
+    )
+    start, end = TrainingRecordingMethod.training_timespans[0]
+    assert end <= sliced_dataset.info["dataset"]["training"]["end"]
+
+
+def test_run_smoke_benchmark_docker_windows(mocked_dataset1: Dataset):
+    results_dir = os.path.join(TEST_DATA_FOLDER, "smoke_results_docker")
+    shutil.rmtree(results_dir, ignore_errors=True)
+    benchmark = LDIMBenchmark(
+        hyperparameters={}, datasets=mocked_dataset1, results_dir=results_dir
+    )
+    benchmark.add_docker_methods(["ldimbenchmark/test:0.1"])
+
+    experiments = []
+    with patch.object(
+        LDIMBenchmark,
+        "_run_pending_experiments",
+        lambda self, pending, *args: experiments.extend(pending),
+    ):
+        benchmark.run_smoke_benchmark(
+            window_before="1min",
+            window_after="2min",
+            training_length="3min",
+            seed=42,
+            print_results=False,
+        )
+    assert len(experiments) == 2
+    # The containers receive the windows and the shortened training part
+    for experiment in experiments:
+        timespans = experiment.create_runner().get_options()["dataset_timespans"]
+        evaluation = timespans["evaluation"]
+        assert pd.Timestamp(evaluation["end"]) - pd.Timestamp(
+            evaluation["start"]
+        ) == pd.Timedelta("3min")
+        assert timespans["training"] == {
+            "start": "2018-01-01 00:06:00+00:00",
+            "end": "2018-01-01 00:09:00+00:00",
+        }
@@ -0,0 +1,71 @@
+import os
+import queue
+
+import numpy as np
+import pandas as pd
+
+from ldimbenchmark import benchmark_complexity
+from ldimbenchmark.benchmark_complexity import (
+    _get_robust_statistics,
+    _init_complexity_worker,
+    _run_measurements,
+)
+
+
+def test_robust_statistics():
+    measurements = pd.DataFrame(
+        {
+            "number": [4, 4, 4, 8, 8],
+            "repeat": [0, 1, 2, 0, 2],
+            "time": [1.0, 2.0, 100.0, 4.0, 6.0],
+            "memory": [10.0, 10.0, 10.0, 20.0, 30.0],
+        }
+    )
+    matrix, medians, iqrs = _get_robust_statistics(
+        measurements, np.array([4, 8, 12]), 3
+    )
+
+    assert matrix["time"].shape == (3, 3)
+    # Outliers do not influence the median
+    assert medians["time"].tolist()[:2] == [2.0, 5.0]
+    assert iqrs["time"][4] == 49.5
+    # Missing runs are kept as NaN
+    assert np.isnan(matrix["time"].loc[8, 1])
+    assert medians["memory"].isna().tolist() == [False, False, True]
+
+
+def test_init_worker_without_free_cpu(monkeypatch):
+    # A worker finding no CPU left must not block
+    monkeypatch.setattr(benchmark_complexity, "_CPU_QUEUE_TIMEOUT", 0.1)
+    _init_complexity_worker(queue.Queue(), (None, None, {}, 0))
+    assert benchmark_complexity._WORKER_CPU is None
+
+
+def _measure_or_die(method, number, repeat, dataset_path, hyperparameters, *args):
+    if number >= 8:
+        # Like a worker killed by the OOM killer
+        os._exit(1)
+    return {"number": number, "repeat": repeat, "time": 1.0, "memory": 1.0}
+
+
+def test_run_measurements_dead_worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(benchmark_complexity, "_measure_complexity", _measure_or_die)
+    n_samples = [4, 8, 16, 32]
+    measurements = pd.DataFrame(
+        _run_measurements(
+            "method",
+            n_samples,
+            2,
+            {n: str(n) for n in n_samples},
+            {},
+            str(tmp_path),
+            False,
+            [0],
+            0,
+        )
+    )
+    assert (measurements.loc[measurements["number"] == 4, "time"] == 1.0).all()
+    # The pool is recreated after each dead worker, until the larger sizes are skipped
+    failed = measurements[measurements["number"] > 4]
+    assert failed["time"].isna().all()
+    assert set(failed["number"]) == {8, 16}